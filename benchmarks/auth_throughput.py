@@ -0,0 +1,288 @@
+"""
+Benchmarks end-to-end AgentAuth.auth throughput without any network services.
+
+Logins run in headless Chromium against the local login pages in
+tests/local_login_site.py (password, TOTP, email code and magic link). The
+LLM is tests/scripted_llm.py and email goes through the local IMAP server
+in tests/local_imap_server.py. For each flow and concurrency level, the
+benchmark runs --logins logins with AgentAuth.auth_many and reports:
+
+- logins per second and the share that succeeded
+- latency percentiles, and the median of each login phase
+- LLM calls and tokens per login
+- peak RSS of this process and its browsers, per concurrent login
+
+Results can be written as JSON with --output and compared with an
+earlier run with --compare. The scripted LLM answers instantly by default.
+Use --llm-latency to add a realistic model delay. With --playbooks, the
+warm-up login of each flow is recorded as a playbook and the measured
+logins replay it without the LLM.
+
+Requires Chromium for Playwright (`playwright install chromium`).
+
+Usage:
+    python benchmarks/auth_throughput.py [--flows password,totp,email-code,magic-link]
+        [--concurrency 1,4,8] [--logins 16] [--llm-latency 0] [--no-browser-pool] [--playbooks]
+        [--output results.json] [--compare previous.json]
+"""
+
+import argparse
+import asyncio
+from collections import Counter, defaultdict
+from datetime import datetime, timezone
+from importlib import metadata
+import json
+import os
+from pathlib import Path
+import platform
+import resource
+import sys
+import time
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "tests"))
+
+from local_imap_server import LocalImapServer
+from local_login_site import FLOWS, LocalLoginSite
+from scripted_llm import ScriptedLoginLLM
+
+from agentauth import AgentAuth, BrowserPool, CredentialManager, MetricsHook, PlaybookStore, Span
+from agentauth.email_service import EmailService
+
+TOTP_SECRET = "JBSWY3DPEHPK3PXP"
+
+class PhaseCollector(MetricsHook):
+    def __init__(self):
+        self.durations = defaultdict(list)
+        self.logins = []
+
+    def on_span(self, span: Span):
+        self.durations[span.name].append(span.duration)
+        if span.name == "auth":
+            self.logins.append(span)
+
+class MemorySampler:
+    """
+    Samples the RSS of this process and its child processes, which include
+    locally launched browsers. Without psutil, only this process's peak RSS
+    is measured.
+    """
+
+    def __init__(self, interval: float = 0.1):
+        self.interval = interval
+        self.peak = 0
+        self._task = None
+        try:
+            import psutil
+            self._process = psutil.Process()
+        except ImportError:
+            self._process = None
+
+    def rss(self) -> int:
+        if self._process is None:
+            return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024
+        total = 0
+        for process in [self._process] + self._process.children(recursive=True):
+            try:
+                total += process.memory_info().rss
+            except Exception:
+                pass
+        return total
+
+    def start(self):
+        self.peak = self.rss()
+        self._task = asyncio.create_task(self._sample())
+
+    async def stop(self) -> int:
+        self._task.cancel()
+        await asyncio.gather(self._task, return_exceptions=True)
+        self.peak = max(self.peak, self.rss())
+        return self.peak
+
+    async def _sample(self):
+        while True:
+            await asyncio.sleep(self.interval)
+            self.peak = max(self.peak, self.rss())
+
+def percentile(values: list, q: float) -> float:
+    if not values:
+        return None
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, max(0, round(q / 100 * len(ordered) + 0.5) - 1))]
+
+def add_accounts(site: LocalLoginSite, credential_manager: CredentialManager, flow: str, usernames: list):
+    for username in usernames:
+        site.add_account(username, "password", TOTP_SECRET)
+    credential_manager.load_credentials([
+        {"website": f"{site.url}/{flow}", "username": username, "password": "password", "totp_secret": TOTP_SECRET}
+        for username in usernames
+    ])
+
+async def run_level(aa: AgentAuth, site: LocalLoginSite, flow: str, concurrency: int, logins: int, sampler: MemorySampler) -> dict:
+    usernames = [f"{flow}-c{concurrency}-{i}@example.com" for i in range(logins)]
+    add_accounts(site, aa.credential_manager, flow, usernames)
+    collector = PhaseCollector()
+    aa.metrics_hooks = [collector]
+
+    baseline = sampler.rss()
+    sampler.start()
+    start = time.perf_counter()
+    results = [result async for result in aa.auth_many(((f"{site.url}/{flow}", username) for username in usernames), concurrency=concurrency)]
+    wall_seconds = time.perf_counter() - start
+    peak = await sampler.stop()
+
+    succeeded = [result for result in results if result.ok]
+    latencies = [result.duration for result in succeeded]
+    errors = Counter(f"{type(result.error).__name__}: {str(result.error)[:80]}" for result in results if not result.ok)
+
+    def per_login(attribute: str) -> float:
+        values = [span.attributes.get(attribute, 0) for span in collector.logins if span.ok]
+        return round(sum(values) / len(values), 1) if values else None
+
+    return {
+        "flow": flow,
+        "concurrency": concurrency,
+        "logins": logins,
+        "succeeded": len(succeeded),
+        "failed": logins - len(succeeded),
+        "errors": dict(errors.most_common(5)),
+        "wall_seconds": round(wall_seconds, 3),
+        "logins_per_second": round(len(succeeded) / wall_seconds, 3),
+        "latency_seconds": {
+            "p50": percentile(latencies, 50),
+            "p90": percentile(latencies, 90),
+            "p99": percentile(latencies, 99),
+            "max": max(latencies) if latencies else None,
+        },
+        "phase_p50_seconds": {name: round(percentile(durations, 50), 4) for name, durations in sorted(collector.durations.items())},
+        "llm_calls_per_login": per_login("llm_calls"),
+        "input_tokens_per_login": per_login("input_tokens"),
+        "output_tokens_per_login": per_login("output_tokens"),
+        "peak_rss_mb": round(peak / 1024 / 1024, 1),
+        "rss_per_concurrent_login_mb": round(max(0, peak - baseline) / 1024 / 1024 / concurrency, 1),
+    }
+
+def print_results(results: list):
+    print(f"{'Flow':<12} {'Conc.':>5} {'OK':>7} {'Logins/s':>9} {'p50 (s)':>8} {'p99 (s)':>8} {'LLM calls':>9} {'MB/login':>9}")
+    for result in results:
+        latency = result["latency_seconds"]
+        print(
+            f"{result['flow']:<12} {result['concurrency']:>5} {result['succeeded']:>3}/{result['logins']:<3} "
+            f"{result['logins_per_second']:>9.2f} {_seconds(latency['p50']):>8} {_seconds(latency['p99']):>8} "
+            f"{result['llm_calls_per_login'] or 0:>9} {result['rss_per_concurrent_login_mb']:>9}"
+        )
+        for error, count in result["errors"].items():
+            print(f"    {count} x {error}")
+
+def print_comparison(previous: dict, results: list):
+    previous_results = {(result["flow"], result["concurrency"]): result for result in previous["results"]}
+    print(f"\nCompared with {previous['created']}")
+    print(f"{'Flow':<12} {'Conc.':>5} {'Logins/s':>20} {'p50 (s)':>20} {'p99 (s)':>20}")
+    for result in results:
+        before = previous_results.get((result["flow"], result["concurrency"]))
+        if before is None:
+            continue
+        print(
+            f"{result['flow']:<12} {result['concurrency']:>5} "
+            f"{_change(before['logins_per_second'], result['logins_per_second']):>20} "
+            f"{_change(before['latency_seconds']['p50'], result['latency_seconds']['p50']):>20} "
+            f"{_change(before['latency_seconds']['p99'], result['latency_seconds']['p99']):>20}"
+        )
+
+def _seconds(value: float) -> str:
+    return "-" if value is None else f"{value:.2f}"
+
+def _change(before: float, after: float) -> str:
+    if before is None or after is None:
+        return "-"
+    percent = f" ({(after - before) / before * 100:+.0f}%)" if before else ""
+    return f"{before:.2f} -> {after:.2f}{percent}"
+
+def _version(package: str) -> str:
+    try:
+        return metadata.version(package)
+    except metadata.PackageNotFoundError:
+        return None
+
+async def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--flows", default=",".join(FLOWS))
+    parser.add_argument("--concurrency", default="1,4,8")
+    parser.add_argument("--logins", type=int, default=16, help="Logins per flow and concurrency level")
+    parser.add_argument("--llm-latency", type=float, default=0.0, help="Seconds each scripted LLM call takes")
+    parser.add_argument("--no-browser-pool", action="store_true", help="Launch a browser for every login")
+    parser.add_argument("--playbooks", action="store_true", help="Replay recorded logins instead of running the agent")
+    parser.add_argument("--output", help="Write results as JSON to this file")
+    parser.add_argument("--compare", help="Compare with results from an earlier --output")
+    args = parser.parse_args()
+
+    flows = args.flows.split(",")
+    unknown = set(flows) - set(FLOWS)
+    if unknown:
+        parser.error(f"unknown flows: {', '.join(sorted(unknown))}")
+    levels = [int(level) for level in args.concurrency.split(",")]
+
+    imap_server = LocalImapServer()
+    await imap_server.start()
+    site = LocalLoginSite(imap_server, asyncio.get_running_loop())
+    site.start()
+
+    llm = ScriptedLoginLLM(latency=args.llm_latency)
+    browser_pool = None if args.no_browser_pool else BrowserPool(max_idle=max(levels))
+    playbook_store = PlaybookStore() if args.playbooks else None
+    aa = AgentAuth(credential_manager=CredentialManager(), llm=llm, browser_pool=browser_pool, playbook_store=playbook_store)
+    aa.email_service = EmailService(
+        "localhost",
+        imap_server.port,
+        imap_server.username,
+        imap_server.password,
+        llm,
+        ssl_context=imap_server.client_ssl_context(),
+    )
+    sampler = MemorySampler()
+
+    results = []
+    try:
+        for flow in flows:
+            # One unmeasured login loads code paths, warms the browser pool
+            # and records the flow's playbook. All flows share a host, so
+            # each flow replaces the previous flow's playbook.
+            await run_level(aa, site, flow, 1, 1, sampler)
+            for concurrency in levels:
+                results.append(await run_level(aa, site, flow, concurrency, args.logins, sampler))
+    finally:
+        await aa.email_service.close()
+        if browser_pool:
+            await browser_pool.close()
+        site.stop()
+        await imap_server.stop()
+
+    print_results(results)
+
+    report = {
+        "benchmark": "auth_throughput",
+        "created": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+        "environment": {
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "cpus": os.cpu_count(),
+            "agentauth": _version("agentauth"),
+            "browser-use": _version("browser-use"),
+        },
+        "config": {
+            "logins": args.logins,
+            "llm_latency": args.llm_latency,
+            "browser_pool": browser_pool is not None,
+            "playbooks": args.playbooks,
+        },
+        "results": results,
+    }
+    if args.output:
+        with open(args.output, "w") as file:
+            json.dump(report, file, indent=2)
+        print(f"\nWrote {args.output}")
+    if args.compare:
+        with open(args.compare) as file:
+            print_comparison(json.load(file), results)
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,67 @@
+"""
+Benchmarks CredentialManager.get_credential as the number of credentials grows.
+
+Lookup cost should stay flat because credentials are indexed by hostname and
+username. The list scan that the index replaced is timed alongside for
+comparison. Loading, which builds the index, is timed too, so that a slower
+index shows up even when lookups stay fast.
+
+Usage:
+    python benchmarks/credential_lookup.py
+"""
+
+import time
+
+from agentauth import CredentialManager
+
+SIZES = [100, 1_000, 10_000, 100_000]
+LOOKUPS = 2_000
+
+def build_manager(size: int) -> CredentialManager:
+    credential_manager = CredentialManager()
+    credential_manager.load_credentials([
+        {
+            "website": f"https://site{i}.example{i % 97}.com/login",
+            "username": f"user{i}@example.com",
+            "password": f"password{i}"
+        }
+        for i in range(size)
+    ])
+    return credential_manager
+
+def time_per_lookup(lookup, queries: list) -> float:
+    start = time.perf_counter()
+    for website, username in queries:
+        lookup(website, username)
+    return (time.perf_counter() - start) / len(queries)
+
+def list_scan(credential_manager: CredentialManager):
+    def lookup(website: str, username: str):
+        for credential in credential_manager.credentials:
+            if credential.matches_website_and_username(website, username):
+                return credential
+        return None
+    return lookup
+
+def main():
+    print(f"{'Credentials':>12} {'Load (ms)':>10} {'Exact (us)':>12} {'Subdomain (us)':>15} {'List scan (us)':>15}")
+
+    for size in SIZES:
+        start = time.perf_counter()
+        credential_manager = build_manager(size)
+        load_time = time.perf_counter() - start
+
+        step = max(size // LOOKUPS, 1)
+        exact = [(f"https://site{i}.example{i % 97}.com", f"user{i}@example.com") for i in range(0, size, step)]
+        subdomain = [(f"https://app.site{i}.example{i % 97}.com", f"user{i}@example.com") for i in range(0, size, step)]
+
+        exact_time = time_per_lookup(credential_manager.get_credential, exact)
+        subdomain_time = time_per_lookup(credential_manager.get_credential, subdomain)
+
+        # The list scan is linear, so only time a handful of lookups
+        scan_time = time_per_lookup(list_scan(credential_manager), exact[-5:])
+
+        print(f"{size:>12} {load_time * 1e3:>10.1f} {exact_time * 1e6:>12.2f} {subdomain_time * 1e6:>15.2f} {scan_time * 1e6:>15.2f}")
+
+if __name__ == "__main__":
+    main()
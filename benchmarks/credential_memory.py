@@ -0,0 +1,69 @@
+"""
+Compares the memory footprint of 100k credentials before and after the
+compact Credential representation.
+
+"Before" is the original dict-backed Credential class, reproduced below.
+"After" is the current slotted Credential, which also interns website and
+username strings. Credentials are spread over a realistic number of distinct
+websites and usernames, each built as a separate string object the way
+vault loaders produce them.
+
+Usage:
+    python benchmarks/credential_memory.py
+"""
+
+import gc
+import time
+import tracemalloc
+
+from agentauth import Credential
+
+COUNT = 100_000
+WEBSITES = 2_000
+USERNAMES = 500
+
+class LegacyCredential:
+    def __init__(self, website: str, username: str, password: str = None, totp_secret: str = None):
+        self.website = website
+        self.username = username
+        self.password = password
+        self.totp_secret = totp_secret
+
+def load(credential_class) -> tuple[int, list]:
+    gc.collect()
+    tracemalloc.start()
+    credentials = [
+        credential_class(
+            website="https://www.example" + str(i % WEBSITES) + ".com/login",
+            username="user" + str(i % USERNAMES) + "@example.com",
+            password=f"password-{i}",
+            totp_secret="JBSWY3DPEHPK3PXP" if i % 10 == 0 else None
+        )
+        for i in range(COUNT)
+    ]
+    size, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return size, credentials
+
+def main():
+    before, _ = load(LegacyCredential)
+    after, credentials = load(Credential)
+
+    print(f"{'Representation':<20} {'Total (MB)':>12} {'Per credential (B)':>20}")
+    print(f"{'before (dict)':<20} {before / 1e6:>12.2f} {before / COUNT:>20.1f}")
+    print(f"{'after (slots)':<20} {after / 1e6:>12.2f} {after / COUNT:>20.1f}")
+    print(f"Reduction: {(1 - after / before) * 100:.1f}%")
+
+    credential = credentials[0]
+    start = time.perf_counter()
+    for _ in range(10_000):
+        credential.totp()
+    print(f"Cached totp(): {(time.perf_counter() - start) / 10_000 * 1e6:.2f} us/call")
+
+    start = time.perf_counter()
+    for _ in range(10_000):
+        credential.has_totp
+    print(f"has_totp: {(time.perf_counter() - start) / 10_000 * 1e6:.3f} us/call")
+
+if __name__ == "__main__":
+    main()
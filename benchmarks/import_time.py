@@ -0,0 +1,86 @@
+"""
+Benchmarks import time of agentauth and guards against heavy dependencies
+being loaded by code that does not need them.
+
+Each scenario runs in a fresh interpreter with `-X importtime`. The report
+shows the total import time of the statement and of its slowest top-level
+dependencies. The script exits with status 1 if a scenario loads one of the
+modules it must not load, e.g. browser_use for a process that only uses
+CredentialManager.
+
+Usage:
+    python benchmarks/import_time.py [--repeat 5]
+"""
+
+import argparse
+import statistics
+import subprocess
+import sys
+from typing import Dict, Set, Tuple
+
+HEAVY_MODULES = ("browser_use", "langchain_core", "langchain_openai", "onepassword", "imap_tools", "aioimaplib", "cryptography")
+
+# Statement, and heavy modules it may load
+SCENARIOS = [
+    ("import agentauth", ()),
+    ("from agentauth import Credential, CredentialManager", ()),
+    ("from agentauth import OnePasswordSource, BitwardenServeSource", ()),
+    ("from agentauth import CredentialSnapshot", ("cryptography",)),
+    ("from agentauth import SessionCache", ("cryptography",)),
+    ("from agentauth.email_service import EmailService", ("imap_tools", "aioimaplib")),
+    ("from agentauth import AgentAuth", HEAVY_MODULES),
+]
+
+def measure(statement: str) -> Tuple[Dict[str, int], Set[str]]:
+    """
+    Run a statement in a fresh interpreter and return the cumulative
+    microseconds of each top-level import, and the names of all imported modules.
+    """
+    output = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", statement],
+        capture_output=True,
+        text=True,
+        check=True,
+    ).stderr
+
+    top_level = {}
+    loaded = set()
+    for line in output.splitlines():
+        if not line.startswith("import time:") or "cumulative" in line:
+            continue
+        _, cumulative, name = line[len("import time:"):].split("|")
+        loaded.add(name.strip())
+        # Nested imports are indented by two spaces per level
+        if not name.startswith("  "):
+            top_level[name.strip()] = int(cumulative)
+    return top_level, loaded
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    # Modules imported by interpreter startup are not part of any statement
+    startup, _ = measure("pass")
+
+    failures = []
+    print(f"{'Statement':<64} {'Median (ms)':>12}  Slowest imports (ms)")
+    for statement, allowed in SCENARIOS:
+        totals = []
+        for _ in range(args.repeat):
+            top_level, loaded = measure(statement)
+            top_level = {name: us for name, us in top_level.items() if name not in startup}
+            totals.append(sum(top_level.values()))
+        slowest = sorted(top_level.items(), key=lambda item: -item[1])[:3]
+        print(f"{statement:<64} {statistics.median(totals) / 1000:>12.1f}  " + ", ".join(f"{name} {us / 1000:.0f}" for name, us in slowest))
+
+        unexpected = sorted({name.split(".")[0] for name in loaded} & set(HEAVY_MODULES) - set(allowed))
+        if unexpected:
+            failures.append(f"{statement!r} imported {', '.join(unexpected)}")
+
+    if failures:
+        print("\n" + "\n".join(failures))
+        sys.exit(1)
+
+if __name__ == "__main__":
+    main()
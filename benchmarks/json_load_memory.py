@@ -0,0 +1,107 @@
+"""
+Benchmarks peak memory of CredentialManager.load_json on a large file.
+
+A credentials export of about --size-mb megabytes is written to a temporary
+directory, once as a JSON array and once as JSON Lines. Each load runs in a
+fresh process and reports its peak RSS, alongside the `json.load` approach
+that load_json replaced. Records carry a notes field, as real exports do,
+so most of the file is data that is not kept.
+
+Usage:
+    python benchmarks/json_load_memory.py [--size-mb 300]
+"""
+
+import argparse
+import json
+import os
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+
+NOTES = "Imported from the previous password manager. " * 8
+
+def write_files(directory: str, size_mb: int) -> tuple:
+    array_path = os.path.join(directory, "credentials.json")
+    lines_path = os.path.join(directory, "credentials.jsonl")
+    count = 0
+    with open(array_path, "w") as array_file, open(lines_path, "w") as lines_file:
+        array_file.write("[\n")
+        while array_file.tell() < size_mb * 1024 * 1024:
+            record = json.dumps({
+                "website": f"https://site{count}.example{count % 97}.com/login",
+                "username": f"user{count}@example.com",
+                "password": f"password-{count:012d}",
+                "totp_secret": "JBSWY3DPEHPK3PXP" if count % 4 == 0 else None,
+                "notes": NOTES,
+            })
+            array_file.write(("," if count else "") + record + "\n")
+            lines_file.write(record + "\n")
+            count += 1
+        array_file.write("]\n")
+    return array_path, lines_path, count
+
+def legacy_load(path: str) -> int:
+    from agentauth import Credential, CredentialManager
+
+    credential_manager = CredentialManager()
+    new_credentials = []
+    with open(path, "r") as file:
+        for x in json.load(file):
+            new_credentials.append(Credential(x.get("website"), x.get("username"), x.get("password"), x.get("totp_secret")))
+    credential_manager._add_credentials(new_credentials)
+    return len(credential_manager.credentials)
+
+def streaming_load(path: str) -> int:
+    from agentauth import CredentialManager
+
+    credential_manager = CredentialManager()
+    credential_manager.load_json(path)
+    return len(credential_manager.credentials)
+
+def child(mode: str, path: str):
+    import agentauth  # Import cost is not part of the measurement
+
+    baseline = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    start = time.perf_counter()
+    count = legacy_load(path) if mode == "legacy" else streaming_load(path)
+    seconds = time.perf_counter() - start
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    print(json.dumps({"count": count, "seconds": seconds, "peak_mb": peak / 1024, "growth_mb": (peak - baseline) / 1024}))
+
+def run(mode: str, path: str) -> dict:
+    output = subprocess.run(
+        [sys.executable, __file__, "--child", mode, path],
+        capture_output=True,
+        text=True,
+        check=True,
+    ).stdout
+    return json.loads(output.strip().splitlines()[-1])
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--size-mb", type=int, default=300)
+    parser.add_argument("--child", nargs=2, metavar=("MODE", "PATH"))
+    args = parser.parse_args()
+
+    if args.child:
+        child(*args.child)
+        return
+
+    with tempfile.TemporaryDirectory() as directory:
+        array_path, lines_path, count = write_files(directory, args.size_mb)
+        print(f"{count:,} credentials, {os.path.getsize(array_path) / 1024 / 1024:.0f} MB\n")
+        print(f"{'Loader':<24} {'Seconds':>8} {'Peak RSS (MB)':>14} {'Growth (MB)':>12}")
+
+        for label, mode, path in (
+            ("json.load (legacy)", "legacy", array_path),
+            ("load_json, array", "streaming", array_path),
+            ("load_json, JSON Lines", "streaming", lines_path),
+        ):
+            result = run(mode, path)
+            assert result["count"] == count
+            print(f"{label:<24} {result['seconds']:>8.2f} {result['peak_mb']:>14.0f} {result['growth_mb']:>12.0f}")
+
+if __name__ == "__main__":
+    main()
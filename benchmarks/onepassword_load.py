@@ -0,0 +1,87 @@
+"""
+Benchmarks CredentialManager.load_1password against a fake 1Password client
+where every SDK call takes a fixed latency.
+
+The sequential loop that load_1password replaced, which resolved username,
+password and TOTP once per website of every item, is timed alongside for
+comparison. The lazy mode only keeps usernames at startup, so it also
+holds no plaintext passwords or TOTP secrets until a login needs them.
+
+Usage:
+    python benchmarks/onepassword_load.py
+"""
+
+import asyncio
+from pathlib import Path
+import sys
+import time
+from types import SimpleNamespace
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "tests"))
+
+import onepassword.client
+
+from fake_onepassword import FakeOnePasswordClient
+
+from agentauth import Credential, CredentialManager
+
+VAULTS = 4
+ITEMS_PER_VAULT = 50
+WEBSITES_PER_ITEM = 3
+LATENCY = 0.005
+
+async def sequential_load(client: FakeOnePasswordClient) -> list:
+    credentials = []
+    async for vault in await client.vaults.list_all():
+        async for item in await client.items.list_all(vault.id):
+            for website in item.websites:
+                try:
+                    username = await client.secrets.resolve(f"op://{item.vault_id}/{item.id}/username")
+                    password = await client.secrets.resolve(f"op://{item.vault_id}/{item.id}/password")
+                except Exception:
+                    continue
+                totp_secret = ""
+                try:
+                    totp_secret = await client.secrets.resolve(f"op://{item.vault_id}/{item.id}/one-time password")
+                except Exception:
+                    pass
+                credentials.append(Credential(website.url, username, password, totp_secret))
+    return credentials
+
+def plaintext_secrets(credentials: list) -> int:
+    return sum(bool(credential.password) + bool(credential.totp_secret) for credential in credentials)
+
+def new_client(batch: bool) -> FakeOnePasswordClient:
+    return FakeOnePasswordClient(VAULTS, ITEMS_PER_VAULT, WEBSITES_PER_ITEM, LATENCY, batch=batch)
+
+async def time_load_1password(batch: bool, lazy: bool):
+    client = new_client(batch)
+    onepassword.client.Client = SimpleNamespace(authenticate=client.authenticate())
+    credential_manager = CredentialManager()
+
+    start = time.perf_counter()
+    await credential_manager.load_1password("token", lazy=lazy)
+    return time.perf_counter() - start, credential_manager.credentials, client
+
+async def main():
+    print(f"{VAULTS} vaults x {ITEMS_PER_VAULT} items x {WEBSITES_PER_ITEM} websites, {LATENCY * 1000:.0f} ms per SDK call\n")
+    print(f"{'Loader':<28} {'Seconds':>8} {'Credentials':>12} {'Secret calls':>13} {'Plaintext secrets':>18}")
+
+    client = new_client(batch=False)
+    start = time.perf_counter()
+    credentials = await sequential_load(client)
+    seconds = time.perf_counter() - start
+    print(f"{'Sequential, per website':<28} {seconds:>8.2f} {len(credentials):>12} {client.calls['resolve']:>13} {plaintext_secrets(credentials):>18}")
+
+    for label, batch, lazy in (
+        ("Concurrent, resolve", False, False),
+        ("Concurrent, resolve_all", True, False),
+        ("Lazy, resolve", False, True),
+        ("Lazy, resolve_all", True, True),
+    ):
+        seconds, credentials, client = await time_load_1password(batch, lazy)
+        calls = client.calls["resolve"] + client.calls["resolve_all"]
+        print(f"{label:<28} {seconds:>8.2f} {len(credentials):>12} {calls:>13} {plaintext_secrets(credentials):>18}")
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,98 @@
+"""
+Benchmarks worker cold start with CredentialManager.load_snapshot against
+load_json.
+
+A set of --count credentials is written to a temporary directory as a JSON
+file and as an encrypted snapshot. Each loader runs in a fresh process and
+reports the time to load and to answer the first lookup.
+
+Usage:
+    python benchmarks/snapshot_startup.py [--count 500000]
+"""
+
+import argparse
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import time
+
+def write_files(directory: str, count: int, key: str) -> tuple:
+    from agentauth import CredentialManager
+
+    json_path = os.path.join(directory, "credentials.json")
+    snapshot_path = os.path.join(directory, "credentials.snap")
+    with open(json_path, "w") as file:
+        file.write("[\n")
+        for i in range(count):
+            file.write(("," if i else "") + json.dumps({
+                "website": f"https://site{i}.example{i % 97}.com/login",
+                "username": f"user{i}@example.com",
+                "password": f"password-{i:012d}",
+                "totp_secret": "JBSWY3DPEHPK3PXP" if i % 4 == 0 else None,
+            }) + "\n")
+        file.write("]\n")
+
+    credential_manager = CredentialManager()
+    credential_manager.load_json(json_path)
+    credential_manager.save_snapshot(snapshot_path, key)
+    return json_path, snapshot_path
+
+def child(mode: str, path: str, key: str, count: int):
+    from agentauth import CredentialManager  # Import cost is not part of the measurement
+
+    start = time.perf_counter()
+    credential_manager = CredentialManager()
+    if mode == "json":
+        credential_manager.load_json(path)
+    else:
+        credential_manager.load_snapshot(path, key)
+    loaded = time.perf_counter()
+    i = count // 2
+    credential = credential_manager.get_credential(f"https://site{i}.example{i % 97}.com", f"user{i}@example.com")
+    assert credential.password == f"password-{i:012d}"
+    first_lookup = time.perf_counter()
+    print(json.dumps({
+        "load_ms": (loaded - start) * 1000,
+        "first_lookup_ms": (first_lookup - start) * 1000,
+    }))
+
+def run(mode: str, path: str, key: str, count: int) -> dict:
+    output = subprocess.run(
+        [sys.executable, __file__, "--child", mode, path, key, str(count)],
+        capture_output=True,
+        text=True,
+        check=True,
+    ).stdout
+    return json.loads(output.strip().splitlines()[-1])
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--count", type=int, default=500_000)
+    parser.add_argument("--child", nargs=4, metavar=("MODE", "PATH", "KEY", "COUNT"))
+    args = parser.parse_args()
+
+    if args.child:
+        mode, path, key, count = args.child
+        child(mode, path, key, int(count))
+        return
+
+    from agentauth import CredentialSnapshot
+
+    key = CredentialSnapshot.generate_key()
+    with tempfile.TemporaryDirectory() as directory:
+        json_path, snapshot_path = write_files(directory, args.count, key)
+        print(f"{args.count:,} credentials, JSON {os.path.getsize(json_path) / 1024 / 1024:.0f} MB, "
+              f"snapshot {os.path.getsize(snapshot_path) / 1024 / 1024:.0f} MB\n")
+        print(f"{'Loader':<16} {'Load (ms)':>10} {'First lookup (ms)':>18}")
+
+        for label, mode, path in (
+            ("load_json", "json", json_path),
+            ("load_snapshot", "snapshot", snapshot_path),
+        ):
+            result = run(mode, path, key, args.count)
+            print(f"{label:<16} {result['load_ms']:>10.1f} {result['first_lookup_ms']:>18.1f}")
+
+if __name__ == "__main__":
+    main()
@@ -12,8 +12,87 @@ structlog.configure(
 )
 logger = structlog.get_logger("agentauth")
 
-from agentauth.agentauth import AgentAuth
-from agentauth.credential_manager import CredentialManager
-from agentauth.credential import Credential
+import importlib
+from typing import TYPE_CHECKING
 
-__all__ = ["AgentAuth", "CredentialManager", "Credential"]
+if TYPE_CHECKING:
+    from agentauth.agentauth import AgentAuth, AuthResult
+    from agentauth.server import AuthServer
+    from agentauth.browser_pool import BrowserPool
+    from agentauth.credential_manager import CredentialManager
+    from agentauth.credential import Credential, LazyCredential
+    from agentauth.credential_snapshot import CredentialSnapshot
+    from agentauth.credential_source import BitwardenServeSource, CredentialSource, OnePasswordSource
+    from agentauth.factory import load_agentauth
+    from agentauth.job_queue import Job, JobQueue
+    from agentauth.metrics import MetricsHook, PrometheusExporter, Span
+    from agentauth.playbook import Playbook, PlaybookStore
+    from agentauth.session_cache import SessionCache
+    from agentauth.session_probe import SessionProbe
+    from agentauth.session_refresher import SessionRefresher
+    from agentauth.worker_pool import WorkerPool
+
+# Public names are imported from their modules on first access, so that
+# e.g. using only CredentialManager does not load browser_use and LangChain
+_LAZY_ATTRIBUTES = {
+    "AgentAuth": "agentauth.agentauth",
+    "AuthResult": "agentauth.agentauth",
+    "AuthServer": "agentauth.server",
+    "BitwardenServeSource": "agentauth.credential_source",
+    "BrowserPool": "agentauth.browser_pool",
+    "CredentialManager": "agentauth.credential_manager",
+    "Credential": "agentauth.credential",
+    "CredentialSnapshot": "agentauth.credential_snapshot",
+    "CredentialSource": "agentauth.credential_source",
+    "Job": "agentauth.job_queue",
+    "JobQueue": "agentauth.job_queue",
+    "LazyCredential": "agentauth.credential",
+    "MetricsHook": "agentauth.metrics",
+    "OnePasswordSource": "agentauth.credential_source",
+    "Playbook": "agentauth.playbook",
+    "PlaybookStore": "agentauth.playbook",
+    "PrometheusExporter": "agentauth.metrics",
+    "SessionCache": "agentauth.session_cache",
+    "SessionProbe": "agentauth.session_probe",
+    "SessionRefresher": "agentauth.session_refresher",
+    "Span": "agentauth.metrics",
+    "WorkerPool": "agentauth.worker_pool",
+    "load_agentauth": "agentauth.factory",
+}
+
+__all__ = [
+    "AgentAuth",
+    "AuthResult",
+    "AuthServer",
+    "BitwardenServeSource",
+    "BrowserPool",
+    "CredentialManager",
+    "Credential",
+    "CredentialSnapshot",
+    "CredentialSource",
+    "Job",
+    "JobQueue",
+    "LazyCredential",
+    "MetricsHook",
+    "OnePasswordSource",
+    "Playbook",
+    "PlaybookStore",
+    "PrometheusExporter",
+    "SessionCache",
+    "SessionProbe",
+    "SessionRefresher",
+    "Span",
+    "WorkerPool",
+    "load_agentauth",
+]
+
+def __getattr__(name: str):
+    module_name = _LAZY_ATTRIBUTES.get(name)
+    if module_name is None:
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+    value = getattr(importlib.import_module(module_name), name)
+    globals()[name] = value
+    return value
+
+def __dir__():
+    return sorted(set(globals()) | set(__all__))
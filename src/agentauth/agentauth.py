@@ -1,16 +1,65 @@
-from datetime import datetime, timezone
+import asyncio
+from contextlib import AsyncExitStack, asynccontextmanager
 import logging
 import os
+import time
+from typing import AsyncIterator, Iterable, List
+import warnings
 
 from browser_use import Agent, Browser, BrowserConfig
-from browser_use.controller.service import Controller
+from browser_use.browser.context import BrowserContext
 from langchain_core.language_models.chat_models import BaseChatModel
 from langchain_openai import ChatOpenAI
 
 from agentauth import logger
+from agentauth.browser_pool import BrowserPool
+from agentauth.credential_index import normalize_host
 from agentauth.credential_manager import CredentialManager
 from agentauth.email_service import EmailService
 from agentauth.id_generator import generate_id
+from agentauth.llm_usage import LLMUsage, track_llm_usage
+from agentauth.login_session import LoginSession
+from agentauth.metrics import MetricsHook, Span, SpanRecorder
+from agentauth.playbook import Playbook, PlaybookStore
+from agentauth.session_cache import SessionCache
+from agentauth.session_probe import SessionProbe
+from agentauth.single_flight import FileLock, SingleFlight
+
+class AuthResult:
+    """
+    AuthResult is the outcome of one job in `AgentAuth.auth_many`.
+
+    Args:
+        index (int): Position of the job in the input iterable
+        website (str): The website the job authenticated with
+        username (str): The username the job authenticated with
+        cdp_url (str, optional): CDP URL the job used, if any
+        cookies (list, optional): Session cookies if authentication succeeded
+        error (Exception, optional): The exception raised if authentication failed
+        duration (float): Wall-clock seconds spent on the job
+    """
+
+    def __init__(
+            self,
+            index: int,
+            website: str,
+            username: str,
+            cdp_url: str = None,
+            cookies: list = None,
+            error: Exception = None,
+            duration: float = 0.0,
+        ):
+        self.index = index
+        self.website = website
+        self.username = username
+        self.cdp_url = cdp_url
+        self.cookies = cookies
+        self.error = error
+        self.duration = duration
+
+    @property
+    def ok(self) -> bool:
+        return self.error is None
 
 class AgentAuth:
     """
@@ -21,6 +70,9 @@ class AgentAuth:
     The class uses browser automation and LLMs to understand and navigate
     login forms in a human-like manner.
 
+    Per-login state lives in a `LoginSession` created for each `auth` call,
+    so a single instance (and its LLM client) can serve many concurrent logins.
+
     Args:
         credential_manager (CredentialManager, optional): Manager for handling credentials.
             If not provided, a new empty manager will be created.
@@ -31,6 +83,25 @@ class AgentAuth:
             Required if imap_server is provided.
         imap_password (str, optional): Email password for IMAP.
             Required if imap_server is provided.
+        agent_id (str, optional): Identifier included in audit logs.
+            A random ID is generated if not provided.
+        session_cache (SessionCache, optional): Cache of authenticated cookies.
+            If provided, `auth` returns unexpired cached cookies for the same
+            website and username without launching a browser.
+        browser_pool (BrowserPool, optional): Pool of warm browsers to reuse
+            across logins. If not provided, each login launches its own browser.
+        metrics_hooks (Iterable[MetricsHook], optional): Hooks that receive a
+            timing span for each phase of every login, e.g. a `PrometheusExporter`.
+        playbook_store (PlaybookStore, optional): Store of recorded logins.
+            If provided, successful agent runs are recorded per site and later
+            logins to the site replay them without the LLM, falling back to
+            the agent if the replay fails.
+        lock_dir (str, optional): Directory for cross-process login locks.
+            Concurrent `auth` calls for the same site and username always
+            share one login within a process. With a lock directory, logins
+            in all processes using it also run one at a time, and with a
+            `SessionCache` on a shared path, waiting processes reuse the
+            cookies instead of logging in again. Requires a POSIX system.
     """
 
     def __init__(
@@ -42,6 +113,11 @@ class AgentAuth:
             imap_username: str = None,
             imap_password: str = None,
             agent_id: str = None,
+            session_cache: SessionCache = None,
+            browser_pool: BrowserPool = None,
+            metrics_hooks: Iterable[MetricsHook] = None,
+            playbook_store: PlaybookStore = None,
+            lock_dir: str = None,
         ):
         self.credential_manager = credential_manager or CredentialManager()
         
@@ -56,7 +132,14 @@ class AgentAuth:
 
         self.agent_id = agent_id or generate_id()
 
-        self.login_start_time = datetime.now(timezone.utc)
+        self.session_cache = session_cache
+        self.browser_pool = browser_pool
+        self.metrics_hooks = list(metrics_hooks or [])
+        self.playbook_store = playbook_store
+        self.login_lock = FileLock(lock_dir) if lock_dir else None
+        self._logins = SingleFlight()
+        # Session of the last deprecated build_auth_task call
+        self._legacy_session: LoginSession = None
 
         self._setup_logging()
 
@@ -77,13 +160,24 @@ class AgentAuth:
         """
         Performs automated authentication on the specified website.
 
-        This method will:
+        If a session cache is configured and holds unexpired cookies for the
+        website and username, they are returned immediately. If a playbook
+        store holds a recorded login for the site, it is replayed without
+        the LLM, and the agent only runs if the replay fails. Otherwise this
+        method will:
         1. Launch a browser (local or remote)
         2. Navigate to the website
         3. Attempt to log in using available credentials
         4. Handle any additional verification steps (TOTP, email verification)
         5. Return the authenticated session cookies
 
+        Concurrent calls for the same site (hostname) and username share one
+        login, and each gets a copy of its cookies or its exception. Waiting
+        callers do not start a browser or trigger another email code.
+
+        Each phase is timed as a `Span` and passed to the metrics hooks, and
+        the phase durations and LLM usage are logged when the login ends.
+
         Args:
             website (str): The URL of the website to authenticate with
             username (str): The username to authenticate with
@@ -99,142 +193,381 @@ class AgentAuth:
             RuntimeError: If authentication fails
             LookupError: If required credentials are not found
         """
-        self.website = website
-        self.username = username
-        self.log_auth_event("started login attempt")
+        key = (normalize_host(website), username)
+        if self._logins.in_flight(key):
+            logger.info("joined in-flight login", agent_id=self.agent_id, website=website, username=username)
+        cookies = await self._logins.do(key, lambda: self._login(website, username, cdp_url, headless))
+        return [dict(cookie) for cookie in cookies]
+
+    async def _login(self, website: str, username: str, cdp_url: str, headless: bool) -> list:
+        session = self._new_session(website, username)
+
+        with track_llm_usage(session.metrics) as llm_usage:
+            try:
+                with session.metrics.span("auth") as auth_span:
+                    try:
+                        async with self._login_lock(session):
+                            return await self._auth(session, cdp_url, headless, llm_usage, auth_span)
+                    finally:
+                        auth_span.attributes.update(llm_usage.as_attributes())
+            finally:
+                session.log_auth_event("recorded login timings", phases=session.metrics.durations(), **auth_span.attributes)
+
+    @asynccontextmanager
+    async def _login_lock(self, session: LoginSession) -> AsyncIterator[None]:
+        async with AsyncExitStack() as stack:
+            if self.login_lock:
+                with session.metrics.span("lock_wait"):
+                    await stack.enter_async_context(self.login_lock.hold(f"{normalize_host(session.website)}\0{session.username}"))
+            yield
+
+    async def _auth(self, session: LoginSession, cdp_url: str, headless: bool, llm_usage: LLMUsage, auth_span: Span) -> dict:
+        website, username, metrics = session.website, session.username, session.metrics
+
+        if self.session_cache:
+            with metrics.span("cache_lookup") as span:
+                cookies = self.session_cache.get(website, username)
+                span.attributes["hit"] = cookies is not None
+            if cookies is not None:
+                auth_span.attributes["cached"] = True
+                session.log_auth_event("reused cached session")
+                return cookies
+
+        session.log_auth_event("started login attempt")
+        with metrics.span("credential_lookup"):
+            await session.resolve_credential()
+
+        cookies = await self._browser_auth(session, cdp_url, headless, llm_usage, auth_span)
+
+        if self.session_cache:
+            with metrics.span("cache_store"):
+                self.session_cache.set(website, username, cookies)
 
-        browser_config = BrowserConfig(
-            headless=headless,
-            cdp_url=cdp_url
-        )
-        browser = Browser(config=browser_config)
-        browser_context = await browser.new_context()
+        return cookies
 
-        self.controller = Controller()
-        task, sensitive_data = self.build_auth_task(website, username)
+    async def _browser_auth(self, session: LoginSession, cdp_url: str, headless: bool, llm_usage: LLMUsage, auth_span: Span) -> list:
+        website, metrics = session.website, session.metrics
+
+        async with AsyncExitStack() as stack:
+            with metrics.span("browser_launch", pooled=self.browser_pool is not None):
+                browser_context = await stack.enter_async_context(self._browser_context(cdp_url, headless))
+
+            task, sensitive_data = session.build_auth_task()
+
+            replayed = False
+            playbook = self.playbook_store.get(website) if self.playbook_store else None
+            if playbook is not None:
+                replayed = await self._replay(session, playbook, browser_context, sensitive_data)
+                auth_span.attributes["replayed"] = replayed
+
+            if not replayed:
+                agent = Agent(
+                    task=task,
+                    llm=self.llm,
+                    sensitive_data=sensitive_data,
+                    browser=browser_context.browser,
+                    browser_context=browser_context,
+                    controller=session.controller,
+                )
+
+                with metrics.span("agent_run") as span:
+                    lookup_seconds = _lookup_seconds(metrics.spans)
+                    history = await agent.run()
+                    span.attributes["steps"] = len(history.history)
+                    span.attributes.update(llm_usage.as_attributes())
+                # Time in the agent run not spent on the LLM or lookups went to
+                # page navigation and browser actions
+                auth_span.attributes["browser_seconds"] = round(
+                    span.duration - llm_usage.seconds - (_lookup_seconds(metrics.spans) - lookup_seconds), 3
+                )
+
+                if not history.is_done():
+                    raise RuntimeError("Failed to authenticate")
+
+                if self.playbook_store:
+                    playbook = Playbook.from_history(website, history, sensitive_data)
+                    if playbook is not None:
+                        self.playbook_store.set(playbook)
+                        session.log_auth_event("recorded login playbook", steps=len(playbook.steps))
+
+            session.log_auth_event("authentication successful")
+
+            with metrics.span("cookie_export"):
+                browser_session = await browser_context.get_session()
+                cookies = await browser_session.context.cookies()
 
-        agent = Agent(
-            task=task,
-            llm=self.llm,
-            sensitive_data=sensitive_data,
-            browser=browser,
-            browser_context=browser_context,
-            controller=self.controller,
-        )
-        
-        history = await agent.run()
+        return cookies
 
-        if not history.is_done():
-            raise RuntimeError("Failed to authenticate")
-        
-        self.log_auth_event("authentication successful")
+    async def ensure_session(
+        self,
+        website: str,
+        username: str,
+        cookies: List[dict],
+        probe: SessionProbe,
+        cdp_url: str = None,
+        headless: bool = True,
+    ) -> List[dict]:
+        """
+        Returns existing session cookies if they are still logged in, and
+        logs in again with `auth` only if they are not.
 
-        session = await browser_context.get_session()
-        cookies =  await session.context.cookies()
-        
-        await browser_context.close()
-        await browser.close()
+        The probe requests a page only logged-in users can see, over HTTP or
+        in a browser (from the browser pool, if configured). If the probe
+        fails or cannot reach the site, any cached session for the website
+        and username is discarded and `auth` runs.
+
+        Args:
+            website (str): The URL of the website to authenticate with
+            username (str): The username to authenticate with
+            cookies (List[dict]): Cookies from an earlier login. May be empty.
+            probe (SessionProbe): Check of whether the cookies are logged in
+            cdp_url (str, optional): CDP URL for remote browser service, used
+                by browser probes and by `auth`
+            headless (bool, optional): Whether to run the browser in headless mode.
+                Defaults to True.
+
+        Returns:
+            List[dict]: The given cookies if they are valid, otherwise the
+                cookies of a new login
+
+        Raises:
+            RuntimeError: If authentication fails
+            LookupError: If required credentials are not found
+
+        Example:
+            ```python
+            probe = SessionProbe("https://www.example.com/account", text="Sign out")
+            cookies = await aa.ensure_session("https://www.example.com", "user@example.com", cookies, probe)
+            ```
+        """
+        if cookies:
+            login_id = generate_id()
+            metrics = SpanRecorder(website, login_id, self.metrics_hooks)
+            with metrics.span("session_probe", browser=probe.browser) as span:
+                try:
+                    if probe.browser:
+                        async with self._browser_context(cdp_url, headless) as browser_context:
+                            valid = await probe.check(cookies, browser_context)
+                    else:
+                        valid = await probe.check(cookies)
+                except Exception as e:
+                    logger.warning("session probe failed", agent_id=self.agent_id, login_id=login_id, website=website, username=username, error=str(e))
+                    valid = False
+                span.attributes["valid"] = valid
+
+            if valid:
+                logger.info("reused valid session", agent_id=self.agent_id, login_id=login_id, website=website, username=username)
+                return cookies
+
+        if self.session_cache:
+            self.session_cache.invalidate(website, username)
+        return await self.auth(website, username, cdp_url=cdp_url, headless=headless)
+
+    async def auth_many(
+        self,
+        jobs: Iterable[tuple],
+        concurrency: int = 4,
+        headless: bool = True,
+    ) -> AsyncIterator[AuthResult]:
+        """
+        Authenticates many website/username pairs concurrently.
+
+        Jobs are pulled lazily from the iterable, so a job's CDP URL can be
+        created right before it runs. At most `concurrency` logins run at
+        once. Results are yielded as soon as each login finishes, which is
+        not necessarily the input order. A failed job is reported through
+        `AuthResult.error` and does not abort the batch.
+
+        Args:
+            jobs (Iterable[tuple]): Tuples of (website, username) or
+                (website, username, cdp_url)
+            concurrency (int, optional): Maximum number of logins in flight.
+                Defaults to 4.
+            headless (bool, optional): Whether to run local browsers in headless mode.
+                Defaults to True.
+
+        Yields:
+            AuthResult: The outcome of each job, in completion order
+
+        Example:
+            ```python
+            jobs = [(c.website, c.username) for c in credential_manager.credentials]
+            async for result in aa.auth_many(jobs, concurrency=8):
+                if result.ok:
+                    print(result.website, len(result.cookies))
+                else:
+                    print(result.website, result.error)
+            ```
+        """
+        if concurrency < 1:
+            raise ValueError("concurrency must be at least 1")
+
+        job_iterator = enumerate(jobs)
+        results: asyncio.Queue = asyncio.Queue()
+
+        async def run_jobs():
+            for index, job in job_iterator:
+                job = tuple(job)
+                website, username, cdp_url = (job + (None, None, None))[:3]
+                start = time.perf_counter()
+                try:
+                    if len(job) not in (2, 3):
+                        raise ValueError(f"Expected (website, username[, cdp_url]), got {job!r}")
+                    cookies = await self.auth(website, username, cdp_url=cdp_url, headless=headless)
+                except Exception as e:
+                    result = AuthResult(index, website, username, cdp_url, error=e)
+                else:
+                    result = AuthResult(index, website, username, cdp_url, cookies=cookies)
+                result.duration = time.perf_counter() - start
+                await results.put(result)
+
+        workers = [asyncio.create_task(run_jobs()) for _ in range(concurrency)]
+        running = len(workers)
+        for worker in workers:
+            worker.add_done_callback(lambda _: results.put_nowait(None))
+
+        try:
+            while running:
+                result = await results.get()
+                if result is None:
+                    running -= 1
+                    continue
+                yield result
+        finally:
+            for worker in workers:
+                worker.cancel()
+            await asyncio.gather(*workers, return_exceptions=True)
+
+        # Surface unexpected errors from iterating the jobs themselves
+        for worker in workers:
+            if not worker.cancelled() and worker.exception():
+                raise worker.exception()
+
+    async def close(self):
+        """
+        Close the browser pool and inbox connection, and stop the credential
+        manager's background refreshes. Call once when shutting down a
+        long-running process.
+        """
+        if self.browser_pool:
+            await self.browser_pool.close()
+        if self.email_service:
+            await self.email_service.close()
+        await self.credential_manager.close()
 
-        return cookies
-    
     def build_auth_task(self, website: str, username: str) -> tuple[str, dict]:
-        task_components = [f"""Navigate to "x_website" and log in with username "x_username". Use the following guidance:"""]
-        sensitive_data = {
-            "x_website": website,
-            "x_username": username
-        }
-
-        if self._can_lookup_password():
-            password = self.lookup_password()
-            sensitive_data["x_password"] = password
-            task_components.append(f"""- If a password is needed, use the password "x_password" """)
-
-        if self._can_lookup_totp():
-            self.controller.action("Look up the TOTP code")(self.lookup_totp)
-            task_components.append("- If a TOTP code is needed, look up the TOTP code")
-
-        if self._can_lookup_email_code():
-            self.controller.action("Look up the email code")(self.lookup_email_code)
-            task_components.append("- If an email code is needed, look up the email code")
-
-        if self._can_lookup_email_link():
-            self.controller.action("Look up the email link")(self.lookup_email_link)
-            task_components.append("- If an email link is needed, look up the email link and navigate to the link")
-
-        # Prevent social sign in for now... may revist this later
-        task_components.append("- Do not attempt to Sign in with Google.")
-        task_components.append("- Do not attempt to Sign in with Apple.")
-        task_components.append("- Do not attempt to Sign in with Facebook.")
-        task_components.append("- Do not attempt to Sign in with Twitter.")
-        task_components.append("- Do not attempt to Sign in with Microsoft.")
-        task_components.append("- Do not attempt to Sign in with Amazon.")
-        task_components.append("- Do not attempt to Sign in with LinkedIn.")
-        task_components.append("- Do not attempt to Sign in with GitHub.")
-        task_components.append("- Do not attempt to Sign in with SSO.")
-
-        task_components.append("- Do not attempt to reset a password.")
-
-        task = "\n".join(task_components)
+        """
+        Build the agent task and sensitive data for a login.
+
+        Deprecated: every `auth` call now builds its task in its own
+        `LoginSession`. Use `LoginSession.build_auth_task` instead. This
+        builds the task in a new session and keeps that session for the
+        deprecated `lookup_*` methods.
+
+        Args:
+            website (str): The website to log into
+            username (str): The username to log in with
 
+        Returns:
+            tuple[str, dict]: The task and the sensitive data it refers to
+        """
+        _warn_deprecated("AgentAuth.build_auth_task", "LoginSession.build_auth_task")
+        session = self._new_session(website, username)
+        task, sensitive_data = session.build_auth_task()
+        self._legacy_session = session
+        self.website = website
+        self.username = username
+        self.controller = session.controller
         return task, sensitive_data
-    
-    def _can_lookup_password(self) -> bool:
-        return bool(
-            self.credential_manager and 
-            self.credential_manager.get_credential(self.website, self.username) and
-            self.credential_manager.get_credential(self.website, self.username).password
-        )
 
     def lookup_password(self) -> str:
-        if not self._can_lookup_password():
-            raise LookupError("Cannot lookup password")
-        
-        password = self.credential_manager.get_credential(self.website, self.username).password
-        self.log_auth_event("retrieved password")
-        return password
-  
-    def _can_lookup_totp(self) -> bool:
-        return bool(
-            self.credential_manager and 
-            self.credential_manager.get_credential(self.website, self.username) and
-            self.credential_manager.get_credential(self.website, self.username).totp()
-        )
+        """
+        Deprecated: use `LoginSession.lookup_password`.
+        """
+        _warn_deprecated("AgentAuth.lookup_password", "LoginSession.lookup_password")
+        return self._require_legacy_session("password").lookup_password()
 
     def lookup_totp(self) -> str:
-        if not self._can_lookup_totp():
-            raise LookupError("Cannot lookup TOTP")
-
-        totp = self.credential_manager.get_credential(self.website, self.username).totp()
-        self.log_auth_event("retrieved TOTP")
-        return totp
-    
-    def _can_lookup_email_code(self) -> bool:
-        return bool(self.email_service)
-
-    def lookup_email_code(self) -> str:
-        if not self._can_lookup_email_code():
-            raise LookupError("Cannot lookup email code")
-
-        code = self.email_service.get_code(self.login_start_time)
-        self.log_auth_event("retreived email code", imap_username=self.email_service.imap_username)
-        return code
-
-    def _can_lookup_email_link(self) -> bool:
-        return bool(self.email_service)
-
-    def lookup_email_link(self) -> str:
-        if not self._can_lookup_email_link():
-            raise LookupError("Cannot lookup email link")
-
-        link = self.email_service.get_link(self.login_start_time)
-        self.log_auth_event("retreived email link", imap_username=self.email_service.imap_username)
-        return link
-    
+        """
+        Deprecated: use `LoginSession.lookup_totp`.
+        """
+        _warn_deprecated("AgentAuth.lookup_totp", "LoginSession.lookup_totp")
+        return self._require_legacy_session("TOTP").lookup_totp()
+
+    async def lookup_email_code(self) -> str:
+        """
+        Deprecated: use `LoginSession.lookup_email_code`.
+        """
+        _warn_deprecated("AgentAuth.lookup_email_code", "LoginSession.lookup_email_code")
+        return await self._require_legacy_session("email code").lookup_email_code()
+
+    async def lookup_email_link(self) -> str:
+        """
+        Deprecated: use `LoginSession.lookup_email_link`.
+        """
+        _warn_deprecated("AgentAuth.lookup_email_link", "LoginSession.lookup_email_link")
+        return await self._require_legacy_session("email link").lookup_email_link()
+
     def log_auth_event(self, event: str, **kwargs):
-        logger.info(
-            event,
+        """
+        Deprecated: use `LoginSession.log_auth_event`.
+        """
+        _warn_deprecated("AgentAuth.log_auth_event", "LoginSession.log_auth_event")
+        if self._legacy_session is not None:
+            self._legacy_session.log_auth_event(event, **kwargs)
+        else:
+            logger.info(event, agent_id=self.agent_id, **kwargs)
+
+    def _require_legacy_session(self, secret: str) -> LoginSession:
+        if self._legacy_session is None:
+            raise LookupError(f"Cannot lookup {secret}")
+        return self._legacy_session
+
+    async def _replay(self, session: LoginSession, playbook: Playbook, browser_context: BrowserContext, sensitive_data: dict) -> bool:
+        with session.metrics.span("playbook_replay", steps=len(playbook.steps)) as span:
+            try:
+                await playbook.replay(browser_context, session, sensitive_data, self.playbook_store.step_timeout)
+            except Exception as e:
+                span.error = type(e).__name__
+                self.playbook_store.record_failure(playbook)
+                session.log_auth_event("playbook replay failed, falling back to agent", error=str(e))
+                return False
+
+        self.playbook_store.record_success(playbook)
+        session.log_auth_event("replayed login playbook", steps=len(playbook.steps))
+        return True
+
+    @asynccontextmanager
+    async def _browser_context(self, cdp_url: str, headless: bool) -> AsyncIterator[BrowserContext]:
+        if self.browser_pool:
+            async with self.browser_pool.context(cdp_url=cdp_url, headless=headless) as browser_context:
+                yield browser_context
+            return
+
+        browser_config = BrowserConfig(
+            headless=headless,
+            cdp_url=cdp_url
+        )
+        browser = Browser(config=browser_config)
+        browser_context = await browser.new_context()
+        try:
+            yield browser_context
+        finally:
+            await browser_context.close()
+            await browser.close()
+
+    def _new_session(self, website: str, username: str) -> LoginSession:
+        return LoginSession(
+            website,
+            username,
             agent_id=self.agent_id,
-            website=self.website,
-            username=self.username,
-            **kwargs
+            credential_manager=self.credential_manager,
+            email_service=self.email_service,
+            metrics_hooks=self.metrics_hooks,
         )
+
+def _lookup_seconds(spans: List[Span]) -> float:
+    return sum(span.duration for span in spans if span.name.startswith("lookup_"))
+
+def _warn_deprecated(name: str, replacement: str):
+    warnings.warn(f"{name} is deprecated, use {replacement} instead", DeprecationWarning, stacklevel=3)
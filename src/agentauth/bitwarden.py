@@ -0,0 +1,123 @@
+import json
+from typing import Iterator
+from urllib.error import HTTPError, URLError
+from urllib.request import Request, urlopen
+
+from agentauth import logger
+from agentauth.json_stream import iter_array
+
+class BitwardenServeClient:
+    """
+    BitwardenServeClient talks to the Vault Management API of a local
+    `bw serve` process.
+
+    `bw serve` keeps one logged-in CLI session alive, so repeated loads skip
+    CLI startup and login. Once the vault is unlocked, it stays unlocked
+    until `lock()` is called or the server stops. The vault is only synced
+    with the Bitwarden server when `sync()` is called, and items are parsed
+    as they are read from the response rather than after downloading the
+    whole vault.
+
+    Start the server once with the Bitwarden CLI:
+
+        ```bash
+        BW_CLIENTID=... BW_CLIENTSECRET=... bw login --apikey
+        bw serve --hostname localhost --port 8087
+        ```
+
+    Args:
+        url (str, optional): Base URL of `bw serve`. Defaults to "http://localhost:8087".
+        timeout (float, optional): Seconds to wait for each request. Defaults to 30.
+    """
+
+    def __init__(self, url: str = "http://localhost:8087", timeout: float = 30):
+        self.url = url.rstrip("/")
+        self.timeout = timeout
+
+    def status(self) -> str:
+        """
+        Get the vault status.
+
+        Returns:
+            str: "unauthenticated", "locked" or "unlocked"
+        """
+        return self._request("GET", "/status")["data"]["template"]["status"]
+
+    def ensure_unlocked(self, master_password: str = None):
+        """
+        Unlock the vault if it is locked, reusing the session otherwise.
+
+        Args:
+            master_password (str, optional): Master password, needed only if the vault is locked
+
+        Raises:
+            RuntimeError: If the CLI is not logged in, or the vault is locked
+                and no master password is given
+        """
+        status = self.status()
+        if status == "unauthenticated":
+            raise RuntimeError("Bitwarden CLI is not logged in, run `bw login` before `bw serve`")
+        if status == "locked":
+            if not master_password:
+                raise RuntimeError("Bitwarden vault is locked and no master password was given")
+            self.unlock(master_password)
+
+    def unlock(self, master_password: str):
+        """
+        Unlock the vault for all following requests.
+
+        Args:
+            master_password (str): Master password for the vault
+
+        Raises:
+            RuntimeError: If the password is wrong or the server cannot be reached
+        """
+        self._request("POST", "/unlock", {"password": master_password})
+        logger.info("unlocked Bitwarden vault", url=self.url)
+
+    def lock(self):
+        """
+        Lock the vault.
+        """
+        self._request("POST", "/lock")
+
+    def sync(self):
+        """
+        Pull the latest vault data from the Bitwarden server.
+        """
+        self._request("POST", "/sync")
+        logger.info("synced Bitwarden vault", url=self.url)
+
+    def iter_items(self) -> Iterator[dict]:
+        """
+        Yield vault items one at a time as they are read from the response.
+
+        Yields:
+            dict: A Bitwarden item, as returned by `bw list items`
+
+        Raises:
+            RuntimeError: If the vault is locked or the server cannot be reached
+        """
+        with self._open("GET", "/list/object/items") as response:
+            yield from iter_array(response, ("data", "data"))
+
+    def _request(self, method: str, path: str, body: dict = None) -> dict:
+        with self._open(method, path, body) as response:
+            result = json.load(response)
+        if not result.get("success"):
+            raise RuntimeError(f"Bitwarden request {method} {path} failed: {result.get('message')}")
+        return result
+
+    def _open(self, method: str, path: str, body: dict = None):
+        data = json.dumps(body).encode() if body is not None else None
+        request = Request(self.url + path, data=data, method=method, headers={"Content-Type": "application/json"})
+        try:
+            return urlopen(request, timeout=self.timeout)
+        except HTTPError as e:
+            try:
+                message = json.load(e).get("message")
+            except ValueError:
+                message = e.reason
+            raise RuntimeError(f"Bitwarden request {method} {path} failed: {message}") from e
+        except URLError as e:
+            raise RuntimeError(f"Failed to reach Bitwarden CLI server at {self.url}: {e.reason}") from e
@@ -0,0 +1,243 @@
+import asyncio
+from collections import deque
+from contextlib import asynccontextmanager
+import time
+from typing import AsyncIterator, Deque, Dict, Tuple
+
+from browser_use import Browser, BrowserConfig
+from browser_use.browser.context import BrowserContext
+
+from agentauth import logger
+
+class _PooledBrowser:
+    __slots__ = ("browser", "uses", "last_used", "launch_seconds")
+
+    def __init__(self, browser: Browser, launch_seconds: float):
+        self.browser = browser
+        self.uses = 0
+        self.last_used = time.monotonic()
+        self.launch_seconds = launch_seconds
+
+    def is_healthy(self) -> bool:
+        playwright_browser = self.browser.playwright_browser
+        return playwright_browser is not None and playwright_browser.is_connected()
+
+class BrowserPool:
+    """
+    BrowserPool keeps launched browsers warm and reuses them across
+    `AgentAuth.auth` calls, so most logins skip the browser launch.
+
+    Browsers are pooled per (cdp_url, headless) pair. Every checkout gets a
+    fresh, isolated browser context that is closed when the login ends. For
+    remote CDP browsers, where browser-use reuses the remote default context,
+    cookies are cleared and pages are closed before the browser goes back
+    into the pool.
+
+    A browser is checked for a live connection before reuse. It is closed
+    after `max_uses` logins, after sitting idle for `idle_timeout` seconds,
+    or when more than `max_idle` browsers are idle. Idle browsers are closed
+    by a background task, so they do not linger when no more logins come.
+
+    Args:
+        max_idle (int, optional): Maximum number of idle browsers kept per
+            (cdp_url, headless) pair. Defaults to 4.
+        max_uses (int, optional): Number of logins after which a browser is
+            recycled. Defaults to 50.
+        idle_timeout (float, optional): Seconds an idle browser is kept before
+            it is closed. Defaults to 300.
+
+    Example:
+        ```python
+        pool = BrowserPool(max_idle=8)
+        await pool.warm(4)
+
+        aa = AgentAuth(credential_manager=credential_manager, browser_pool=pool)
+        cookies = await aa.auth("https://www.example.com", "user@example.com")
+
+        print(pool.metrics())
+        await pool.close()
+        ```
+    """
+
+    def __init__(self, max_idle: int = 4, max_uses: int = 50, idle_timeout: float = 300):
+        self.max_idle = max_idle
+        self.max_uses = max_uses
+        self.idle_timeout = idle_timeout
+
+        self._idle: Dict[Tuple[str, bool], Deque[_PooledBrowser]] = {}
+        self._in_use = 0
+        self._closed = False
+        self._reaper: asyncio.Task = None
+
+        self._hits = 0
+        self._misses = 0
+        self._launches = 0
+        self._launch_seconds = 0.0
+        self._launch_seconds_saved = 0.0
+        self._recycled = 0
+        self._expired = 0
+        self._unhealthy = 0
+
+    async def warm(self, count: int, cdp_url: str = None, headless: bool = True):
+        """
+        Launch browsers ahead of time so the first logins are pool hits.
+
+        Args:
+            count (int): Number of browsers to launch
+            cdp_url (str, optional): CDP URL of a remote browser to connect to
+            headless (bool, optional): Whether to launch headless browsers. Defaults to True.
+        """
+        pooled_browsers = await asyncio.gather(*(self._launch(cdp_url, headless) for _ in range(count)))
+        for pooled_browser in pooled_browsers:
+            await self._release(cdp_url, headless, pooled_browser)
+
+    @asynccontextmanager
+    async def context(self, cdp_url: str = None, headless: bool = True) -> AsyncIterator[BrowserContext]:
+        """
+        Check out a browser and yield a fresh browser context on it.
+
+        Args:
+            cdp_url (str, optional): CDP URL of a remote browser to connect to
+            headless (bool, optional): Whether to use a headless browser. Defaults to True.
+
+        Yields:
+            BrowserContext: A browser-use context whose `browser` attribute is the pooled browser
+        """
+        if self._closed:
+            raise RuntimeError("Browser pool is closed")
+
+        pooled_browser = await self._acquire(cdp_url, headless)
+        self._in_use += 1
+        browser_context = None
+        try:
+            browser_context = await pooled_browser.browser.new_context()
+            yield browser_context
+        finally:
+            self._in_use -= 1
+            pooled_browser.uses += 1
+            if browser_context is not None:
+                await self._close_context(browser_context, cdp_url)
+            await self._release(cdp_url, headless, pooled_browser)
+
+    def metrics(self) -> dict:
+        """
+        Get pool usage metrics.
+
+        Returns:
+            dict: Counters for pool hits and misses, browser launches, total
+                launch time, launch time saved by reuse, and browsers recycled,
+                expired or found unhealthy, plus current idle and in-use counts
+        """
+        return {
+            "hits": self._hits,
+            "misses": self._misses,
+            "launches": self._launches,
+            "launch_seconds": self._launch_seconds,
+            "launch_seconds_saved": self._launch_seconds_saved,
+            "recycled": self._recycled,
+            "expired": self._expired,
+            "unhealthy": self._unhealthy,
+            "idle": sum(len(idle) for idle in self._idle.values()),
+            "in_use": self._in_use,
+        }
+
+    async def close(self):
+        """
+        Close all idle browsers and stop accepting checkouts. Browsers that are
+        in use are closed when they are returned.
+        """
+        self._closed = True
+        if self._reaper is not None:
+            self._reaper.cancel()
+            self._reaper = None
+        idle = [pooled_browser for pool in self._idle.values() for pooled_browser in pool]
+        self._idle.clear()
+        await asyncio.gather(*(pooled_browser.browser.close() for pooled_browser in idle))
+
+    async def _acquire(self, cdp_url: str, headless: bool) -> _PooledBrowser:
+        idle = self._idle.get((cdp_url, headless))
+        now = time.monotonic()
+
+        while idle:
+            pooled_browser = idle.pop()
+            if now - pooled_browser.last_used > self.idle_timeout:
+                self._expired += 1
+                await pooled_browser.browser.close()
+            elif not pooled_browser.is_healthy():
+                self._unhealthy += 1
+                await pooled_browser.browser.close()
+            else:
+                self._hits += 1
+                self._launch_seconds_saved += self._average_launch_seconds()
+                return pooled_browser
+
+        self._misses += 1
+        return await self._launch(cdp_url, headless)
+
+    async def _launch(self, cdp_url: str, headless: bool) -> _PooledBrowser:
+        browser = Browser(config=BrowserConfig(headless=headless, cdp_url=cdp_url))
+        start = time.perf_counter()
+        await browser.get_playwright_browser()
+        launch_seconds = time.perf_counter() - start
+
+        self._launches += 1
+        self._launch_seconds += launch_seconds
+        logger.info("launched pooled browser", launch_seconds=round(launch_seconds, 3), remote=bool(cdp_url))
+        return _PooledBrowser(browser, launch_seconds)
+
+    async def _release(self, cdp_url: str, headless: bool, pooled_browser: _PooledBrowser):
+        if self._closed or not pooled_browser.is_healthy():
+            await pooled_browser.browser.close()
+            return
+
+        if pooled_browser.uses >= self.max_uses:
+            self._recycled += 1
+            await pooled_browser.browser.close()
+            return
+
+        pooled_browser.last_used = time.monotonic()
+        idle = self._idle.setdefault((cdp_url, headless), deque())
+        idle.append(pooled_browser)
+
+        if self._reaper is None or self._reaper.done():
+            self._reaper = asyncio.create_task(self._reap())
+
+        # Close the least recently used browsers beyond the idle limit
+        while len(idle) > self.max_idle:
+            await idle.popleft().browser.close()
+
+    async def _reap(self):
+        # Idle browsers are kept in release order, so the oldest is first
+        while not self._closed:
+            oldest = min((idle[0].last_used for idle in self._idle.values() if idle), default=None)
+            if oldest is None:
+                return
+            await asyncio.sleep(max(0, oldest + self.idle_timeout - time.monotonic()))
+
+            now = time.monotonic()
+            for idle in list(self._idle.values()):
+                while idle and now - idle[0].last_used >= self.idle_timeout:
+                    self._expired += 1
+                    await idle.popleft().browser.close()
+
+    async def _close_context(self, browser_context: BrowserContext, cdp_url: str):
+        session = browser_context.session
+        if cdp_url and session is not None:
+            # browser-use reuses the remote default context, so wipe it instead
+            try:
+                await session.context.clear_cookies()
+                pages = session.context.pages
+                for page in pages[1:]:
+                    await page.close()
+                if pages:
+                    await pages[0].goto("about:blank")
+            except Exception as e:
+                logger.warning("failed to reset pooled remote browser context", error=str(e))
+            browser_context.session = None
+            return
+        await browser_context.close()
+
+    def _average_launch_seconds(self) -> float:
+        if not self._launches:
+            return 0.0
+        return self._launch_seconds / self._launches
@@ -0,0 +1,30 @@
+"""
+Command-line entry point, installed as `agentauth`.
+
+Usage:
+    agentauth serve --setup myapp.auth:create_agentauth [--socket /run/agentauth.sock]
+    agentauth workers --queue jobs.db --setup myapp.auth:create_agentauth [--processes 4]
+"""
+
+import importlib
+import sys
+from typing import List
+
+COMMANDS = {
+    "serve": ("agentauth.server", "Serve logins over a local HTTP API"),
+    "workers": ("agentauth.worker_pool", "Run logins from a job queue in several worker processes"),
+}
+
+def main(argv: List[str] = None):
+    argv = sys.argv[1:] if argv is None else argv
+    if not argv or argv[0] not in COMMANDS:
+        print("usage: agentauth {serve,workers} ...\n\ncommands:", file=sys.stderr)
+        for name, (_, description) in COMMANDS.items():
+            print(f"  {name:<10}{description}", file=sys.stderr)
+        sys.exit(0 if argv[:1] in (["-h"], ["--help"]) else 2)
+
+    module_name, _ = COMMANDS[argv[0]]
+    importlib.import_module(module_name).main(argv[1:])
+
+if __name__ == "__main__":
+    main()
@@ -1,5 +1,26 @@
+import sys
+from typing import TYPE_CHECKING
+
 import pyotp
-from urllib.parse import urlparse
+
+from agentauth.credential_index import normalize_host
+
+if TYPE_CHECKING:
+    from agentauth.credential_source import CredentialSource
+
+class _CachedTOTP(pyotp.TOTP):
+    """
+    A TOTP generator that base32-decodes its secret only once.
+    """
+
+    def __init__(self, s: str, **kwargs):
+        super().__init__(s, **kwargs)
+        self._byte_secret = None
+
+    def byte_secret(self) -> bytes:
+        if self._byte_secret is None:
+            self._byte_secret = super().byte_secret()
+        return self._byte_secret
 
 class Credential:
     """
@@ -9,6 +30,10 @@ class Credential:
     The class provides methods to generate TOTP codes and match credentials
     against a website/username pair.
 
+    Credentials use __slots__ and intern their website and username strings,
+    so large vaults held by long-running workers stay compact. The TOTP
+    generator is created on first use and cached on the credential.
+
     Args:
         website (str): The website URL these credentials are for
         username (str): The username or email for the account
@@ -16,6 +41,8 @@ class Credential:
         totp_secret (str, optional): The TOTP secret for generating 2FA codes
     """
 
+    __slots__ = ("website", "username", "password", "_totp_secret", "_totp")
+
     def __init__(self, website: str, username: str, password: str = None, totp_secret: str = None):
         """
         Initialize a new Credential object.
@@ -26,11 +53,27 @@ class Credential:
             password (str, optional): The password for the account
             totp_secret (str, optional): The TOTP secret for generating 2FA codes
         """
-        self.website = website
-        self.username = username
+        self.website = sys.intern(website) if isinstance(website, str) else website
+        self.username = sys.intern(username) if isinstance(username, str) else username
         self.password = password
         self.totp_secret = totp_secret
 
+    @property
+    def totp_secret(self) -> str:
+        return self._totp_secret
+
+    @totp_secret.setter
+    def totp_secret(self, totp_secret: str):
+        self._totp_secret = totp_secret
+        self._totp = None
+
+    @property
+    def has_totp(self) -> bool:
+        """
+        Whether a TOTP secret is set. This never generates a code.
+        """
+        return bool(self._totp_secret)
+
     def totp(self) -> str:
         """
         Generate the current TOTP code using the stored secret.
@@ -41,18 +84,19 @@ class Credential:
         Note:
             TOTP codes are time-based and typically valid for 30 seconds
         """
-        if self.totp_secret:
-            totp = pyotp.TOTP(self.totp_secret)
-            return totp.now()
-        return None
+        if not self._totp_secret:
+            return None
+        if self._totp is None:
+            self._totp = _CachedTOTP(self._totp_secret)
+        return self._totp.now()
     
     def matches_website_and_username(self, website: str, username: str) -> bool:
         """
         Check if this credential matches a given website and username.
 
-        The website matching is done by comparing the hostnames (domain names)
-        rather than the exact URLs. This allows matching regardless of protocol
-        (http vs https) and path.
+        The website matching is done by comparing the normalized hostnames
+        (domain names) rather than the exact URLs. This allows matching
+        regardless of protocol (http vs https), port, letter case and path.
 
         Args:
             website (str): The website URL to check against
@@ -61,6 +105,45 @@ class Credential:
         Returns:
             bool: True if both the website domain and username match
         """
-        host1 = urlparse(self.website).netloc
-        host2 = urlparse(website).netloc
-        return host1 == host2 and self.username == username
+        host1 = normalize_host(self.website)
+        host2 = normalize_host(website)
+        return bool(host1) and host1 == host2 and self.username == username
+
+class LazyCredential(Credential):
+    """
+    LazyCredential is a credential whose password and TOTP secret stay in the
+    password manager until they are needed.
+
+    It only holds the website, the username and a reference to the item in
+    its source, so `password` and `totp_secret` are None. Use `resolve()` or
+    `CredentialManager.aget_credential` to get a regular Credential with the
+    secrets filled in. The source keeps resolved secrets in a bounded cache
+    with a TTL.
+
+    Args:
+        website (str): The website URL these credentials are for
+        username (str): The username or email for the account
+        source (CredentialSource): The source that can resolve the item's secrets
+        item_id (str): The item's ID in the source
+    """
+
+    __slots__ = ("source", "item_id")
+
+    def __init__(self, website: str, username: str, source: "CredentialSource", item_id: str):
+        super().__init__(website, username)
+        self.source = source
+        self.item_id = item_id
+
+    async def resolve(self) -> Credential:
+        """
+        Fetch the secrets for this credential from its source.
+
+        Returns:
+            Credential: A credential with the same website and username, and
+                the item's password and TOTP secret
+
+        Raises:
+            LookupError: If the source cannot resolve the item's password
+        """
+        password, totp_secret = await self.source.resolve_secrets(self.item_id)
+        return Credential(self.website, self.username, password, totp_secret)
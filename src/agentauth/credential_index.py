@@ -0,0 +1,180 @@
+import ipaddress
+import re
+from typing import TYPE_CHECKING, Dict, Iterable, List, Optional, Tuple
+from urllib.parse import urlparse
+
+if TYPE_CHECKING:
+    from agentauth.credential import Credential
+
+DEFAULT_PORTS = {"http": 80, "https": 443}
+
+# An optional scheme and a plain hostname, without userinfo, port or IPv6
+# brackets, followed by the end or a path, query or fragment
+SIMPLE_URL = re.compile(r"(?:[A-Za-z][A-Za-z0-9+.-]*://)?([A-Za-z0-9.-]+)(?:[/?#]|$)")
+
+def normalize_host(website: str, port: bool = True) -> str:
+    """
+    Normalize a website URL to the host used for credential matching.
+
+    The scheme, path and any userinfo are dropped, the hostname is
+    lowercased and a trailing dot is removed. A port other than the
+    scheme's default is kept, so "example.com:8443" and "example.com:9443"
+    are different sites. IPv6 addresses keep their brackets (e.g.
+    "[::1]:8443"), so a normalized host normalizes to itself. Bare hostnames
+    without a scheme (e.g. "example.com/login") are also accepted.
+
+    Args:
+        website (str): The website URL or hostname to normalize
+        port (bool, optional): Whether to keep the port. Defaults to True.
+
+    Returns:
+        str: The normalized host, or an empty string if none is found
+    """
+    if not website:
+        return ""
+
+    # Most websites need no parsing beyond finding the hostname
+    match = SIMPLE_URL.match(website)
+    if match:
+        return match.group(1).lower().rstrip(".")
+
+    parsed = urlparse(website)
+    if not parsed.netloc and "://" not in website:
+        parsed = urlparse(f"//{website}")
+
+    try:
+        host = (parsed.hostname or "").rstrip(".")
+        number = parsed.port
+    except ValueError:
+        return ""
+
+    if ":" in host:
+        host = f"[{host}]"
+    if not host or not port or number is None or number == DEFAULT_PORTS.get(parsed.scheme.lower()):
+        return host
+    return f"{host}:{number}"
+
+def _candidate_hosts(host: str) -> List[str]:
+    # The host followed by each of its parent domains, closest first
+    if _is_ip_address(host):
+        return [host]
+    labels = host.split(".")
+    return [".".join(labels[i:]) for i in range(len(labels))]
+
+def _is_ip_address(host: str) -> bool:
+    if host.startswith("["):
+        # An IPv6 address
+        return True
+    if host.count(":") == 1:
+        host = host.partition(":")[0]
+    elif ":" not in host and not host.rpartition(".")[2].isdigit():
+        # Only IPv4 addresses end in a number
+        return False
+    try:
+        ipaddress.ip_address(host)
+    except ValueError:
+        return False
+    return True
+
+class CredentialIndex:
+    """
+    CredentialIndex provides constant-time credential lookup by normalized
+    host and username, with a fallback to parent domains.
+
+    Credentials are kept in a dictionary keyed by (host, username). When
+    there is no exact match, each parent domain of the host is looked up in
+    turn, so a lookup for "app.example.com" can fall back to a credential
+    stored for "example.com". The fallback costs O(labels) regardless of
+    how many credentials are indexed, and adding a credential costs a
+    single dictionary insert.
+
+    When several credentials share the same host and username, the first
+    one added wins, matching the original list-scan behavior. The others are
+    kept aside and take over, in order, if it is removed.
+    """
+
+    def __init__(self):
+        self._exact: Dict[Tuple[str, str], "Credential"] = {}
+        self._shadowed: Dict[Tuple[str, str], List["Credential"]] = {}
+
+    def __len__(self) -> int:
+        return len(self._exact)
+
+    def add(self, credential: "Credential"):
+        """
+        Add a credential to the index.
+
+        Args:
+            credential (Credential): The credential to index
+        """
+        host = normalize_host(credential.website)
+        if not host:
+            return
+
+        key = (host, credential.username)
+        if key in self._exact:
+            self._shadowed.setdefault(key, []).append(credential)
+            return
+        self._exact[key] = credential
+
+    def remove(self, credential: "Credential"):
+        """
+        Remove a credential from the index. Credentials that are not indexed
+        are ignored.
+
+        Args:
+            credential (Credential): The credential to remove
+        """
+        key = (normalize_host(credential.website), credential.username)
+
+        shadowed = self._shadowed.get(key)
+        if self._exact.get(key) is not credential:
+            if shadowed and credential in shadowed:
+                shadowed.remove(credential)
+                if not shadowed:
+                    del self._shadowed[key]
+            return
+
+        if shadowed:
+            self._exact[key] = shadowed.pop(0)
+            if not shadowed:
+                del self._shadowed[key]
+        else:
+            del self._exact[key]
+
+    def add_all(self, credentials: Iterable["Credential"]):
+        """
+        Add several credentials to the index.
+
+        Args:
+            credentials (Iterable[Credential]): The credentials to index
+        """
+        for credential in credentials:
+            self.add(credential)
+
+    def get(self, website: str, username: str, parents: bool = True) -> Optional["Credential"]:
+        """
+        Look up the credential for a website and username.
+
+        Args:
+            website (str): The website URL to find credentials for
+            username (str): The username to find credentials for
+            parents (bool, optional): Whether to fall back to parent domains. Defaults to True.
+
+        Returns:
+            Credential: The exact host match if there is one, otherwise the
+                credential for the closest parent domain, or None
+        """
+        host = normalize_host(website)
+        if not host:
+            return None
+
+        credential = self._exact.get((host, username))
+        if credential is not None or not parents:
+            return credential
+
+        for parent in _candidate_hosts(host)[1:]:
+            credential = self._exact.get((parent, username))
+            if credential is not None:
+                return credential
+        return None
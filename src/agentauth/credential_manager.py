@@ -1,22 +1,38 @@
+import asyncio
 import json
 import os
+import random
 import re
 import subprocess
-from typing import List
-
-from onepassword.client import Client
+import time
+from typing import TYPE_CHECKING, Any, BinaryIO, Dict, Iterator, List
 
 from agentauth import logger
-from agentauth.credential import Credential
+from agentauth.credential import Credential, LazyCredential
+from agentauth.credential_index import CredentialIndex, _candidate_hosts, normalize_host
+from agentauth.credential_source import BitwardenServeSource, CredentialSource, OnePasswordSource, bitwarden_credentials
+from agentauth.json_stream import iter_array
+
+if TYPE_CHECKING:
+    from agentauth.credential_snapshot import CredentialSnapshot
+
+class _SourceState:
+    __slots__ = ("revisions", "credentials", "lock")
+
+    def __init__(self):
+        self.revisions: Dict[str, Any] = {}
+        self.credentials: Dict[str, List[Credential]] = {}
+        self.lock = asyncio.Lock()
 
 class CredentialManager:
     """
     CredentialManager handles the storage and retrieval of authentication credentials.
-    It supports loading credentials from local JSON files and 1Password.
+    It supports loading credentials from local JSON files, 1Password and Bitwarden.
 
     The manager maintains an in-memory list of credentials that can be loaded
     from multiple sources. Each credential contains website, username, password,
-    and optional TOTP information.
+    and optional TOTP information. Every load method also adds the credentials
+    to an index keyed by hostname and username, so lookups do not scan the list.
 
     Example:
         ```python
@@ -27,6 +43,9 @@ class CredentialManager:
         
         # Load from 1Password
         await manager.load_1password("your_1password_token")
+
+        # Or load from 1Password and refresh changed items every 10 minutes
+        await manager.load_source(OnePasswordSource("your_1password_token"), refresh_interval=600)
         
         # Get credentials for a site
         cred = manager.get_credential("https://example.com", "user@example.com")
@@ -38,65 +57,54 @@ class CredentialManager:
         Initialize a new CredentialManager with an empty credential list.
         """
         self.credentials: List[Credential] = []
+        self._index = CredentialIndex()
+        self._sources: Dict[CredentialSource, _SourceState] = {}
+        self._refresh_tasks = set()
+        self._snapshots: List["CredentialSnapshot"] = []
 
-    async def load_1password(self, service_account_token: str):
+    def _add_credentials(self, credentials: List[Credential]):
+        self.credentials.extend(credentials)
+        self._index.add_all(credentials)
+
+    async def load_1password(self, service_account_token: str, concurrency: int = 8, batch_size: int = 100, lazy: bool = False):
         """
         Load credentials from a 1Password account using the Connect server API.
 
         This method will:
         1. Authenticate with 1Password using the service account token
-        2. Iterate through all vaults
-        3. Extract login items with usernames and passwords
-        4. Optionally extract TOTP secrets if available
+        2. List the items of all vaults concurrently
+        3. Resolve the username, password and TOTP secret of each login item
+           once, in batches, no matter how many websites the item has
+        4. Create a credential for every website of items with a username and password
+
+        Vault listings and secret resolution share a limit of `concurrency`
+        requests in flight. Secrets that fail to resolve are skipped. The load
+        time and number of resolve calls are logged.
+
+        With `lazy=True`, only usernames are kept in step 3; passwords are
+        resolved only to skip items without one. Passwords and TOTP secrets
+        are resolved again when `aget_credential` first returns the item, and
+        cached for a few minutes.
+
+        To keep the credentials up to date afterwards, use `load_source` with
+        a `OnePasswordSource` instead.
 
         Args:
             service_account_token (str): 1Password Connect server API token
+            concurrency (int, optional): Maximum concurrent 1Password requests. Defaults to 8.
+            batch_size (int, optional): Secret references per batch resolve call. Defaults to 100.
+            lazy (bool, optional): Whether to resolve passwords and TOTP secrets on
+                demand. Defaults to False.
 
         Raises:
             RuntimeError: If authentication fails
-            Exception: If credential extraction fails
+            Exception: If listing vaults or items fails
         """
-        client = await Client.authenticate(
-            auth=service_account_token,
-            integration_name="1Password Integration",
-            integration_version="v0.1.0"
-        )
-
-        new_credentials = []
+        source = OnePasswordSource(service_account_token, concurrency, batch_size, lazy=lazy)
+        _, changed = await source.fetch({})
+        new_credentials = [credential for credentials in changed.values() for credential in credentials]
 
-        # Loop over all vaults
-        vaults = await client.vaults.list_all()
-        async for vault in vaults:
-            # Loop over all items in the vault
-            items = await client.items.list_all(vault.id)
-            async for item in items:
-                # Loop over all websites for the item
-                for website in item.websites:
-                    url = website.url
-
-                    # If there is no username or password, do not create a credential
-                    try:
-                        username = await client.secrets.resolve(f"op://{item.vault_id}/{item.id}/username")
-                        password = await client.secrets.resolve(f"op://{item.vault_id}/{item.id}/password")
-                    except:
-                        continue
-
-                    # Add TOTP secret if it exists, but it is optional
-                    totp_secret = ""
-                    try:
-                        totp_secret = await client.secrets.resolve(f"op://{item.vault_id}/{item.id}/one-time password")
-                    except:
-                        pass
-
-                    credential = Credential(
-                        website=url,
-                        username=username,
-                        password=password,
-                        totp_secret=totp_secret
-                    )
-                    new_credentials.append(credential)
-
-        self.credentials.extend(new_credentials)
+        self._add_credentials(new_credentials)
         logger.info("loaded credential(s) from 1Password", count=len(new_credentials))
 
     def load_bitwarden(self, client_id: str, client_secret: str, master_password: str):
@@ -156,29 +164,144 @@ class CredentialManager:
 
         # Parse and process the items
         items = json.loads(list_process.stdout)
-        new_credentials = []
+        new_credentials = [credential for item in items for credential in bitwarden_credentials(item)]
 
-        for item in items:
-            # Skip items that don't have login information
-            if not item.get('login'):
-                continue
-            
-            login = item['login']
-            
-            # Get all URIs from the login
-            for uri_item in login.get('uris', []):
-                uri = uri_item.get('uri')
-                credential = Credential(
-                    website=uri,
-                    username=login.get('username'),
-                    password=login.get('password'),
-                    totp_secret=login.get('totp')
-                )
-                new_credentials.append(credential)
-
-        self.credentials.extend(new_credentials)
+        self._add_credentials(new_credentials)
         logger.info("loaded credential(s) from Bitwarden", count=len(new_credentials))
 
+    def load_bitwarden_serve(self, url: str = "http://localhost:8087", master_password: str = None, sync: bool = False):
+        """
+        Load credentials from a running `bw serve` process.
+
+        Unlike `load_bitwarden`, this does not start the Bitwarden CLI or log
+        in on every call. The vault is unlocked only if it is locked, synced
+        only when `sync` is True, and items are parsed as they stream in.
+
+        Args:
+            url (str, optional): Base URL of `bw serve`. Defaults to "http://localhost:8087".
+            master_password (str, optional): Master password, needed only if the vault is locked
+            sync (bool, optional): Whether to sync with the Bitwarden server first. Defaults to False.
+
+        Raises:
+            RuntimeError: If the server cannot be reached, the CLI is not logged in,
+                or the vault is locked and no master password is given
+        """
+        source = BitwardenServeSource(url, master_password, sync)
+        _, changed = source.fetch_sync({})
+        new_credentials = [credential for credentials in changed.values() for credential in credentials]
+
+        self._add_credentials(new_credentials)
+        logger.info("loaded credential(s) from Bitwarden", url=url, count=len(new_credentials))
+
+    async def load_source(self, source: CredentialSource, refresh_interval: float = None, jitter: float = 0.1):
+        """
+        Load credentials from a refreshable source, and optionally keep them
+        up to date in the background.
+
+        Each refresh only fetches secrets for items that were added or
+        changed since the last one, replaces the credentials of changed items
+        and removes those of deleted items. Changes are applied to the
+        credential list and index in one step, so lookups never wait for a
+        refresh and never see a half-applied one.
+
+        Args:
+            source (CredentialSource): The source to load, e.g. a `OnePasswordSource`
+            refresh_interval (float, optional): Seconds between background
+                refreshes. Defaults to no background refresh.
+            jitter (float, optional): Fraction by which each interval is randomly
+                lengthened or shortened, so many workers do not refresh in
+                lockstep. Defaults to 0.1.
+
+        Raises:
+            ValueError: If the source is already loaded
+        """
+        if source in self._sources:
+            raise ValueError(f"{source.name} source is already loaded")
+
+        self._sources[source] = _SourceState()
+        try:
+            await self.refresh_source(source)
+        except BaseException:
+            # Let the caller retry the load
+            del self._sources[source]
+            raise
+
+        if refresh_interval:
+            task = asyncio.create_task(self._refresh_periodically(source, refresh_interval, jitter))
+            self._refresh_tasks.add(task)
+            task.add_done_callback(self._refresh_tasks.discard)
+
+    async def refresh_source(self, source: CredentialSource) -> Dict[str, int]:
+        """
+        Apply the changes in a loaded source since its last refresh.
+
+        Args:
+            source (CredentialSource): A source added with `load_source`
+
+        Returns:
+            Dict[str, int]: Number of items added, updated and removed
+
+        Raises:
+            LookupError: If the source was not loaded with `load_source`
+        """
+        state = self._sources.get(source)
+        if state is None:
+            raise LookupError(f"{source.name} source is not loaded")
+
+        async with state.lock:
+            revisions, changed = await source.fetch(state.revisions)
+
+            # Everything below runs without yielding to the event loop
+            stale = []
+            added = []
+            counts = {"added": 0, "updated": 0, "removed": 0}
+            for item_id in state.revisions.keys() - revisions.keys():
+                stale.extend(state.credentials.pop(item_id, ()))
+                counts["removed"] += 1
+            for item_id, credentials in changed.items():
+                if item_id in state.credentials:
+                    stale.extend(state.credentials[item_id])
+                    counts["updated"] += 1
+                else:
+                    counts["added"] += 1
+                state.credentials[item_id] = credentials
+                added.extend(credentials)
+            state.revisions = revisions
+
+            for credential in stale:
+                self._index.remove(credential)
+            self._index.add_all(added)
+            if stale:
+                stale_ids = {id(credential) for credential in stale}
+                self.credentials = [credential for credential in self.credentials if id(credential) not in stale_ids] + added
+            else:
+                self.credentials.extend(added)
+
+        logger.info("refreshed credential source", source=source.name, count=sum(map(len, state.credentials.values())), **counts)
+        return counts
+
+    async def close(self):
+        """
+        Stop all background refreshes and close loaded snapshots.
+        """
+        tasks = list(self._refresh_tasks)
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+
+        for snapshot in self._snapshots:
+            snapshot.close()
+        self._snapshots = []
+
+    async def _refresh_periodically(self, source: CredentialSource, interval: float, jitter: float):
+        while True:
+            await asyncio.sleep(interval * random.uniform(1 - jitter, 1 + jitter))
+            try:
+                await self.refresh_source(source)
+            except Exception as e:
+                # Keep serving the last good credentials and try again next time
+                logger.warning("failed to refresh credential source", source=source.name, error=str(e))
+
     def load_credential(self, credential_dict: dict):
         """
         Load a single credential from a dictionary.
@@ -196,7 +319,7 @@ class CredentialManager:
             password=credential_dict.get('password'),
             totp_secret=credential_dict.get('totp_secret')
         )
-        self.credentials.append(credential)
+        self._add_credentials([credential])
         logger.info("loaded credential", count=1)
 
     def load_credentials(self, credential_list: List[dict]):
@@ -220,54 +343,197 @@ class CredentialManager:
             )
             new_credentials.append(credential)
         
-        self.credentials.extend(new_credentials)
+        self._add_credentials(new_credentials)
         logger.info("loaded credential(s) from list", count=len(new_credentials))
 
-    def load_json(self, file_path: str):
+    def load_json(self, file_path: str, batch_size: int = 10_000, progress_every: int = 100_000):
         """
-        Load credentials from a JSON file.
+        Load credentials from a JSON or JSON Lines file.
 
-        The JSON file should contain an array of credential objects, each with:
+        The file should contain either an array of credential objects or one
+        credential object per line (JSON Lines), each with:
         - website: The website URL
         - username: The username or email
         - password: The password
         - totp_secret: (optional) TOTP secret for 2FA
 
+        The file is parsed as a stream, so memory use does not grow with the
+        file size beyond the credentials themselves. Credentials are added in
+        batches as they are parsed, and progress is logged every
+        `progress_every` credentials.
+
         Args:
-            file_path (str): Path to the JSON credentials file
+            file_path (str): Path to the JSON or JSON Lines credentials file
+            batch_size (int, optional): Credentials parsed before they are added
+                to the manager. Defaults to 10,000.
+            progress_every (int, optional): Credentials between progress log
+                lines. Defaults to 100,000.
 
         Raises:
             FileNotFoundError: If the file doesn't exist
-            json.JSONDecodeError: If the file contains invalid JSON
+            ValueError: If the file contains invalid JSON
         """
-        new_credentials = []
+        total_bytes = os.path.getsize(file_path)
+        count = 0
+        batch = []
 
-        with open(file_path, 'r') as file:
-            credentials_list = json.load(file)
-            for x in credentials_list:
-                credential = Credential(
+        with open(file_path, 'rb') as file:
+            for x in _iter_json_records(file):
+                batch.append(Credential(
                     website=x.get("website"),
                     username=x.get("username"),
                     password=x.get("password"),
                     totp_secret=x.get("totp_secret")
-                )
-                new_credentials.append(credential)
-        
-        self.credentials.extend(new_credentials)
-        logger.info("loaded credential(s) from JSON file", file_path=file_path, count=len(new_credentials))
+                ))
+                count += 1
+
+                if len(batch) >= batch_size:
+                    self._add_credentials(batch)
+                    batch = []
+                if count % progress_every == 0:
+                    logger.info("loading credential(s) from JSON file", file_path=file_path, count=count, bytes_read=file.tell(), total_bytes=total_bytes)
+
+        self._add_credentials(batch)
+        logger.info("loaded credential(s) from JSON file", file_path=file_path, count=count)
+
+    def save_snapshot(self, file_path: str, key: str | bytes) -> int:
+        """
+        Save all credentials to an encrypted snapshot file for fast loading
+        with `load_snapshot`.
+
+        Lazily loaded credentials are skipped, since their secrets are not
+        held in memory. Credentials from loaded snapshots are included.
+
+        Example:
+            ```python
+            key = CredentialSnapshot.generate_key()
+            manager.load_json("credentials.json")
+            manager.save_snapshot("credentials.snap", key)
+
+            # In each worker
+            manager = CredentialManager()
+            manager.load_snapshot("credentials.snap", key)
+            ```
+
+        Args:
+            file_path (str): Path of the snapshot file, replaced if it exists
+            key (str | bytes): Key to encrypt the snapshot with. See `CredentialSnapshot.generate_key`.
+
+        Returns:
+            int: Number of credentials saved
+        """
+        from agentauth.credential_snapshot import CredentialSnapshot
+
+        credentials = [credential for credential in self.credentials if not isinstance(credential, LazyCredential)]
+        skipped = len(self.credentials) - len(credentials)
+        for snapshot in self._snapshots:
+            credentials.extend(snapshot)
+
+        count = CredentialSnapshot.write(file_path, credentials, key)
+        logger.info("saved credential snapshot", file_path=file_path, count=count, skipped_lazy=skipped)
+        return count
+
+    def load_snapshot(self, file_path: str, key: str | bytes):
+        """
+        Load credentials from a snapshot written by `save_snapshot`.
+
+        The file is memory-mapped. Opening it decrypts the whole index of
+        hostnames, usernames and record offsets, so loading time still grows
+        with the number of credentials, but no credential is decrypted or
+        built until a lookup returns it. Snapshot credentials are not added
+        to `credentials`. For the same host, credentials loaded any other way
+        take precedence over them in lookups.
+
+        Args:
+            file_path (str): Path of the snapshot file
+            key (str | bytes): Key the snapshot was saved with
+
+        Raises:
+            FileNotFoundError: If the file doesn't exist
+            ValueError: If the file is not a snapshot, is corrupt, or the key is wrong
+        """
+        from agentauth.credential_snapshot import CredentialSnapshot
+
+        start = time.perf_counter()
+        snapshot = CredentialSnapshot(file_path, key)
+        self._snapshots.append(snapshot)
+        logger.info("loaded credential snapshot", file_path=file_path, count=len(snapshot), load_ms=round((time.perf_counter() - start) * 1000, 2))
 
     def get_credential(self, website: str, username: str) -> Credential:
         """
         Retrieve credentials for a specific website and username combination.
 
+        An exact hostname match is preferred. Otherwise the credential stored
+        for the closest parent domain is returned, so a credential for
+        "example.com" is used for "app.example.com". Loaded credentials and
+        snapshots are searched together, so a closer match in a snapshot
+        wins over a parent domain match in memory.
+
         Args:
             website (str): The website URL to find credentials for
             username (str): The username to find credentials for
 
         Returns:
-            Credential: The matching credential object, or None if not found
+            Credential: The matching credential object, or None if not found.
+                Lazily loaded credentials are returned without their secrets.
         """
-        for credential in self.credentials:
-            if credential.matches_website_and_username(website, username):
+        if not self._snapshots:
+            return self._index.get(website, username)
+
+        # Try each host level everywhere before moving on to its parent domain
+        for host in _candidate_hosts(normalize_host(website)):
+            credential = self._index.get(host, username, parents=False)
+            if credential is None:
+                credential = self._snapshot_credential(host, username)
+            if credential is not None:
                 return credential
         return None
+
+    async def aget_credential(self, website: str, username: str) -> Credential:
+        """
+        Retrieve credentials like `get_credential`, resolving the secrets of
+        lazily loaded credentials.
+
+        Args:
+            website (str): The website URL to find credentials for
+            username (str): The username to find credentials for
+
+        Returns:
+            Credential: The matching credential with its password and TOTP
+                secret, or None if not found
+
+        Raises:
+            LookupError: If a lazily loaded password cannot be resolved
+        """
+        credential = self.get_credential(website, username)
+        if isinstance(credential, LazyCredential):
+            return await credential.resolve()
+        return credential
+
+    def _snapshot_credential(self, website: str, username: str) -> Credential:
+        for snapshot in self._snapshots:
+            credential = snapshot.get(website, username, parents=False)
+            if credential is not None:
+                return credential
+        return None
+
+def _iter_json_records(file: BinaryIO) -> Iterator[dict]:
+    # A JSON array, or JSON Lines if the first value is not an array
+    first = b""
+    while not first.strip():
+        first = file.read(1)
+        if not first:
+            return
+    file.seek(0)
+
+    if first == b"[":
+        yield from iter_array(file)
+        return
+
+    for line_number, line in enumerate(file, start=1):
+        if not line.strip():
+            continue
+        try:
+            yield json.loads(line)
+        except json.JSONDecodeError as e:
+            raise ValueError(f"Invalid JSON on line {line_number}: {e}") from e
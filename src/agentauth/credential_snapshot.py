@@ -0,0 +1,237 @@
+import base64
+import bisect
+import json
+import mmap
+import os
+import struct
+import tempfile
+from typing import Iterable, Iterator, Optional, Tuple
+
+from cryptography.exceptions import InvalidTag
+from cryptography.hazmat.primitives.ciphers.aead import AESGCM
+
+from agentauth.credential import Credential
+from agentauth.credential_index import _candidate_hosts, normalize_host
+
+MAGIC = b"AASNAP01"
+# magic, index ciphertext length, index nonce
+HEADER = struct.Struct("<8sQ12s")
+# key offset, key length, record offset, record length
+ENTRY = struct.Struct("<IHQI")
+COUNT = struct.Struct("<I")
+NONCE_SIZE = 12
+TAG_SIZE = 16
+
+class CredentialSnapshot:
+    """
+    CredentialSnapshot is a read-only, encrypted credential file that is
+    memory-mapped and decrypted piece by piece.
+
+    The file holds an index sorted by (hostname, username) followed by one
+    record per credential. The index and every record are encrypted
+    separately with AES-256-GCM, and each record is bound to its index key,
+    so records cannot be swapped or altered without detection. Opening a
+    snapshot decrypts only the index. A lookup binary-searches it, trying
+    the host and then each parent domain like `CredentialIndex`, and decrypts
+    just the matching record.
+
+    Args:
+        path (str): Path of the snapshot file
+        key (str | bytes): Key the snapshot was written with. See `CredentialSnapshot.generate_key`.
+
+    Raises:
+        ValueError: If the file is not a snapshot, is corrupt, or the key is wrong
+    """
+
+    def __init__(self, path: str, key: str | bytes):
+        self.path = path
+        self._aead = AESGCM(_decode_key(key))
+        self._file = open(path, "rb")
+        try:
+            self._map = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+            self._read_index()
+        except (ValueError, OSError):
+            self.close()
+            raise
+
+    @staticmethod
+    def generate_key() -> str:
+        """
+        Generate a new snapshot key.
+
+        Returns:
+            str: A URL-safe base64 encoded 256-bit key
+        """
+        return base64.urlsafe_b64encode(os.urandom(32)).decode()
+
+    @staticmethod
+    def write(path: str, credentials: Iterable[Credential], key: str | bytes) -> int:
+        """
+        Write credentials to a new snapshot file.
+
+        The file is written to a temporary file and moved into place, and is
+        only readable by the current user. When several credentials share a
+        hostname and username, the first one is kept.
+
+        Args:
+            path (str): Path of the snapshot file
+            credentials (Iterable[Credential]): The credentials to write
+            key (str | bytes): Key to encrypt the snapshot with
+
+        Returns:
+            int: Number of credentials written
+        """
+        aead = AESGCM(_decode_key(key))
+
+        entries = {}
+        for credential in credentials:
+            host = normalize_host(credential.website)
+            if host:
+                entries.setdefault(_index_key(host, credential.username), credential)
+        keys = sorted(entries)
+
+        records = []
+        record_offsets = []
+        offset = 0
+        for index_key in keys:
+            credential = entries[index_key]
+            plaintext = json.dumps([credential.website, credential.username, credential.password, credential.totp_secret]).encode()
+            nonce = os.urandom(NONCE_SIZE)
+            record = nonce + aead.encrypt(nonce, plaintext, index_key)
+            records.append(record)
+            record_offsets.append((offset, len(record)))
+            offset += len(record)
+
+        # Records start right after the header and the encrypted index
+        key_blob_offset = COUNT.size + ENTRY.size * len(keys)
+        index_length = key_blob_offset + sum(map(len, keys)) + TAG_SIZE
+        records_start = HEADER.size + index_length
+
+        index = bytearray(COUNT.pack(len(keys)))
+        key_offset = key_blob_offset
+        for index_key, (record_offset, record_length) in zip(keys, record_offsets):
+            index += ENTRY.pack(key_offset, len(index_key), records_start + record_offset, record_length)
+            key_offset += len(index_key)
+        for index_key in keys:
+            index += index_key
+
+        nonce = os.urandom(NONCE_SIZE)
+        header_prefix = MAGIC + struct.pack("<Q", index_length)
+        encrypted_index = aead.encrypt(nonce, bytes(index), header_prefix)
+
+        directory = os.path.dirname(os.path.abspath(path))
+        fd, temp_path = tempfile.mkstemp(dir=directory, suffix=".tmp")
+        try:
+            with os.fdopen(fd, "wb") as file:
+                file.write(HEADER.pack(MAGIC, index_length, nonce))
+                file.write(encrypted_index)
+                for record in records:
+                    file.write(record)
+            os.chmod(temp_path, 0o600)
+            os.replace(temp_path, path)
+        except BaseException:
+            os.unlink(temp_path)
+            raise
+
+        return len(keys)
+
+    def __len__(self) -> int:
+        return self._count
+
+    def __iter__(self) -> Iterator[Credential]:
+        for position in range(self._count):
+            yield self._record(position)
+
+    def get(self, website: str, username: str, parents: bool = True) -> Optional[Credential]:
+        """
+        Look up the credential for a website and username.
+
+        Args:
+            website (str): The website URL to find credentials for
+            username (str): The username to find credentials for
+            parents (bool, optional): Whether to fall back to parent domains. Defaults to True.
+
+        Returns:
+            Credential: The exact host match if there is one, otherwise the
+                credential for the closest parent domain, or None
+        """
+        host = normalize_host(website)
+        if not host:
+            return None
+
+        hosts = _candidate_hosts(host) if parents else [host]
+        for candidate in hosts:
+            position = self._find(_index_key(candidate, username))
+            if position is not None:
+                return self._record(position)
+        return None
+
+    def close(self):
+        """
+        Unmap and close the snapshot file.
+        """
+        if getattr(self, "_map", None) is not None:
+            self._map.close()
+            self._map = None
+        self._file.close()
+
+    def _read_index(self):
+        if len(self._map) < HEADER.size:
+            raise ValueError("Not a credential snapshot")
+        magic, index_length, nonce = HEADER.unpack_from(self._map, 0)
+        if magic != MAGIC:
+            raise ValueError("Not a credential snapshot")
+
+        try:
+            self._index = self._aead.decrypt(nonce, self._map[HEADER.size:HEADER.size + index_length], MAGIC + struct.pack("<Q", index_length))
+        except InvalidTag as e:
+            raise ValueError("Credential snapshot is corrupt or the key is wrong") from e
+        self._count = COUNT.unpack_from(self._index, 0)[0]
+        self._keys = _IndexKeys(self._index, self._count)
+
+    def _find(self, index_key: bytes) -> Optional[int]:
+        position = bisect.bisect_left(self._keys, index_key)
+        if position < self._count and self._keys[position] == index_key:
+            return position
+        return None
+
+    def _record(self, position: int) -> Credential:
+        _, _, record_offset, record_length = self._entry(position)
+        record = self._map[record_offset:record_offset + record_length]
+        try:
+            plaintext = self._aead.decrypt(record[:NONCE_SIZE], record[NONCE_SIZE:], self._keys[position])
+        except InvalidTag as e:
+            raise ValueError("Credential snapshot record is corrupt") from e
+        website, username, password, totp_secret = json.loads(plaintext)
+        return Credential(website, username, password, totp_secret)
+
+    def _entry(self, position: int) -> Tuple[int, int, int, int]:
+        return ENTRY.unpack_from(self._index, COUNT.size + ENTRY.size * position)
+
+class _IndexKeys:
+    """
+    A read-only sequence view of the sorted keys in a decrypted index, for bisect.
+    """
+
+    def __init__(self, index: bytes, count: int):
+        self._index = index
+        self._count = count
+
+    def __len__(self) -> int:
+        return self._count
+
+    def __getitem__(self, position: int) -> bytes:
+        key_offset, key_length, _, _ = ENTRY.unpack_from(self._index, COUNT.size + ENTRY.size * position)
+        return self._index[key_offset:key_offset + key_length]
+
+def _index_key(host: str, username: str) -> bytes:
+    return f"{host}\0{username or ''}".encode()
+
+def _decode_key(key: str | bytes) -> bytes:
+    try:
+        raw = base64.urlsafe_b64decode(key)
+    except (TypeError, ValueError) as e:
+        raise ValueError("Snapshot key must be 32 URL-safe base64 encoded bytes") from e
+    if len(raw) != 32:
+        raise ValueError("Snapshot key must be 32 URL-safe base64 encoded bytes")
+    return raw
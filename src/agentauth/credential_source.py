@@ -0,0 +1,393 @@
+import asyncio
+from collections import OrderedDict
+import time
+from typing import TYPE_CHECKING, Any, Dict, List, Optional, Set, Tuple
+
+from agentauth import logger
+from agentauth.bitwarden import BitwardenServeClient
+from agentauth.credential import Credential, LazyCredential
+
+if TYPE_CHECKING:
+    from onepassword.client import Client
+
+ONEPASSWORD_FIELDS = ("username", "password", "one-time password")
+
+class CredentialSource:
+    """
+    CredentialSource is a password manager that CredentialManager can load
+    from and then refresh incrementally.
+
+    Every item in the source has an ID and a revision that changes when the
+    item changes. On each fetch the source reports the current revision of
+    every item, and builds credentials only for items that are new or whose
+    revision differs from the one CredentialManager already has. Items that
+    are missing from the result have been deleted.
+
+    Subclasses implement `fetch`. Sources that return LazyCredentials also
+    implement `resolve_secrets`.
+    """
+
+    name = "source"
+
+    async def fetch(self, revisions: Dict[str, Any]) -> Tuple[Dict[str, Any], Dict[str, List[Credential]]]:
+        """
+        Fetch the items that changed since the last fetch.
+
+        Args:
+            revisions (Dict[str, Any]): Revision of each known item, by item ID.
+                Empty on the first fetch.
+
+        Returns:
+            Tuple[Dict[str, Any], Dict[str, List[Credential]]]: The current revision
+                of every item, and the credentials of each new or changed item.
+                A revision of None means the item cannot be versioned and is
+                always treated as changed.
+        """
+        raise NotImplementedError
+
+    async def resolve_secrets(self, item_id: str) -> Tuple[str, Optional[str]]:
+        """
+        Resolve the secrets of a lazily loaded item.
+
+        Args:
+            item_id (str): The item's ID
+
+        Returns:
+            Tuple[str, Optional[str]]: The password and TOTP secret
+
+        Raises:
+            LookupError: If the item's password cannot be resolved
+        """
+        raise NotImplementedError
+
+class _SecretCache:
+    """
+    A small LRU cache of resolved secrets that forgets entries after `ttl` seconds.
+    """
+
+    def __init__(self, max_entries: int, ttl: float):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self._entries: "OrderedDict[str, Tuple[float, Tuple[str, Optional[str]]]]" = OrderedDict()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def get(self, key: str) -> Optional[Tuple[str, Optional[str]]]:
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        if entry[0] <= time.monotonic():
+            del self._entries[key]
+            return None
+        self._entries.move_to_end(key)
+        return entry[1]
+
+    def set(self, key: str, secrets: Tuple[str, Optional[str]]):
+        self._entries[key] = (time.monotonic() + self.ttl, secrets)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    def invalidate(self, key: str):
+        self._entries.pop(key, None)
+
+class OnePasswordSource(CredentialSource):
+    """
+    OnePasswordSource loads login items from a 1Password account.
+
+    The client authenticates once and is reused for every fetch. Vaults and
+    items are listed concurrently, and secrets are resolved only for new or
+    changed items, once per item, in batches when the SDK supports it. An
+    item's revision is its update time and website list.
+
+    With `lazy=True`, only usernames are kept up front and the source
+    returns LazyCredentials. Passwords are resolved in the same batches only
+    to skip items without one, like the eager mode does, and are not kept.
+    An item's password and TOTP secret are resolved again the first time it
+    is needed, and kept for `secret_ttl` seconds in a cache of at most
+    `max_cached_secrets` items.
+
+    Args:
+        service_account_token (str): 1Password service account token
+        concurrency (int, optional): Maximum concurrent 1Password requests. Defaults to 8.
+        batch_size (int, optional): Secret references per batch resolve call. Defaults to 100.
+        lazy (bool, optional): Whether to resolve passwords and TOTP secrets on
+            demand. Defaults to False.
+        secret_ttl (float, optional): Seconds lazily resolved secrets are cached. Defaults to 300.
+        max_cached_secrets (int, optional): Maximum number of items with cached
+            secrets. Defaults to 256.
+    """
+
+    name = "1Password"
+
+    def __init__(
+            self,
+            service_account_token: str,
+            concurrency: int = 8,
+            batch_size: int = 100,
+            lazy: bool = False,
+            secret_ttl: float = 300,
+            max_cached_secrets: int = 256,
+    ):
+        self.service_account_token = service_account_token
+        self.concurrency = concurrency
+        self.batch_size = batch_size
+        self.lazy = lazy
+        self._client: "Client" = None
+        self._semaphore: asyncio.Semaphore = None
+        self._secrets = _SecretCache(max_cached_secrets, secret_ttl)
+        self._resolving: Dict[str, asyncio.Task] = {}
+
+    async def fetch(self, revisions: Dict[str, Any]) -> Tuple[Dict[str, Any], Dict[str, List[Credential]]]:
+        start = time.perf_counter()
+        client = await self._authenticate()
+        semaphore = self._get_semaphore()
+
+        async def list_items(vault_id: str) -> list:
+            async with semaphore:
+                return await _list_all(client.items, vault_id)
+
+        vaults = await _list_all(client.vaults)
+        item_lists = await asyncio.gather(*(list_items(vault.id) for vault in vaults))
+        items = [item for item_list in item_lists for item in item_list if item.websites]
+
+        current = {}
+        changed_items = []
+        for item in items:
+            item_id = f"{item.vault_id}/{item.id}"
+            current[item_id] = _item_revision(item)
+            if current[item_id] is None or revisions.get(item_id) != current[item_id]:
+                changed_items.append(item)
+
+        fields = ONEPASSWORD_FIELDS[:2] if self.lazy else ONEPASSWORD_FIELDS
+        references = [_secret_reference(item, field) for item in changed_items for field in fields]
+        secrets, missing, resolve_calls = await _resolve_secrets(client, references, semaphore, self.batch_size)
+
+        changed = {}
+        unresolved = 0
+        for item in changed_items:
+            item_id = f"{item.vault_id}/{item.id}"
+            item_references = [_secret_reference(item, field) for field in fields]
+            if any(reference not in secrets and reference not in missing for reference in item_references):
+                # Fetch the item again next time, and keep its current credentials until then
+                current[item_id] = None
+                unresolved += 1
+                continue
+
+            if self.lazy:
+                self._secrets.invalidate(item_id)
+
+            # If there is no username or password, do not create a credential
+            username = secrets.get(_secret_reference(item, "username"))
+            password = secrets.get(_secret_reference(item, "password"))
+            if username is None or password is None:
+                changed[item_id] = []
+                continue
+
+            if self.lazy:
+                changed[item_id] = [LazyCredential(website.url, username, self, item_id) for website in item.websites]
+                continue
+
+            # Add TOTP secret if it exists, but it is optional
+            totp_secret = secrets.get(_secret_reference(item, "one-time password"), "")
+
+            changed[item_id] = [
+                Credential(
+                    website=website.url,
+                    username=username,
+                    password=password,
+                    totp_secret=totp_secret
+                )
+                for website in item.websites
+            ]
+
+        logger.info(
+            "fetched items from 1Password",
+            items=len(items),
+            changed=len(changed_items),
+            lazy=self.lazy,
+            resolve_calls=resolve_calls,
+            unresolved=unresolved,
+            load_seconds=round(time.perf_counter() - start, 3),
+        )
+        return current, changed
+
+    async def resolve_secrets(self, item_id: str) -> Tuple[str, Optional[str]]:
+        secrets = self._secrets.get(item_id)
+        if secrets is not None:
+            return secrets
+
+        # Concurrent logins for the same item share one resolve
+        task = self._resolving.get(item_id)
+        if task is None:
+            task = asyncio.ensure_future(self._resolve_item(item_id))
+            self._resolving[item_id] = task
+            task.add_done_callback(lambda _: self._resolving.pop(item_id, None))
+        return await asyncio.shield(task)
+
+    async def _resolve_item(self, item_id: str) -> Tuple[str, Optional[str]]:
+        client = await self._authenticate()
+        password_reference = f"op://{item_id}/password"
+        totp_reference = f"op://{item_id}/one-time password"
+        secrets, _, _ = await _resolve_secrets(client, [password_reference, totp_reference], self._get_semaphore(), self.batch_size)
+
+        if password_reference not in secrets:
+            raise LookupError(f"Failed to resolve 1Password password for item {item_id}")
+
+        resolved = (secrets[password_reference], secrets.get(totp_reference, ""))
+        self._secrets.set(item_id, resolved)
+        logger.info("resolved 1Password secrets on demand", item_id=item_id, cached=len(self._secrets))
+        return resolved
+
+    def _get_semaphore(self) -> asyncio.Semaphore:
+        if self._semaphore is None:
+            self._semaphore = asyncio.Semaphore(self.concurrency)
+        return self._semaphore
+
+    async def _authenticate(self) -> "Client":
+        if self._client is None:
+            # Imported here so that loading AgentAuth does not load the 1Password SDK
+            from onepassword.client import Client
+
+            self._client = await Client.authenticate(
+                auth=self.service_account_token,
+                integration_name="1Password Integration",
+                integration_version="v0.1.0"
+            )
+        return self._client
+
+class BitwardenServeSource(CredentialSource):
+    """
+    BitwardenServeSource loads login items from a running `bw serve` process.
+
+    Each fetch streams the item list and only builds credentials for items
+    whose `revisionDate` changed. The HTTP calls run in a worker thread, so
+    the event loop keeps serving lookups during a fetch.
+
+    Args:
+        url (str, optional): Base URL of `bw serve`. Defaults to "http://localhost:8087".
+        master_password (str, optional): Master password, needed only if the vault is locked
+        sync (bool, optional): Whether to sync with the Bitwarden server before
+            each fetch. Defaults to True.
+    """
+
+    name = "Bitwarden"
+
+    def __init__(self, url: str = "http://localhost:8087", master_password: str = None, sync: bool = True):
+        self.client = BitwardenServeClient(url)
+        self.master_password = master_password
+        self.sync = sync
+
+    async def fetch(self, revisions: Dict[str, Any]) -> Tuple[Dict[str, Any], Dict[str, List[Credential]]]:
+        return await asyncio.to_thread(self.fetch_sync, revisions)
+
+    def fetch_sync(self, revisions: Dict[str, Any]) -> Tuple[Dict[str, Any], Dict[str, List[Credential]]]:
+        """
+        Blocking version of `fetch`.
+        """
+        self.client.ensure_unlocked(self.master_password)
+        if self.sync:
+            self.client.sync()
+
+        current = {}
+        changed = {}
+        for item in self.client.iter_items():
+            if not item.get("login"):
+                continue
+            current[item["id"]] = item.get("revisionDate")
+            if current[item["id"]] is None or revisions.get(item["id"]) != current[item["id"]]:
+                changed[item["id"]] = bitwarden_credentials(item)
+        return current, changed
+
+def bitwarden_credentials(item: dict) -> List[Credential]:
+    """
+    Create credentials from a Bitwarden item, one for each of its URIs.
+
+    Args:
+        item (dict): A Bitwarden item, as returned by `bw list items`
+
+    Returns:
+        List[Credential]: The item's credentials, empty if it is not a login
+    """
+    # Skip items that don't have login information
+    login = item.get('login')
+    if not login:
+        return []
+
+    return [
+        Credential(
+            website=uri_item.get('uri'),
+            username=login.get('username'),
+            password=login.get('password'),
+            totp_secret=login.get('totp')
+        )
+        for uri_item in login.get('uris') or []
+    ]
+
+def _item_revision(item) -> Any:
+    # onepassword-sdk < 0.2 item overviews have no update time
+    updated_at = getattr(item, "updated_at", None)
+    if updated_at is None:
+        return None
+    return (str(updated_at), tuple(website.url for website in item.websites))
+
+async def _list_all(api, *args) -> list:
+    # onepassword-sdk < 0.2 returns an async iterator from list_all(), later versions a list from list()
+    if hasattr(api, "list_all"):
+        return [entry async for entry in await api.list_all(*args)]
+    return await api.list(*args)
+
+def _secret_reference(item, field: str) -> str:
+    return f"op://{item.vault_id}/{item.id}/{field}"
+
+async def _resolve_secrets(
+        client: "Client",
+        references: List[str],
+        semaphore: asyncio.Semaphore,
+        batch_size: int,
+    ) -> Tuple[Dict[str, str], Set[str], int]:
+    # Returns the resolved secrets, the references whose field does not
+    # exist, and the number of calls made. References in neither failed and
+    # may resolve on a later try.
+    secrets = {}
+    missing = set()
+    resolve_calls = 0
+
+    async def resolve_one(reference: str):
+        nonlocal resolve_calls
+        async with semaphore:
+            resolve_calls += 1
+            try:
+                secrets[reference] = await client.secrets.resolve(reference)
+            except Exception as e:
+                # Missing fields (e.g. no TOTP) are reported as errors
+                if "cannot be found" in str(e):
+                    missing.add(reference)
+                else:
+                    logger.warning("failed to resolve 1Password secret", reference=reference, error=str(e))
+
+    async def resolve_batch(batch: List[str]):
+        nonlocal resolve_calls
+        try:
+            async with semaphore:
+                resolve_calls += 1
+                response = await client.secrets.resolve_all(batch)
+        except Exception as e:
+            logger.warning("failed to resolve 1Password secrets in batch", count=len(batch), error=str(e))
+            await asyncio.gather(*(resolve_one(reference) for reference in batch))
+            return
+
+        for reference, resolved in response.individual_responses.items():
+            if resolved.content is not None:
+                secrets[reference] = resolved.content.secret
+            elif resolved.error is not None and str(getattr(resolved.error, "type", "")) == "fieldNotFound":
+                missing.add(reference)
+
+    if hasattr(client.secrets, "resolve_all"):
+        batches = [references[i:i + batch_size] for i in range(0, len(references), batch_size)]
+        await asyncio.gather(*(resolve_batch(batch) for batch in batches))
+    else:
+        await asyncio.gather(*(resolve_one(reference) for reference in references))
+
+    return secrets, missing, resolve_calls
@@ -0,0 +1,194 @@
+import html
+import math
+import re
+from typing import List, Optional, Tuple
+from urllib.parse import parse_qsl, urlparse
+
+from imap_tools import MailMessage
+
+from agentauth.credential_index import normalize_host
+
+CODE_KEYWORDS = re.compile(
+    r"\b(code|passcode|one[- ]time|otp|pin|verification|verify|security|confirmation|sign[- ]?in|log[- ]?in|2fa|two[- ]factor|token)\b",
+    re.IGNORECASE,
+)
+
+# 4-8 digits, optionally split in two groups ("123 456", "123-456"),
+# or 6-8 uppercase letters and digits with at least one of each. Digit
+# groups next to further digit groups (phone numbers) are skipped.
+CODE_CANDIDATE = re.compile(
+    r"(?<![\w./:@$€£#+-])(?<!\d[ -])("
+    r"\d{3,4}[ -]\d{3,4}"
+    r"|\d{4,8}"
+    r"|(?=[A-Z0-9]*\d)(?=[A-Z0-9]*[A-Z])[A-Z0-9]{6,8}"
+    r")(?![\w/@%-]|[.,]\d|[ -]\d)"
+)
+
+URL_PATTERN = re.compile(r"https?://[^\s<>\"'()\[\]]+", re.IGNORECASE)
+HREF_PATTERN = re.compile(r"""href\s*=\s*["']([^"']+)["']""", re.IGNORECASE)
+
+TOKEN_PARAMS = {
+    "token", "code", "key", "otp", "magic", "auth", "login_token", "signin", "t", "ticket",
+    "nonce", "hash", "sig", "signature", "jwt", "access_token", "email_token", "verification",
+    "verify", "confirm", "confirmation_token", "oobcode", "link", "session",
+}
+LOGIN_PATH_WORDS = re.compile(
+    r"(magic|login|log-in|signin|sign-in|sign_in|verify|verification|auth|confirm|callback|session|token|passwordless|onetime|one-time)",
+    re.IGNORECASE,
+)
+IGNORED_PATH_WORDS = re.compile(
+    r"(unsubscribe|privacy|terms|help|support|preferences|settings/notifications|legal|policy|\.png|\.gif|\.jpg|\.svg|\.css)",
+    re.IGNORECASE,
+)
+
+SECOND_LEVEL_LABELS = {"co", "com", "org", "net", "ac", "gov", "edu"}
+
+def base_domain(host: str) -> str:
+    """
+    Approximate the registrable domain of a hostname, e.g. "mail.example.co.uk"
+    becomes "example.co.uk".
+
+    Args:
+        host (str): A normalized hostname
+
+    Returns:
+        str: The last two labels, or three for common second-level country domains
+    """
+    labels = host.split(".")
+    if len(labels) >= 3 and len(labels[-1]) == 2 and labels[-2] in SECOND_LEVEL_LABELS:
+        return ".".join(labels[-3:])
+    return ".".join(labels[-2:])
+
+def _body_text(msg: MailMessage) -> str:
+    if msg.text:
+        return msg.text
+    # Strip tags from HTML-only emails
+    return html.unescape(re.sub(r"<(style|script)[^>]*>.*?</\1>|<[^>]+>", " ", msg.html or "", flags=re.DOTALL | re.IGNORECASE))
+
+def extract_code(msg: MailMessage) -> Tuple[Optional[str], float]:
+    """
+    Find a login code in an email without calling an LLM.
+
+    Candidates are 4-8 digit codes (optionally split as "123 456") and 6-8
+    character uppercase alphanumeric codes. Each candidate is scored by its
+    distance to words like "code" or "verification", in the subject or body.
+
+    Args:
+        msg (MailMessage): The email to search
+
+    Returns:
+        Tuple[Optional[str], float]: The best code (without separators) and a
+            confidence between 0 and 1, or (None, 0.0) if there is no candidate
+    """
+    scores = {}
+    for weight, text in ((1.0, msg.subject or ""), (0.9, _body_text(msg))):
+        keywords = [match.start() for match in CODE_KEYWORDS.finditer(text)]
+        for match in CODE_CANDIDATE.finditer(text):
+            candidate = re.sub(r"[ -]", "", match.group(1))
+            if not 4 <= len(candidate) <= 8:
+                continue
+
+            distance = min((abs(match.start() - keyword) for keyword in keywords), default=None)
+            if distance is None:
+                score = 0.3
+            elif distance <= 80:
+                score = 0.95
+            elif distance <= 250:
+                score = 0.7
+            else:
+                score = 0.4
+
+            # Four-digit numbers are often years
+            if re.fullmatch(r"(19|20)\d\d", candidate):
+                score *= 0.5
+
+            scores[candidate] = max(scores.get(candidate, 0.0), score * weight)
+
+    if not scores:
+        return None, 0.0
+
+    ranked = sorted(scores.items(), key=lambda item: item[1], reverse=True)
+    code, confidence = ranked[0]
+    if len(ranked) > 1 and ranked[1][1] >= confidence - 0.1:
+        # Ambiguous between several equally likely codes
+        confidence = min(confidence, 0.5)
+    return code, confidence
+
+def _candidate_links(msg: MailMessage) -> List[str]:
+    links = [html.unescape(link) for link in HREF_PATTERN.findall(msg.html or "")]
+    links.extend(URL_PATTERN.findall(msg.text or ""))
+
+    seen = set()
+    unique = []
+    for link in links:
+        link = link.rstrip(".,;:!?")
+        if link.lower().startswith(("http://", "https://")) and link not in seen:
+            seen.add(link)
+            unique.append(link)
+    return unique
+
+def _looks_random(value: str) -> bool:
+    if len(value) < 16:
+        return False
+    counts = {}
+    for char in value:
+        counts[char] = counts.get(char, 0) + 1
+    entropy = -sum(count / len(value) * math.log2(count / len(value)) for count in counts.values())
+    return entropy >= 3.5
+
+def _score_link(link: str, domains: set) -> float:
+    parsed = urlparse(link)
+    host = normalize_host(link, port=False)
+    if not host or IGNORED_PATH_WORDS.search(parsed.path) or IGNORED_PATH_WORDS.search(parsed.query):
+        return 0.0
+
+    score = 0.0
+    params = parse_qsl(parsed.query, keep_blank_values=True)
+    if any(name.lower() in TOKEN_PARAMS and value for name, value in params):
+        score += 0.35
+    elif any(_looks_random(part) for part in parsed.path.split("/")):
+        # Token carried in the path, e.g. /verify/<token>
+        score += 0.35
+    if LOGIN_PATH_WORDS.search(parsed.path) or LOGIN_PATH_WORDS.search(parsed.fragment):
+        score += 0.25
+    if any(_looks_random(value) for _, value in params):
+        score += 0.2
+    if domains and base_domain(host) in domains:
+        score += 0.3
+    elif domains:
+        score -= 0.1
+    return max(0.0, min(score, 1.0))
+
+def extract_link(msg: MailMessage, website: str = None) -> Tuple[Optional[str], float]:
+    """
+    Find a magic login link in an email without calling an LLM.
+
+    Each link is scored by token-bearing query parameters (e.g. `token`,
+    `code`) or path segments, login-related path words (e.g. `/magic`,
+    `/verify`), random looking token values, and whether its domain matches
+    the target website or the sender. Unsubscribe, policy and image links
+    are ignored.
+
+    Args:
+        msg (MailMessage): The email to search
+        website (str, optional): The website being logged into
+
+    Returns:
+        Tuple[Optional[str], float]: The best link and a confidence between 0
+            and 1, or (None, 0.0) if there is no candidate
+    """
+    domains = set()
+    if website and normalize_host(website, port=False):
+        domains.add(base_domain(normalize_host(website, port=False)))
+    sender = (msg.from_ or "").rpartition("@")[2].strip("> ").lower()
+    if sender:
+        domains.add(base_domain(sender))
+
+    ranked = sorted(((_score_link(link, domains), link) for link in _candidate_links(msg)), reverse=True)
+    if not ranked or ranked[0][0] == 0.0:
+        return None, 0.0
+
+    confidence, link = ranked[0]
+    if len(ranked) > 1 and ranked[1][0] >= confidence - 0.1 and ranked[1][1] != link:
+        confidence = min(confidence, 0.5)
+    return link, confidence
@@ -1,68 +1,136 @@
-import time
+from datetime import datetime
+import ssl
+from typing import TYPE_CHECKING
 
-from imap_tools import MailBox
-from langchain_core.language_models.chat_models import BaseChatModel
+from imap_tools import MailMessage
+
+from agentauth.email_extractor import extract_code, extract_link
+from agentauth.imap_connection import ImapConnection
+from agentauth.inbox_watcher import InboxWatcher
+
+if TYPE_CHECKING:
+    from langchain_core.language_models.chat_models import BaseChatModel
+
+CODE_QUERY = """Does this email contain a login code? If yes, simply respond with the code. If no, simply respond with 'no'.
+
+```
+{text}
+```
+"""
+
+LINK_QUERY = """Does this email contain a login link? If yes, simply respond with the link. If no, simply respond with 'no'.
+
+```
+{text}
+```
+"""
 
 class EmailService:
+    """
+    EmailService finds login codes and magic links in an agent's inbox.
+
+    All I/O is asynchronous: IMAP traffic goes through aioimaplib, the LLM
+    is called with `ainvoke` and waiting for mail yields to the event loop,
+    so many logins can wait on email at the same time.
+
+    One InboxWatcher per service owns a single long-lived IMAP connection.
+    It fetches each new message once, using IMAP IDLE when the server
+    supports it, and hands it to the waiting login it best matches by
+    recipient, sender domain and arrival time. A message claimed by one
+    login is never given to another.
+
+    Each message first goes through a rule-based extractor. The LLM is only
+    asked about a message when the extractor's confidence is below
+    `extractor_threshold`.
+
+    Args:
+        imap_server (str): IMAP server hostname
+        imap_port (int): IMAP port number, using implicit TLS
+        imap_username (str): Email username for IMAP
+        imap_password (str): Email password for IMAP
+        llm (BaseChatModel): LLM used to read codes and links from emails
+        timeout (float, optional): Seconds to wait for an email. Defaults to 30.
+        poll_interval (float, optional): Seconds between inbox checks when the
+            server does not support IDLE. Defaults to 3.
+        ssl_context (ssl.SSLContext, optional): TLS settings for the IMAP connection,
+            e.g. to trust a private CA. Defaults to the system trust store.
+        extractor_threshold (float, optional): Minimum rule-based extractor confidence
+            needed to skip the LLM. Set above 1 to always use the LLM. Defaults to 0.8.
+    """
+
     def __init__(
             self,
             imap_server: str,
             imap_port: int,
             imap_username: str,
             imap_password: str,
-            llm: BaseChatModel
+            llm: "BaseChatModel",
+            timeout: float = 30,
+            poll_interval: float = 3,
+            ssl_context: ssl.SSLContext = None,
+            extractor_threshold: float = 0.8,
     ):
         self.imap_username = imap_username
         self.imap_password = imap_password
         self.imap_server = imap_server
         self.imap_port = imap_port
         self.llm = llm
+        self.timeout = timeout
+        self.poll_interval = poll_interval
+        self.ssl_context = ssl_context
+        self.extractor_threshold = extractor_threshold
+        self.connection = ImapConnection(imap_server, imap_port, imap_username, imap_password, ssl_context)
+        self.watcher = InboxWatcher(self.connection, poll_interval=poll_interval)
+
+    async def get_code(self, login_start_time: datetime, website: str = None, recipient: str = None) -> str:
+        """
+        Wait for an email received after the login started that contains a login code.
+
+        Args:
+            login_start_time (datetime): Emails received before this time are ignored
+            website (str, optional): The website being logged into, used to
+                prefer emails sent from the same domain
+            recipient (str, optional): The address the email is sent to, used to
+                tell apart logins sharing the inbox
+
+        Returns:
+            str: The login code, or None if no matching email arrived in time
+        """
+        return await self._find(login_start_time, extract_code, CODE_QUERY, website, recipient)
+
+    async def get_link(self, login_start_time: datetime, website: str = None, recipient: str = None) -> str:
+        """
+        Wait for an email received after the login started that contains a login link.
+
+        Args:
+            login_start_time (datetime): Emails received before this time are ignored
+            website (str, optional): The website being logged into, used to
+                prefer emails and links from the same domain
+            recipient (str, optional): The address the email is sent to, used to
+                tell apart logins sharing the inbox
+
+        Returns:
+            str: The login link, or None if no matching email arrived in time
+        """
+        return await self._find(login_start_time, lambda msg: extract_link(msg, website), LINK_QUERY, website, recipient)
+
+    async def close(self):
+        """
+        Stop watching the inbox and close the IMAP connection.
+        """
+        await self.watcher.close()
+        await self.connection.close()
+
+    async def _find(self, login_start_time: datetime, extract, query: str, website: str, recipient: str) -> str:
+        async def read(msg: MailMessage) -> str:
+            value, confidence = extract(msg)
+            if value and confidence >= self.extractor_threshold:
+                return value
+
+            # Ask LLM if this email contains what we are looking for
+            response = (await self.llm.ainvoke(query.format(text=msg.text))).content.strip()
+            if response.lower() != "no":
+                return response
+            return None
 
-    def get_code(self, login_start_time) -> str:
-        for _ in range(10):
-            with MailBox(self.imap_server).login(self.imap_username, self.imap_password) as mailbox:
-                for msg in mailbox.fetch(reverse=True):
-                    # Ignore emails recieved before this login process started
-                    if msg.date < login_start_time:
-                        break
-
-                    # Ask LLM if this email contains a login code / for the code
-                    query = f"""Does this email contain a login code? If yes, simply respond with the code. If no, simply respond with 'no'.
-                    
-                    ```
-                    {msg.text}
-                    ```
-                    """
-                    response = self.llm.invoke(query).content
-                    if response.lower() == "no":
-                        next
-                    else:
-                        return response
-            time.sleep(3)
-
-        return None
-
-    def get_link(self, login_start_time) -> str:
-        for _ in range(10):
-            with MailBox(self.imap_server).login(self.imap_username, self.imap_password) as mailbox:
-                for msg in mailbox.fetch(reverse=True):
-                    # Ignore emails recieved before this login process started
-                    if msg.date < login_start_time:
-                        break
-
-                    # Ask LLM if this email contains a login code / for the code
-                    query = f"""Does this email contain a login link? If yes, simply respond with the link. If no, simply respond with 'no'.
-                    
-                    ```
-                    {msg.text}
-                    ```
-                    """
-                    response = self.llm.invoke(query).content
-                    if response.lower() == "no":
-                        next
-                    else:
-                        return response
-                    
-            time.sleep(3)
-        
-        return None
+        return await self.watcher.wait_for(login_start_time, read, website, recipient, self.timeout)
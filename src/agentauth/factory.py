@@ -0,0 +1,32 @@
+import importlib
+import inspect
+from typing import TYPE_CHECKING, Callable
+
+if TYPE_CHECKING:
+    from agentauth.agentauth import AgentAuth
+
+async def load_agentauth(setup: Callable[[], "AgentAuth"] | str) -> "AgentAuth":
+    """
+    Create an AgentAuth with a setup function given by the user, as
+    `agentauth serve` and `agentauth workers` do.
+
+    Args:
+        setup (str | Callable): A function that returns an AgentAuth, or a
+            "module:function" string naming one. The function may be a
+            coroutine function.
+
+    Returns:
+        AgentAuth: The instance the setup function created
+
+    Raises:
+        ValueError: If `setup` is a string without a function name
+    """
+    if isinstance(setup, str):
+        module_name, _, function_name = setup.partition(":")
+        if not function_name:
+            raise ValueError(f"Expected setup as 'module:function', got {setup!r}")
+        setup = getattr(importlib.import_module(module_name), function_name)
+    aa = setup()
+    if inspect.isawaitable(aa):
+        aa = await aa
+    return aa
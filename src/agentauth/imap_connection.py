@@ -0,0 +1,221 @@
+import asyncio
+from datetime import datetime
+import re
+import ssl
+from typing import List, Tuple
+
+from aioimaplib import IMAP4_SSL, STOP_WAIT_SERVER_PUSH, Abort, CommandTimeout
+from imap_tools import MailMessage
+
+from agentauth import logger
+
+FETCH_UID_PATTERN = re.compile(rb"UID (\d+)")
+
+CONNECTION_ERRORS = (Abort, CommandTimeout, asyncio.TimeoutError, ConnectionError, OSError)
+
+class ImapConnection:
+    """
+    ImapConnection is a long-lived, logged-in IMAP session to one inbox.
+
+    The connection is opened on first use and reopened automatically if the
+    server drops it. Commands are serialized, so the connection can be
+    shared by many concurrent email lookups. Searches run on the server
+    (`UID SEARCH SINCE` and UID ranges) and fetches only pull the requested
+    messages, so the cost of a poll depends on new mail rather than on the
+    size of the mailbox.
+
+    Args:
+        imap_server (str): IMAP server hostname
+        imap_port (int): IMAP port number, using implicit TLS
+        imap_username (str): Email username for IMAP
+        imap_password (str): Email password for IMAP
+        ssl_context (ssl.SSLContext, optional): TLS settings for the connection
+        mailbox (str, optional): Mailbox to select. Defaults to "INBOX".
+    """
+
+    def __init__(
+            self,
+            imap_server: str,
+            imap_port: int,
+            imap_username: str,
+            imap_password: str,
+            ssl_context: ssl.SSLContext = None,
+            mailbox: str = "INBOX",
+    ):
+        self.imap_server = imap_server
+        self.imap_port = imap_port
+        self.imap_username = imap_username
+        self.imap_password = imap_password
+        self.ssl_context = ssl_context
+        self.mailbox = mailbox
+
+        self.connects = 0
+        self._client: IMAP4_SSL = None
+        self._lock = asyncio.Lock()
+
+    async def search_since(self, since: datetime) -> List[int]:
+        """
+        Find messages received on or after the date of `since`.
+
+        IMAP SINCE only has day precision, so callers should still filter
+        the fetched messages by their exact date.
+
+        Args:
+            since (datetime): Earliest receipt time of interest
+
+        Returns:
+            List[int]: Matching UIDs in ascending order
+        """
+        return await self._search("SINCE", since.strftime("%d-%b-%Y"))
+
+    async def search_after(self, uid: int) -> List[int]:
+        """
+        Find messages with a UID greater than `uid`.
+
+        Args:
+            uid (int): The highest UID already seen
+
+        Returns:
+            List[int]: Newer UIDs in ascending order
+        """
+        # "n:*" always matches the highest UID, even when it is below n
+        return [found for found in await self._search("UID", f"{uid + 1}:*") if found > uid]
+
+    async def fetch(self, uids: List[int]) -> List[Tuple[int, MailMessage]]:
+        """
+        Fetch full messages by UID in a single command.
+
+        Args:
+            uids (List[int]): UIDs to fetch
+
+        Returns:
+            List[Tuple[int, MailMessage]]: (uid, message) pairs in server order
+        """
+        if not uids:
+            return []
+
+        response = await self._run(lambda client: client.uid("fetch", ",".join(map(str, uids)), "(UID RFC822)"))
+        if response.result != "OK":
+            return []
+
+        messages = []
+        for index, line in enumerate(response.lines[:-1]):
+            match = FETCH_UID_PATTERN.search(line) if isinstance(line, bytes) else None
+            if match and isinstance(response.lines[index + 1], bytearray):
+                messages.append((int(match.group(1)), MailMessage.from_bytes(bytes(response.lines[index + 1]))))
+        return messages
+
+    async def supports_idle(self) -> bool:
+        """
+        Check whether the server supports IMAP IDLE, connecting if needed.
+
+        Returns:
+            bool: True if the server advertises the IDLE capability
+        """
+        async with self._lock:
+            client = await self._connect()
+            return client.has_capability("IDLE")
+
+    async def idle(self, timeout: float) -> bool:
+        """
+        Wait in IMAP IDLE until the server reports a mailbox change.
+
+        The connection is held for the whole wait, so other commands queue
+        behind it. Only use this from the single task that owns the
+        connection.
+
+        Args:
+            timeout (float): Maximum seconds to wait. Keep this below the
+                server's 30 minute IDLE limit.
+
+        Returns:
+            bool: True if the server pushed an update, False on timeout
+        """
+        return await self._run(lambda client: self._idle(client, timeout))
+
+    async def close(self):
+        """
+        Log out and close the connection.
+        """
+        async with self._lock:
+            await self._disconnect()
+
+    async def _search(self, *criteria: str) -> List[int]:
+        response = await self._run(lambda client: client.uid_search(*criteria, charset=None))
+        if response.result != "OK" or not response.lines:
+            return []
+        return sorted(int(uid) for uid in response.lines[0].split() if uid.isdigit())
+
+    async def _idle(self, client: IMAP4_SSL, timeout: float) -> bool:
+        try:
+            idle = await client.idle_start(timeout=timeout)
+            try:
+                push = await client.wait_server_push(timeout=timeout + 1)
+            except asyncio.TimeoutError:
+                push = STOP_WAIT_SERVER_PUSH
+            client.idle_done()
+            await asyncio.wait_for(idle, client.timeout)
+        except asyncio.CancelledError:
+            # The server may still be idling, so drop the connection instead of logging out
+            self._client = None
+            if client.protocol.transport is not None:
+                client.protocol.transport.close()
+            raise
+        return push != STOP_WAIT_SERVER_PUSH
+
+    async def _run(self, command):
+        async with self._lock:
+            for attempt in range(2):
+                try:
+                    client = await self._connect()
+                    return await command(client)
+                except CONNECTION_ERRORS as e:
+                    await self._disconnect()
+                    if attempt:
+                        raise
+                    logger.warning("reconnecting to IMAP server", imap_username=self.imap_username, error=repr(e))
+
+    async def _connect(self) -> IMAP4_SSL:
+        if self._is_open():
+            return self._client
+
+        await self._disconnect()
+        client = IMAP4_SSL(self.imap_server, self.imap_port, ssl_context=self.ssl_context)
+        await client.wait_hello_from_server()
+
+        response = await client.login(self.imap_username, self.imap_password)
+        if response.result != "OK":
+            raise RuntimeError("Failed to log in to IMAP server")
+
+        response = await client.select(self.mailbox)
+        if response.result != "OK":
+            raise RuntimeError(f"Failed to select IMAP mailbox {self.mailbox}")
+
+        self.connects += 1
+        self._client = client
+        return client
+
+    def _is_open(self) -> bool:
+        client = self._client
+        if client is None or client.get_state() != "SELECTED":
+            return False
+        transport = client.protocol.transport
+        return transport is not None and not transport.is_closing()
+
+    async def _disconnect(self):
+        client = self._client
+        if client is None:
+            return
+
+        open_connection = self._is_open()
+        self._client = None
+        transport = client.protocol.transport
+        if not open_connection:
+            if transport is not None:
+                transport.close()
+            return
+
+        try:
+            await client.logout()
+        except CONNECTION_ERRORS:
+            transport.close()
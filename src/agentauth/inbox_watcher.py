@@ -0,0 +1,279 @@
+import asyncio
+from collections import deque
+import contextvars
+from datetime import datetime, timedelta, timezone
+import itertools
+from typing import Awaitable, Callable, Deque, List, Optional, Set
+
+from imap_tools import MailMessage
+
+from agentauth import logger
+from agentauth.credential_index import normalize_host
+from agentauth.email_extractor import base_domain
+from agentauth.imap_connection import ImapConnection
+
+class _InboxMessage:
+    __slots__ = ("uid", "message", "date", "recipients", "sender_domain", "claimed", "dispatching")
+
+    def __init__(self, uid: int, message: MailMessage):
+        self.uid = uid
+        self.message = message
+        self.date = message_date(message)
+        self.recipients = _recipients(message)
+        sender = (message.from_ or "").rpartition("@")[2].strip("> ").lower()
+        self.sender_domain = base_domain(sender) if sender else ""
+        self.claimed = False
+        self.dispatching = False
+
+class _Waiter:
+    __slots__ = ("since", "domain", "recipient", "extract", "future", "order", "seen", "context")
+
+    def __init__(
+            self,
+            since: datetime,
+            website: Optional[str],
+            recipient: Optional[str],
+            extract: Callable[[MailMessage], Awaitable[Optional[str]]],
+            order: int,
+    ):
+        self.since = since
+        host = normalize_host(website, port=False) if website else ""
+        self.domain = base_domain(host) if host else ""
+        self.recipient = recipient.strip().lower() if recipient else ""
+        self.extract = extract
+        self.future = asyncio.get_running_loop().create_future()
+        self.order = order
+        self.seen: Set[int] = set()
+        # The waiting login's context, so LLM calls made to read mail for
+        # it are counted in its usage and spans
+        self.context = contextvars.copy_context()
+
+class InboxWatcher:
+    """
+    InboxWatcher fetches new mail for one mailbox once and hands each message
+    to the login that is waiting for it.
+
+    A single background task owns the IMAP connection. It waits with IMAP
+    IDLE when the server supports it and polls every `poll_interval` seconds
+    otherwise. New messages are fetched once and kept for `history` seconds,
+    so a login that starts waiting after its email arrived still finds it.
+
+    Each message is offered to waiting logins one at a time, best match
+    first, until one of them claims it:
+
+    - Messages received before a login started are never offered to it
+    - If a login gives a recipient address and the message lists recipients,
+      they must include that address
+    - Logins whose recipient matches are tried first, then logins whose
+      website shares the sender's domain, then the rest
+    - Ties go to the login that started first
+
+    Args:
+        connection (ImapConnection): Connection to the mailbox, used only by the watcher
+        poll_interval (float, optional): Seconds between checks when the server
+            does not support IDLE. Defaults to 3.
+        idle_timeout (float, optional): Seconds before an IDLE is renewed. Defaults to 300.
+        history (float, optional): Seconds that fetched messages are kept for
+            logins that start waiting later. Defaults to 600.
+    """
+
+    def __init__(
+            self,
+            connection: ImapConnection,
+            poll_interval: float = 3,
+            idle_timeout: float = 300,
+            history: float = 600,
+    ):
+        self.connection = connection
+        self.poll_interval = poll_interval
+        self.idle_timeout = idle_timeout
+        self.history = history
+
+        self._waiters: List[_Waiter] = []
+        self._messages: Deque[_InboxMessage] = deque()
+        self._last_uid: int = None
+        self._order = itertools.count()
+        self._task: asyncio.Task = None
+        self._dispatches: Set[asyncio.Task] = set()
+        self._active = asyncio.Event()
+        self._wake = asyncio.Event()
+
+    async def wait_for(
+            self,
+            since: datetime,
+            extract: Callable[[MailMessage], Awaitable[Optional[str]]],
+            website: str = None,
+            recipient: str = None,
+            timeout: float = 30,
+    ) -> Optional[str]:
+        """
+        Wait for a message that `extract` accepts.
+
+        Args:
+            since (datetime): Messages received before this time are ignored
+            extract (Callable): Coroutine function that returns the value found
+                in a message, or None to pass the message on to other logins
+            website (str, optional): The website being logged into, matched
+                against the sender's domain
+            recipient (str, optional): The address the message should be sent to
+            timeout (float, optional): Seconds to wait. Defaults to 30.
+
+        Returns:
+            Optional[str]: The value returned by `extract`, or None on timeout
+        """
+        if self._task is None or self._task.done():
+            # The watcher outlives the login that starts it and must not
+            # carry that login's context into work done for others
+            self._task = asyncio.create_task(self._run(), context=contextvars.Context())
+
+        # Date headers only have second precision
+        waiter = _Waiter(since.replace(microsecond=0), website, recipient, extract, next(self._order))
+        self._waiters.append(waiter)
+        self._active.set()
+        self._wake.set()
+
+        # Offer mail that arrived before this login started waiting, newest first
+        for message in reversed(self._messages):
+            self._dispatch(message)
+
+        try:
+            return await asyncio.wait_for(waiter.future, timeout)
+        except asyncio.TimeoutError:
+            return None
+        finally:
+            waiter.future.cancel()
+            self._waiters.remove(waiter)
+            if not self._waiters:
+                self._active.clear()
+
+    @property
+    def waiting(self) -> int:
+        """
+        int: Number of logins currently waiting for mail
+        """
+        return len(self._waiters)
+
+    async def close(self):
+        """
+        Stop watching the mailbox. The connection is left for the caller to close.
+        """
+        tasks = list(self._dispatches)
+        if self._task is not None:
+            tasks.append(self._task)
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+        self._task = None
+
+    async def _run(self):
+        use_idle = None
+        while True:
+            await self._active.wait()
+            try:
+                if use_idle is None:
+                    use_idle = await self.connection.supports_idle()
+                    logger.info("watching inbox", imap_username=self.connection.imap_username, idle=use_idle)
+
+                self._wake.clear()
+                await self._check()
+
+                if use_idle:
+                    await self.connection.idle(self.idle_timeout)
+                else:
+                    try:
+                        await asyncio.wait_for(self._wake.wait(), self.poll_interval)
+                    except asyncio.TimeoutError:
+                        pass
+            except Exception as e:
+                logger.warning("failed to check inbox", imap_username=self.connection.imap_username, error=repr(e))
+                await asyncio.sleep(self.poll_interval)
+
+    async def _check(self):
+        horizon = datetime.now(timezone.utc) - timedelta(seconds=self.history)
+        if self._last_uid is None:
+            uids = await self.connection.search_since(horizon)
+        else:
+            uids = await self.connection.search_after(self._last_uid)
+        if not uids:
+            return
+
+        self._last_uid = max(uids[-1], self._last_uid or 0)
+        while self._messages and (self._messages[0].claimed or self._messages[0].date < horizon):
+            self._messages.popleft()
+
+        for uid, msg in await self.connection.fetch(uids):
+            message = _InboxMessage(uid, msg)
+            if message.date < horizon:
+                continue
+            self._messages.append(message)
+            self._dispatch(message)
+
+    def _dispatch(self, message: _InboxMessage):
+        if message.claimed or message.dispatching or self._next_waiter(message) is None:
+            return
+        message.dispatching = True
+        task = asyncio.create_task(self._offer(message), context=contextvars.Context())
+        self._dispatches.add(task)
+        task.add_done_callback(self._dispatches.discard)
+
+    async def _offer(self, message: _InboxMessage):
+        try:
+            # Re-rank after every refusal, so logins that start waiting
+            # meanwhile are considered too
+            while not message.claimed:
+                waiter = self._next_waiter(message)
+                if waiter is None:
+                    return
+
+                waiter.seen.add(message.uid)
+                try:
+                    value = await asyncio.create_task(waiter.extract(message.message), context=waiter.context)
+                except Exception as e:
+                    logger.warning("failed to read email", uid=message.uid, error=repr(e))
+                    continue
+
+                if value is not None and not waiter.future.done():
+                    message.claimed = True
+                    waiter.future.set_result(value)
+        finally:
+            message.dispatching = False
+
+    def _next_waiter(self, message: _InboxMessage) -> Optional[_Waiter]:
+        best, best_rank = None, None
+        for waiter in self._waiters:
+            if waiter.future.done() or message.uid in waiter.seen or message.date < waiter.since:
+                continue
+
+            score = 0
+            if waiter.recipient and message.recipients:
+                if waiter.recipient not in message.recipients:
+                    continue
+                score += 2
+            if waiter.domain and waiter.domain == message.sender_domain:
+                score += 1
+
+            rank = (-score, waiter.since, waiter.order)
+            if best_rank is None or rank < best_rank:
+                best, best_rank = waiter, rank
+        return best
+
+def message_date(msg: MailMessage) -> datetime:
+    """
+    Get the date of an email, treating dates without a timezone as UTC.
+
+    Args:
+        msg (MailMessage): The email
+
+    Returns:
+        datetime: A timezone-aware date
+    """
+    date = msg.date
+    if date.tzinfo is None:
+        date = date.replace(tzinfo=timezone.utc)
+    return date
+
+def _recipients(msg: MailMessage) -> Set[str]:
+    recipients = {address.lower() for address in (*msg.to, *msg.cc, *msg.bcc)}
+    for header in ("delivered-to", "x-original-to"):
+        recipients.update(value.strip("<> ").lower() for value in msg.headers.get(header, ()))
+    return recipients
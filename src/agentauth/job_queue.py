@@ -0,0 +1,390 @@
+import asyncio
+from contextlib import contextmanager
+import json
+import os
+import sqlite3
+import threading
+import time
+from typing import Iterable, Iterator, List, Optional
+
+from cryptography.fernet import Fernet
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS jobs (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    website TEXT NOT NULL,
+    username TEXT NOT NULL,
+    cdp_url TEXT,
+    status TEXT NOT NULL DEFAULT 'queued',
+    attempts INTEGER NOT NULL DEFAULT 0,
+    max_attempts INTEGER NOT NULL,
+    timeout REAL NOT NULL,
+    available_at REAL NOT NULL,
+    lease_expires_at REAL,
+    worker TEXT,
+    result BLOB,
+    error TEXT,
+    created_at REAL NOT NULL,
+    finished_at REAL
+);
+CREATE INDEX IF NOT EXISTS jobs_claimable ON jobs (status, available_at);
+"""
+
+JOB_COLUMNS = "id, website, username, cdp_url, status, attempts, max_attempts, timeout, worker, result, error, created_at, finished_at"
+
+class Job:
+    """
+    Job is one login in a `JobQueue`.
+
+    `status` is "queued" (waiting, possibly for a retry), "running",
+    "succeeded" or "failed". Cookies are only set for succeeded jobs and
+    the error of the last attempt only for jobs that failed or are waiting
+    for a retry.
+    """
+
+    __slots__ = (
+        "id", "website", "username", "cdp_url", "status", "attempts", "max_attempts",
+        "timeout", "worker", "cookies", "error", "created_at", "finished_at",
+    )
+
+    def __init__(
+            self,
+            id: int,
+            website: str,
+            username: str,
+            cdp_url: str = None,
+            status: str = "queued",
+            attempts: int = 0,
+            max_attempts: int = 3,
+            timeout: float = 300,
+            worker: str = None,
+            cookies: list = None,
+            error: str = None,
+            created_at: float = None,
+            finished_at: float = None,
+        ):
+        self.id = id
+        self.website = website
+        self.username = username
+        self.cdp_url = cdp_url
+        self.status = status
+        self.attempts = attempts
+        self.max_attempts = max_attempts
+        self.timeout = timeout
+        self.worker = worker
+        self.cookies = cookies
+        self.error = error
+        self.created_at = created_at
+        self.finished_at = finished_at
+
+    @property
+    def done(self) -> bool:
+        return self.status in ("succeeded", "failed")
+
+    @property
+    def ok(self) -> bool:
+        return self.status == "succeeded"
+
+class JobQueue:
+    """
+    JobQueue is a durable queue of logins in a local SQLite database, shared
+    by the processes of a `WorkerPool` and the code that submits jobs.
+
+    Workers claim jobs with a lease of the job's timeout plus
+    `lease_grace` seconds. If a worker dies, its job can be claimed again
+    once the lease expires. Failed attempts are retried after
+    `retry_delay` seconds, doubled for each further attempt, until the
+    job's `max_attempts` is used up. Cookies of succeeded jobs are stored
+    encrypted with Fernet, like the on-disk `SessionCache`.
+
+    Args:
+        path (str): Path of the SQLite database, created if missing
+        encryption_key (str | bytes): Fernet key for stored cookies.
+            See `JobQueue.generate_key`.
+        retry_delay (float, optional): Seconds before the first retry.
+            Defaults to 5.
+        lease_grace (float, optional): Seconds a running job's lease lasts
+            beyond its timeout. Defaults to 30.
+
+    Example:
+        ```python
+        queue = JobQueue("jobs.db", encryption_key=os.getenv("AGENTAUTH_QUEUE_KEY"))
+        job_ids = queue.submit_many([("https://www.example.com", "user@example.com")])
+        for job in await queue.wait(job_ids):
+            print(job.website, job.status, job.cookies or job.error)
+        ```
+    """
+
+    def __init__(self, path: str, encryption_key: str | bytes, retry_delay: float = 5, lease_grace: float = 30):
+        if not encryption_key:
+            raise ValueError("An encryption key is required for the job queue")
+
+        self.path = path
+        self.retry_delay = retry_delay
+        self.lease_grace = lease_grace
+        self._fernet = Fernet(encryption_key)
+        # The connection is shared by the threads of one process
+        self._lock = threading.Lock()
+
+        # Autocommit mode, so transactions are explicit; waits up to 30s for
+        # other processes' writes instead of failing
+        self._connection = sqlite3.connect(path, timeout=30, isolation_level=None, check_same_thread=False)
+        self._connection.execute("PRAGMA journal_mode=WAL")
+        self._connection.execute("PRAGMA synchronous=NORMAL")
+        self._connection.executescript(SCHEMA)
+        if os.path.exists(path):
+            os.chmod(path, 0o600)
+
+    @staticmethod
+    def generate_key() -> str:
+        """
+        Generate a new key for stored cookies.
+
+        Returns:
+            str: A URL-safe base64-encoded 32-byte key
+        """
+        return Fernet.generate_key().decode()
+
+    def submit(self, website: str, username: str, cdp_url: str = None, max_attempts: int = 3, timeout: float = 300) -> int:
+        """
+        Queue a login.
+
+        Args:
+            website (str): The website to authenticate with
+            username (str): The username to authenticate with
+            cdp_url (str, optional): CDP URL for remote browser service
+            max_attempts (int, optional): Attempts before the job fails. Defaults to 3.
+            timeout (float, optional): Seconds each attempt may take. Defaults to 300.
+
+        Returns:
+            int: ID of the job
+        """
+        return self.submit_many([(website, username, cdp_url)], max_attempts, timeout)[0]
+
+    def submit_many(self, jobs: Iterable[tuple], max_attempts: int = 3, timeout: float = 300) -> List[int]:
+        """
+        Queue many logins in one transaction.
+
+        Args:
+            jobs (Iterable[tuple]): Tuples of (website, username) or
+                (website, username, cdp_url)
+            max_attempts (int, optional): Attempts before a job fails. Defaults to 3.
+            timeout (float, optional): Seconds each attempt may take. Defaults to 300.
+
+        Returns:
+            List[int]: IDs of the jobs, in input order
+        """
+        if max_attempts < 1:
+            raise ValueError("max_attempts must be at least 1")
+
+        now = time.time()
+        job_ids = []
+        with self._transaction() as cursor:
+            for job in jobs:
+                job = tuple(job)
+                if len(job) not in (2, 3):
+                    raise ValueError(f"Expected (website, username[, cdp_url]), got {job!r}")
+                website, username, cdp_url = (job + (None,))[:3]
+                cursor.execute(
+                    "INSERT INTO jobs (website, username, cdp_url, max_attempts, timeout, available_at, created_at) VALUES (?, ?, ?, ?, ?, ?, ?)",
+                    (website, username, cdp_url, max_attempts, timeout, now, now),
+                )
+                job_ids.append(cursor.lastrowid)
+        return job_ids
+
+    def claim(self, worker: str) -> Optional[Job]:
+        """
+        Claim the oldest job that is ready to run.
+
+        Args:
+            worker (str): Name of the claiming worker, stored with the job
+
+        Returns:
+            Job: The claimed job, or None if no job is ready
+        """
+        now = time.time()
+        with self._transaction() as cursor:
+            # Jobs of dead workers with no attempts left fail instead of
+            # running again
+            cursor.execute(
+                "UPDATE jobs SET status = 'failed', error = 'Worker stopped before the job finished', finished_at = ? "
+                "WHERE status = 'running' AND lease_expires_at < ? AND attempts >= max_attempts",
+                (now, now),
+            )
+            row = cursor.execute(
+                "SELECT id FROM jobs WHERE (status = 'queued' AND available_at <= ?) OR (status = 'running' AND lease_expires_at < ?) "
+                "ORDER BY id LIMIT 1",
+                (now, now),
+            ).fetchone()
+            if row is None:
+                return None
+            cursor.execute(
+                "UPDATE jobs SET status = 'running', attempts = attempts + 1, worker = ?, lease_expires_at = ? + timeout + ? WHERE id = ?",
+                (worker, now, self.lease_grace, row[0]),
+            )
+            return self._job(cursor.execute(f"SELECT {JOB_COLUMNS} FROM jobs WHERE id = ?", (row[0],)).fetchone())
+
+    def complete(self, job_id: int, cookies: list, worker: str) -> bool:
+        """
+        Store the cookies of a succeeded job.
+
+        Args:
+            job_id (int): ID of the job
+            cookies (list): Cookies returned by `AgentAuth.auth`
+            worker (str): Name of the worker that claimed the job
+
+        Returns:
+            bool: Whether the result was stored. False if the worker's lease
+                expired and the job was claimed again or finished since.
+        """
+        result = self._fernet.encrypt(json.dumps(cookies).encode())
+        with self._transaction() as cursor:
+            cursor.execute(
+                "UPDATE jobs SET status = 'succeeded', result = ?, error = NULL, lease_expires_at = NULL, finished_at = ? "
+                "WHERE id = ? AND worker = ? AND status = 'running'",
+                (result, time.time(), job_id, worker),
+            )
+            return cursor.rowcount == 1
+
+    def fail(self, job_id: int, error: str, worker: str) -> Optional[str]:
+        """
+        Record a failed attempt, queueing a retry if attempts are left.
+
+        Args:
+            job_id (int): ID of the job
+            error (str): Description of the failure
+            worker (str): Name of the worker that claimed the job
+
+        Returns:
+            str: The job's new status, "queued" for a retry or "failed". None
+                if the worker's lease expired and the job was claimed again
+                or finished since, in which case nothing is recorded.
+        """
+        now = time.time()
+        with self._transaction() as cursor:
+            row = cursor.execute(
+                "SELECT attempts, max_attempts FROM jobs WHERE id = ? AND worker = ? AND status = 'running'",
+                (job_id, worker),
+            ).fetchone()
+            if row is None:
+                return None
+            attempts, max_attempts = row
+            if attempts < max_attempts:
+                delay = self.retry_delay * 2 ** (attempts - 1)
+                cursor.execute(
+                    "UPDATE jobs SET status = 'queued', error = ?, available_at = ?, lease_expires_at = NULL WHERE id = ?",
+                    (error, now + delay, job_id),
+                )
+                return "queued"
+            cursor.execute(
+                "UPDATE jobs SET status = 'failed', error = ?, lease_expires_at = NULL, finished_at = ? WHERE id = ?",
+                (error, now, job_id),
+            )
+            return "failed"
+
+    def get(self, job_id: int) -> Job:
+        """
+        Get a job and, if it succeeded, its cookies.
+
+        Args:
+            job_id (int): ID of the job
+
+        Returns:
+            Job: The job
+
+        Raises:
+            LookupError: If there is no job with the ID
+        """
+        with self._lock:
+            row = self._connection.execute(f"SELECT {JOB_COLUMNS} FROM jobs WHERE id = ?", (job_id,)).fetchone()
+        if row is None:
+            raise LookupError(f"Job {job_id} not found")
+        return self._job(row)
+
+    async def wait(self, job_ids: Iterable[int], poll_interval: float = 0.2, timeout: float = None) -> List[Job]:
+        """
+        Wait for jobs to succeed or fail.
+
+        Args:
+            job_ids (Iterable[int]): IDs of the jobs
+            poll_interval (float, optional): Seconds between checks. Defaults to 0.2.
+            timeout (float, optional): Seconds to wait. Defaults to waiting indefinitely.
+
+        Returns:
+            List[Job]: The finished jobs, in input order
+
+        Raises:
+            TimeoutError: If some jobs have not finished within the timeout
+        """
+        job_ids = list(job_ids)
+        deadline = None if timeout is None else time.monotonic() + timeout
+        finished = {}
+        while True:
+            for job_id in job_ids:
+                if job_id not in finished:
+                    job = self.get(job_id)
+                    if job.done:
+                        finished[job_id] = job
+            if len(finished) == len(job_ids):
+                return [finished[job_id] for job_id in job_ids]
+            if deadline is not None and time.monotonic() >= deadline:
+                raise TimeoutError(f"{len(job_ids) - len(finished)} job(s) did not finish in time")
+            await asyncio.sleep(poll_interval)
+
+    def counts(self) -> dict:
+        """
+        Count jobs by status.
+
+        Returns:
+            dict: Number of queued, running, succeeded and failed jobs
+        """
+        counts = {"queued": 0, "running": 0, "succeeded": 0, "failed": 0}
+        with self._lock:
+            for status, count in self._connection.execute("SELECT status, COUNT(*) FROM jobs GROUP BY status").fetchall():
+                counts[status] = count
+        return counts
+
+    def purge(self, older_than: float) -> int:
+        """
+        Delete finished jobs and their stored cookies.
+
+        Args:
+            older_than (float): Delete jobs that finished more than this many seconds ago
+
+        Returns:
+            int: Number of jobs deleted
+        """
+        with self._transaction() as cursor:
+            cursor.execute(
+                "DELETE FROM jobs WHERE status IN ('succeeded', 'failed') AND finished_at < ?",
+                (time.time() - older_than,),
+            )
+            return cursor.rowcount
+
+    def close(self):
+        with self._lock:
+            self._connection.close()
+
+    @contextmanager
+    def _transaction(self) -> Iterator[sqlite3.Cursor]:
+        # BEGIN IMMEDIATE takes the write lock up front, so two workers can
+        # never claim the same job
+        with self._lock:
+            cursor = self._connection.cursor()
+            try:
+                cursor.execute("BEGIN IMMEDIATE")
+                try:
+                    yield cursor
+                except BaseException:
+                    cursor.execute("ROLLBACK")
+                    raise
+                cursor.execute("COMMIT")
+            finally:
+                cursor.close()
+
+    def _job(self, row: tuple) -> Job:
+        job_id, website, username, cdp_url, status, attempts, max_attempts, timeout, worker, result, error, created_at, finished_at = row
+        cookies = None
+        if result is not None:
+            cookies = json.loads(self._fernet.decrypt(result))
+        return Job(job_id, website, username, cdp_url, status, attempts, max_attempts, timeout, worker, cookies, error, created_at, finished_at)
@@ -0,0 +1,106 @@
+import codecs
+import json
+from typing import Any, BinaryIO, Iterable, Iterator, Sequence, Union
+
+WHITESPACE = " \t\n\r"
+
+class _Reader:
+    """
+    A growing text buffer over an iterable of chunks. Consumed text is
+    dropped, so memory stays bounded by the largest single value.
+    """
+
+    def __init__(self, chunks: Iterable[Union[str, bytes]]):
+        self._chunks = iter(chunks)
+        self._decoder = codecs.getincrementaldecoder("utf-8")()
+        self._decoder_json = json.JSONDecoder()
+        self.buffer = ""
+        self.position = 0
+        self.eof = False
+
+    def fill(self) -> bool:
+        for chunk in self._chunks:
+            if isinstance(chunk, bytes):
+                chunk = self._decoder.decode(chunk)
+            if chunk:
+                self.buffer = self.buffer[self.position:] + chunk
+                self.position = 0
+                return True
+        self.eof = True
+        return False
+
+    def peek(self) -> str:
+        while True:
+            while self.position < len(self.buffer) and self.buffer[self.position] in WHITESPACE:
+                self.position += 1
+            if self.position < len(self.buffer):
+                return self.buffer[self.position]
+            if not self.fill():
+                raise ValueError("Unexpected end of JSON input")
+
+    def expect(self, char: str):
+        if self.peek() != char:
+            raise ValueError(f"Expected {char!r} at JSON position {self.position}")
+        self.position += 1
+
+    def value(self) -> Any:
+        self.peek()
+        while True:
+            try:
+                value, end = self._decoder_json.raw_decode(self.buffer, self.position)
+            except json.JSONDecodeError:
+                if self.fill():
+                    continue
+                raise
+            # A number at the end of the buffer may continue in the next chunk
+            if end == len(self.buffer) and not self.eof and self.fill():
+                continue
+            self.position = end
+            return value
+
+def iter_array(source: Union[BinaryIO, Iterable[Union[str, bytes]]], path: Sequence[str] = (), chunk_size: int = 65536) -> Iterator[Any]:
+    """
+    Yield the elements of a JSON array one at a time without loading the whole document.
+
+    The array can be the document itself or nested in objects, e.g. path
+    ("data", "data") finds the array in `{"data": {"data": [...]}}`. Members
+    before the path are skipped and anything after the array is not read.
+
+    Args:
+        source (BinaryIO | Iterable[str | bytes]): A binary file-like object
+            (e.g. an open file or HTTP response) or an iterable of text or UTF-8 chunks
+        path (Sequence[str], optional): Object keys leading to the array. Defaults to the root.
+        chunk_size (int, optional): Bytes read at a time from file-like sources. Defaults to 65536.
+
+    Yields:
+        Any: Each decoded array element
+
+    Raises:
+        ValueError: If the document is not valid JSON or the path does not lead to an array
+    """
+    if hasattr(source, "read"):
+        stream = source
+        source = iter(lambda: stream.read(chunk_size), b"")
+    reader = _Reader(source)
+
+    for key in path:
+        reader.expect("{")
+        while True:
+            if reader.peek() == "}":
+                raise ValueError(f"JSON key {key!r} not found")
+            name = reader.value()
+            reader.expect(":")
+            if name == key:
+                break
+            reader.value()
+            if reader.peek() == ",":
+                reader.position += 1
+
+    reader.expect("[")
+    if reader.peek() == "]":
+        return
+    while True:
+        yield reader.value()
+        if reader.peek() == "]":
+            return
+        reader.expect(",")
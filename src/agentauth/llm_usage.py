@@ -0,0 +1,127 @@
+from contextlib import contextmanager
+from contextvars import ContextVar
+import time
+from typing import Any, Dict, Iterator, Optional, Tuple
+from uuid import UUID
+
+from langchain_core.callbacks import BaseCallbackHandler
+from langchain_core.outputs import LLMResult
+from langchain_core.tracers.context import register_configure_hook
+
+from agentauth.metrics import Span, SpanRecorder
+
+_current_usage: ContextVar[Optional["LLMUsage"]] = ContextVar("agentauth_llm_usage", default=None)
+
+# LangChain adds the handler in this variable to every model call made in
+# the same context, including calls made by browser_use's Agent
+register_configure_hook(_current_usage, inheritable=True)
+
+class LLMUsage(BaseCallbackHandler):
+    """
+    LLMUsage counts the LLM calls, time and tokens of one login.
+
+    Token counts come from the `usage_metadata` of the response message,
+    or from the provider's `token_usage` report if there is none. If a span
+    recorder is given, each call is also recorded as an "llm_call" span with
+    its token counts.
+
+    Args:
+        metrics (SpanRecorder, optional): Recorder of the login's spans
+    """
+
+    # Counting is cheap, so there is no need to run in a thread
+    run_inline = True
+
+    def __init__(self, metrics: SpanRecorder = None):
+        self.metrics = metrics
+        self.calls = 0
+        self.errors = 0
+        self.seconds = 0.0
+        self.input_tokens = 0
+        self.output_tokens = 0
+        self._starts: Dict[UUID, Tuple[float, Optional[Span]]] = {}
+
+    def on_llm_start(self, serialized: Dict[str, Any], prompts: list, *, run_id: UUID, **kwargs):
+        self._start(run_id)
+
+    def on_chat_model_start(self, serialized: Dict[str, Any], messages: list, *, run_id: UUID, **kwargs):
+        self._start(run_id)
+
+    def on_llm_end(self, response: LLMResult, *, run_id: UUID, **kwargs):
+        input_tokens, output_tokens = _token_usage(response)
+        self.input_tokens += input_tokens
+        self.output_tokens += output_tokens
+        self._finish(run_id, input_tokens=input_tokens, output_tokens=output_tokens)
+
+    def on_llm_error(self, error: BaseException, *, run_id: UUID, **kwargs):
+        self.errors += 1
+        self._finish(run_id, error=type(error).__name__)
+
+    def as_attributes(self) -> Dict[str, Any]:
+        """
+        Get the usage as span attributes.
+
+        Returns:
+            Dict[str, Any]: `llm_calls`, `llm_errors`, `llm_seconds`, `input_tokens` and `output_tokens`
+        """
+        return {
+            "llm_calls": self.calls,
+            "llm_errors": self.errors,
+            "llm_seconds": round(self.seconds, 3),
+            "input_tokens": self.input_tokens,
+            "output_tokens": self.output_tokens,
+        }
+
+    def _start(self, run_id: UUID):
+        span = None
+        if self.metrics:
+            span = Span("llm_call", self.metrics.website, self.metrics.login_id)
+        self._starts[run_id] = (time.perf_counter(), span)
+
+    def _finish(self, run_id: UUID, error: str = None, **attributes):
+        self.calls += 1
+        start, span = self._starts.pop(run_id, (None, None))
+        if start is None:
+            return
+        seconds = time.perf_counter() - start
+        self.seconds += seconds
+        if span:
+            span.duration = seconds
+            span.error = error
+            span.attributes.update(attributes)
+            self.metrics.record(span)
+
+@contextmanager
+def track_llm_usage(metrics: SpanRecorder = None) -> Iterator[LLMUsage]:
+    """
+    Count the LLM calls made in the enclosed block, including those in tasks
+    it starts.
+
+    Args:
+        metrics (SpanRecorder, optional): Recorder to add a span for each call to
+
+    Yields:
+        LLMUsage: The usage so far, updated as calls finish
+    """
+    usage = LLMUsage(metrics)
+    token = _current_usage.set(usage)
+    try:
+        yield usage
+    finally:
+        _current_usage.reset(token)
+
+def _token_usage(response: LLMResult) -> tuple:
+    input_tokens = output_tokens = 0
+    found = False
+    for generations in response.generations:
+        for generation in generations:
+            usage = getattr(getattr(generation, "message", None), "usage_metadata", None)
+            if usage:
+                input_tokens += usage.get("input_tokens", 0)
+                output_tokens += usage.get("output_tokens", 0)
+                found = True
+    if not found:
+        usage = (response.llm_output or {}).get("token_usage") or {}
+        input_tokens = usage.get("prompt_tokens", 0)
+        output_tokens = usage.get("completion_tokens", 0)
+    return input_tokens, output_tokens
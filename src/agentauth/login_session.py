@@ -0,0 +1,175 @@
+from datetime import datetime, timezone
+from typing import Iterable
+
+from browser_use.controller.service import Controller
+
+from agentauth import logger
+from agentauth.credential import Credential
+from agentauth.credential_manager import CredentialManager
+from agentauth.email_service import EmailService
+from agentauth.id_generator import generate_id
+from agentauth.metrics import MetricsHook, SpanRecorder
+
+class LoginSession:
+    """
+    LoginSession holds the state of a single `AgentAuth.auth` call.
+
+    Each login gets its own session, so one AgentAuth instance can run many
+    logins concurrently without them overwriting each other's website,
+    username, controller actions or start time. The session builds the
+    agent task and implements the lookup actions the agent can call. Each
+    lookup is timed as a span in `metrics`.
+
+    Args:
+        website (str): The website being logged into
+        username (str): The username being logged in with
+        agent_id (str): Identifier of the agent, included in audit logs
+        credential_manager (CredentialManager, optional): Source of passwords and TOTP secrets
+        email_service (EmailService, optional): Source of email codes and links
+        metrics_hooks (Iterable[MetricsHook], optional): Hooks to notify of each finished span
+    """
+
+    def __init__(
+            self,
+            website: str,
+            username: str,
+            agent_id: str,
+            credential_manager: CredentialManager = None,
+            email_service: EmailService = None,
+            metrics_hooks: Iterable[MetricsHook] = (),
+        ):
+        self.website = website
+        self.username = username
+        self.agent_id = agent_id
+        self.login_id = generate_id()
+        self.credential_manager = credential_manager
+        self.email_service = email_service
+        self.login_start_time = datetime.now(timezone.utc)
+        self.controller = Controller()
+        self.metrics = SpanRecorder(website, self.login_id, metrics_hooks)
+        self._credential: Credential = None
+
+    @property
+    def credential(self) -> Credential:
+        if self._credential is not None:
+            return self._credential
+        if not self.credential_manager:
+            return None
+        return self.credential_manager.get_credential(self.website, self.username)
+
+    async def resolve_credential(self) -> Credential:
+        """
+        Look up the credential once for this login, fetching its secrets if
+        they are loaded lazily. Call this before `build_auth_task`.
+
+        Returns:
+            Credential: The credential for this login, or None if there is none
+        """
+        if self.credential_manager:
+            self._credential = await self.credential_manager.aget_credential(self.website, self.username)
+        return self._credential
+
+    def build_auth_task(self) -> tuple[str, dict]:
+        task_components = [f"""Navigate to "x_website" and log in with username "x_username". Use the following guidance:"""]
+        sensitive_data = {
+            "x_website": self.website,
+            "x_username": self.username
+        }
+
+        if self._can_lookup_password():
+            password = self.lookup_password()
+            sensitive_data["x_password"] = password
+            task_components.append(f"""- If a password is needed, use the password "x_password" """)
+
+        if self._can_lookup_totp():
+            self.controller.action("Look up the TOTP code")(self.lookup_totp)
+            task_components.append("- If a TOTP code is needed, look up the TOTP code")
+
+        if self._can_lookup_email_code():
+            self.controller.action("Look up the email code")(self.lookup_email_code)
+            task_components.append("- If an email code is needed, look up the email code")
+
+        if self._can_lookup_email_link():
+            self.controller.action("Look up the email link")(self.lookup_email_link)
+            task_components.append("- If an email link is needed, look up the email link and navigate to the link")
+
+        # Prevent social sign in for now... may revist this later
+        task_components.append("- Do not attempt to Sign in with Google.")
+        task_components.append("- Do not attempt to Sign in with Apple.")
+        task_components.append("- Do not attempt to Sign in with Facebook.")
+        task_components.append("- Do not attempt to Sign in with Twitter.")
+        task_components.append("- Do not attempt to Sign in with Microsoft.")
+        task_components.append("- Do not attempt to Sign in with Amazon.")
+        task_components.append("- Do not attempt to Sign in with LinkedIn.")
+        task_components.append("- Do not attempt to Sign in with GitHub.")
+        task_components.append("- Do not attempt to Sign in with SSO.")
+
+        task_components.append("- Do not attempt to reset a password.")
+
+        task = "\n".join(task_components)
+
+        return task, sensitive_data
+
+    def _can_lookup_password(self) -> bool:
+        credential = self.credential
+        return bool(credential and credential.password)
+
+    def lookup_password(self) -> str:
+        if not self._can_lookup_password():
+            raise LookupError("Cannot lookup password")
+
+        with self.metrics.span("lookup_password"):
+            password = self.credential.password
+        self.log_auth_event("retrieved password")
+        return password
+
+    def _can_lookup_totp(self) -> bool:
+        credential = self.credential
+        return bool(credential and credential.has_totp)
+
+    def lookup_totp(self) -> str:
+        if not self._can_lookup_totp():
+            raise LookupError("Cannot lookup TOTP")
+
+        with self.metrics.span("lookup_totp"):
+            totp = self.credential.totp()
+        self.log_auth_event("retrieved TOTP")
+        return totp
+
+    def _can_lookup_email_code(self) -> bool:
+        return bool(self.email_service)
+
+    async def lookup_email_code(self) -> str:
+        if not self._can_lookup_email_code():
+            raise LookupError("Cannot lookup email code")
+
+        with self.metrics.span("lookup_email_code"):
+            code = await self.email_service.get_code(self.login_start_time, self.website, self._email_recipient())
+        self.log_auth_event("retreived email code", imap_username=self.email_service.imap_username)
+        return code
+
+    def _can_lookup_email_link(self) -> bool:
+        return bool(self.email_service)
+
+    async def lookup_email_link(self) -> str:
+        if not self._can_lookup_email_link():
+            raise LookupError("Cannot lookup email link")
+
+        with self.metrics.span("lookup_email_link"):
+            link = await self.email_service.get_link(self.login_start_time, self.website, self._email_recipient())
+        self.log_auth_event("retreived email link", imap_username=self.email_service.imap_username)
+        return link
+
+    def _email_recipient(self) -> str:
+        # Usernames that are email addresses are where the site sends its mail
+        return self.username if "@" in self.username else None
+
+    def log_auth_event(self, event: str, **kwargs):
+        logger.info(
+            event,
+            agent_id=self.agent_id,
+            login_id=self.login_id,
+            website=self.website,
+            username=self.username,
+            **kwargs
+        )
@@ -0,0 +1,255 @@
+from contextlib import contextmanager
+import threading
+import time
+from typing import Dict, Iterable, Iterator, List, Tuple
+
+from agentauth import logger
+from agentauth.credential_index import normalize_host
+
+DEFAULT_BUCKETS = (0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 20, 30, 60, 120, 300)
+
+class Span:
+    """
+    Span is the timing of one phase of a login.
+
+    `AgentAuth.auth` records a span for each phase ("lock_wait",
+    "cache_lookup", "credential_lookup", "browser_launch", "playbook_replay",
+    "agent_run", "cookie_export", "cache_store"), one for each LLM call
+    ("llm_call") and one named "auth" for the whole call. `LoginSession` records a span for
+    each lookup action ("lookup_password", "lookup_totp",
+    "lookup_email_code", "lookup_email_link"). `AgentAuth.ensure_session`
+    records a "session_probe" span with a `valid` attribute.
+
+    "llm_call" spans carry `input_tokens` and `output_tokens` attributes.
+    The "auth" span carries the LLM usage of the whole login (`llm_calls`,
+    `llm_errors`, `llm_seconds`, `input_tokens` and `output_tokens`) and
+    `browser_seconds`, the part of the agent run spent on page navigation
+    and browser actions rather than the LLM or lookups.
+
+    Args:
+        name (str): Name of the phase
+        website (str): The website being logged into
+        login_id (str): ID of the login, as in audit logs
+        attributes (dict, optional): Extra measurements for the phase
+    """
+
+    __slots__ = ("name", "website", "site", "login_id", "attributes", "start", "duration", "error")
+
+    def __init__(self, name: str, website: str, login_id: str, attributes: dict = None):
+        self.name = name
+        self.website = website
+        self.site = normalize_host(website)
+        self.login_id = login_id
+        self.attributes = attributes or {}
+        self.start = time.time()
+        self.duration = 0.0
+        self.error: str = None
+
+    @property
+    def ok(self) -> bool:
+        return self.error is None
+
+class MetricsHook:
+    """
+    MetricsHook receives the spans of every login.
+
+    Subclass it and pass instances to `AgentAuth(metrics_hooks=[...])` to
+    forward timings to a metrics system. `on_span` is called on the event
+    loop as each span ends, so it should return quickly. Exceptions it
+    raises are logged and do not affect the login.
+
+    Example:
+        ```python
+        class PrintHook(MetricsHook):
+            def on_span(self, span: Span):
+                print(span.site, span.name, span.duration, span.attributes)
+        ```
+    """
+
+    def on_span(self, span: Span):
+        """
+        Handle a finished span.
+
+        Args:
+            span (Span): The finished span
+        """
+
+class SpanRecorder:
+    """
+    SpanRecorder times the phases of one login and passes each finished
+    span to the metrics hooks.
+
+    Args:
+        website (str): The website being logged into
+        login_id (str): ID of the login
+        hooks (Iterable[MetricsHook], optional): Hooks to notify of each span
+    """
+
+    def __init__(self, website: str, login_id: str, hooks: Iterable[MetricsHook] = ()):
+        self.website = website
+        self.login_id = login_id
+        self.hooks = list(hooks)
+        self.spans: List[Span] = []
+
+    @contextmanager
+    def span(self, name: str, **attributes) -> Iterator[Span]:
+        """
+        Time the enclosed block as a span. The span's attributes can be
+        updated inside the block. If the block raises, the span records the
+        exception type as its error.
+
+        Args:
+            name (str): Name of the phase
+            **attributes: Initial attributes of the span
+
+        Yields:
+            Span: The span being timed
+        """
+        span = Span(name, self.website, self.login_id, attributes)
+        start = time.perf_counter()
+        try:
+            yield span
+        except BaseException as e:
+            span.error = type(e).__name__
+            raise
+        finally:
+            span.duration = time.perf_counter() - start
+            self.record(span)
+
+    def record(self, span: Span):
+        """
+        Keep a finished span and pass it to the hooks.
+
+        Args:
+            span (Span): The finished span
+        """
+        self.spans.append(span)
+        for hook in self.hooks:
+            try:
+                hook.on_span(span)
+            except Exception as e:
+                logger.warning("metrics hook failed", hook=type(hook).__name__, span=span.name, error=str(e))
+
+    def durations(self) -> Dict[str, float]:
+        """
+        Get the total seconds spent in each phase so far.
+
+        Returns:
+            Dict[str, float]: Seconds per span name, rounded to milliseconds
+        """
+        durations = {}
+        for span in self.spans:
+            durations[span.name] = durations.get(span.name, 0.0) + span.duration
+        return {name: round(seconds, 3) for name, seconds in durations.items()}
+
+class PrometheusExporter(MetricsHook):
+    """
+    PrometheusExporter aggregates spans into Prometheus metrics and renders
+    them in the Prometheus text exposition format.
+
+    It exports a `agentauth_phase_duration_seconds` histogram labelled by
+    phase, site (the website's hostname) and outcome, from which per-site
+    p50 and p99 can be computed with `histogram_quantile`. It also exports
+    `agentauth_llm_calls_total` and `agentauth_llm_tokens_total` counters
+    per site, taken from the "auth" spans. It has no dependencies; serve
+    the output of `render()` from your metrics endpoint.
+
+    Args:
+        buckets (Iterable[float], optional): Upper bounds of the histogram
+            buckets in seconds. Defaults to 0.05s to 300s.
+        namespace (str, optional): Prefix of the metric names. Defaults to "agentauth".
+
+    Example:
+        ```python
+        exporter = PrometheusExporter()
+        aa = AgentAuth(credential_manager=credential_manager, metrics_hooks=[exporter])
+
+        # In the /metrics handler of your web framework
+        return Response(exporter.render(), media_type=PrometheusExporter.CONTENT_TYPE)
+        ```
+    """
+
+    CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+    def __init__(self, buckets: Iterable[float] = DEFAULT_BUCKETS, namespace: str = "agentauth"):
+        self.buckets = tuple(sorted(buckets))
+        self.namespace = namespace
+        # Spans are recorded on the event loop and rendered from any thread
+        self._lock = threading.Lock()
+        self._histograms: Dict[Tuple[str, str, str], _Histogram] = {}
+        self._llm_calls: Dict[str, int] = {}
+        self._llm_tokens: Dict[Tuple[str, str], int] = {}
+
+    def on_span(self, span: Span):
+        labels = (span.name, span.site or "", "success" if span.ok else "error")
+        with self._lock:
+            histogram = self._histograms.get(labels)
+            if histogram is None:
+                histogram = self._histograms[labels] = _Histogram(len(self.buckets))
+            histogram.observe(span.duration, self.buckets)
+
+            if span.name == "auth":
+                site = span.site or ""
+                self._llm_calls[site] = self._llm_calls.get(site, 0) + span.attributes.get("llm_calls", 0)
+                for kind in ("input", "output"):
+                    key = (site, kind)
+                    self._llm_tokens[key] = self._llm_tokens.get(key, 0) + span.attributes.get(f"{kind}_tokens", 0)
+
+    def render(self) -> str:
+        """
+        Render all metrics in the Prometheus text exposition format.
+
+        Returns:
+            str: The metrics, ending with a newline
+        """
+        name = f"{self.namespace}_phase_duration_seconds"
+        lines = [
+            f"# HELP {name} Duration of login phases.",
+            f"# TYPE {name} histogram",
+        ]
+        with self._lock:
+            for (phase, site, outcome), histogram in sorted(self._histograms.items()):
+                labels = f'phase="{_escape(phase)}",site="{_escape(site)}",outcome="{outcome}"'
+                cumulative = 0
+                for bound, count in zip(self.buckets, histogram.counts):
+                    cumulative += count
+                    lines.append(f'{name}_bucket{{{labels},le="{_format(bound)}"}} {cumulative}')
+                lines.append(f'{name}_bucket{{{labels},le="+Inf"}} {histogram.count}')
+                lines.append(f"{name}_sum{{{labels}}} {_format(histogram.sum)}")
+                lines.append(f"{name}_count{{{labels}}} {histogram.count}")
+
+            name = f"{self.namespace}_llm_calls_total"
+            lines.append(f"# HELP {name} LLM calls made by logins.")
+            lines.append(f"# TYPE {name} counter")
+            for site, calls in sorted(self._llm_calls.items()):
+                lines.append(f'{name}{{site="{_escape(site)}"}} {calls}')
+
+            name = f"{self.namespace}_llm_tokens_total"
+            lines.append(f"# HELP {name} LLM tokens used by logins.")
+            lines.append(f"# TYPE {name} counter")
+            for (site, kind), tokens in sorted(self._llm_tokens.items()):
+                lines.append(f'{name}{{site="{_escape(site)}",type="{kind}"}} {tokens}')
+
+        return "\n".join(lines) + "\n"
+
+class _Histogram:
+    __slots__ = ("counts", "count", "sum")
+
+    def __init__(self, buckets: int):
+        self.counts = [0] * buckets
+        self.count = 0
+        self.sum = 0.0
+
+    def observe(self, value: float, buckets: Tuple[float, ...]):
+        self.count += 1
+        self.sum += value
+        for i, bound in enumerate(buckets):
+            if value <= bound:
+                self.counts[i] += 1
+                break
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+def _format(value: float) -> str:
+    return repr(float(value)) if value != int(value) else str(int(value))
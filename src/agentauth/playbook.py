@@ -0,0 +1,406 @@
+import asyncio
+import hashlib
+import inspect
+import json
+import os
+import re
+import time
+from typing import TYPE_CHECKING, Dict, List, Optional
+from urllib.parse import urlparse
+
+from agentauth import logger
+from agentauth.credential_index import normalize_host
+
+if TYPE_CHECKING:
+    from browser_use.agent.views import AgentHistoryList
+    from browser_use.browser.context import BrowserContext
+
+    from agentauth.login_session import LoginSession
+
+LOOKUP_ACTIONS = ("lookup_totp", "lookup_email_code", "lookup_email_link")
+
+# Actions that only help the LLM see the page. Playwright scrolls to and
+# waits for elements on its own, so they are left out of playbooks.
+IGNORED_ACTIONS = ("done", "wait", "scroll_down", "scroll_up", "scroll_to_text", "extract_content")
+
+SECRET = re.compile(r"<secret>(.*?)</secret>")
+
+class PlaybookStep:
+    """
+    PlaybookStep is one recorded browser action.
+
+    Args:
+        action (str): One of "go_to_url", "input_text", "click_element",
+            "send_keys", "lookup_totp", "lookup_email_code" or "lookup_email_link"
+        selector (str, optional): CSS selector of the element acted on
+        xpath (str, optional): XPath of the element, used if the selector
+            matches nothing
+        text (str, optional): URL, text or keys of the action, with
+            `<secret>name</secret>` placeholders for sensitive data
+        from_lookup (bool, optional): Whether the URL or text is the result of
+            the previous lookup step rather than `text`
+    """
+
+    __slots__ = ("action", "selector", "xpath", "text", "from_lookup")
+
+    def __init__(self, action: str, selector: str = None, xpath: str = None, text: str = None, from_lookup: bool = False):
+        self.action = action
+        self.selector = selector
+        self.xpath = xpath
+        self.text = text
+        self.from_lookup = from_lookup
+
+    def to_dict(self) -> dict:
+        data = {"action": self.action}
+        for name in ("selector", "xpath", "text"):
+            if getattr(self, name) is not None:
+                data[name] = getattr(self, name)
+        if self.from_lookup:
+            data["from_lookup"] = True
+        return data
+
+    @classmethod
+    def from_dict(cls, data: dict) -> "PlaybookStep":
+        return cls(data["action"], data.get("selector"), data.get("xpath"), data.get("text"), data.get("from_lookup", False))
+
+class Playbook:
+    """
+    Playbook is the sequence of browser actions of a successful login on a
+    site, recorded from the agent's history.
+
+    Elements are addressed by CSS selector and XPath rather than by the
+    agent's element indexes, and sensitive data is kept as placeholders, so
+    a playbook can be replayed with Playwright for any username on the site
+    without the LLM. TOTP codes and email codes or links are looked up
+    again when replayed.
+
+    Args:
+        website (str): The website the login was recorded on
+        steps (List[PlaybookStep]): The recorded actions
+        final_url (str): URL of the page the login ended on
+        recorded_at (float, optional): Unix time of the recording. Defaults to now.
+    """
+
+    def __init__(self, website: str, steps: List[PlaybookStep], final_url: str, recorded_at: float = None):
+        self.website = website
+        self.site = normalize_host(website)
+        self.steps = steps
+        self.final_url = final_url
+        self.recorded_at = recorded_at or time.time()
+        self.failures = 0
+
+    @classmethod
+    def from_history(cls, website: str, history: "AgentHistoryList", sensitive_data: Dict[str, str] = None) -> Optional["Playbook"]:
+        """
+        Record a playbook from the history of a successful agent run.
+
+        Actions that failed are left out. Text typed into a field that
+        equals a sensitive value is replaced with its placeholder. Runs that
+        used actions a playbook cannot replay, such as opening tabs, are not
+        recorded.
+
+        Args:
+            website (str): The website logged into
+            history (AgentHistoryList): History returned by `Agent.run`
+            sensitive_data (Dict[str, str], optional): Sensitive data passed to the agent
+
+        Returns:
+            Playbook: The playbook, or None if the run cannot be replayed
+        """
+        if not history.is_done():
+            return None
+
+        steps = []
+        lookup_result = None
+        for item in history.history:
+            if item.model_output is None:
+                continue
+            for action, result, element in zip(item.model_output.action, item.result, item.state.interacted_element):
+                if result.error:
+                    continue
+                name, params = next(iter(action.model_dump(exclude_unset=True).items()), (None, None))
+                params = params or {}
+
+                if name in IGNORED_ACTIONS:
+                    continue
+                if name in LOOKUP_ACTIONS:
+                    steps.append(PlaybookStep(name))
+                    lookup_result = result.extracted_content
+                    continue
+
+                if name == "go_to_url":
+                    url = params.get("url")
+                    if lookup_result is not None and url == lookup_result:
+                        steps.append(PlaybookStep(name, from_lookup=True))
+                    else:
+                        steps.append(PlaybookStep(name, text=url))
+                elif name in ("input_text", "click_element") and element is not None:
+                    step = PlaybookStep(name, selector=element.css_selector, xpath=element.xpath)
+                    if name == "input_text":
+                        text = params.get("text")
+                        if lookup_result is not None and text == lookup_result:
+                            step.from_lookup = True
+                        else:
+                            step.text = _as_placeholder(text, sensitive_data)
+                    steps.append(step)
+                elif name == "send_keys":
+                    steps.append(PlaybookStep(name, text=params.get("keys")))
+                else:
+                    logger.info("login cannot be recorded as a playbook", website=website, action=name)
+                    return None
+
+        if not steps:
+            return None
+        return cls(website, steps, history.history[-1].state.url)
+
+    async def replay(
+            self,
+            browser_context: "BrowserContext",
+            session: "LoginSession",
+            sensitive_data: Dict[str, str],
+            step_timeout: float = 10,
+        ):
+        """
+        Replay the playbook in a browser context and wait for the page the
+        recorded login ended on, with the login form gone. The final URL
+        alone is not enough, since many sites show their login form at the
+        same URL a logged-in user would see.
+
+        Args:
+            browser_context (BrowserContext): The browser context to log in with
+            session (LoginSession): The login, for TOTP and email lookups
+            sensitive_data (Dict[str, str]): Values of the placeholders
+            step_timeout (float, optional): Seconds to wait for each element,
+                for the final page and for the login form to go away.
+                Defaults to 10.
+
+        Raises:
+            RuntimeError: If a step fails, the final page is not reached or
+                the login form is still shown
+        """
+        page = await browser_context.get_current_page()
+        timeout = step_timeout * 1000
+        lookup_result = None
+
+        for i, step in enumerate(self.steps):
+            try:
+                if step.action in LOOKUP_ACTIONS:
+                    lookup_result = getattr(session, step.action)()
+                    if inspect.isawaitable(lookup_result):
+                        lookup_result = await lookup_result
+                    if not lookup_result:
+                        raise LookupError(f"{step.action} found nothing")
+                    continue
+
+                text = lookup_result if step.from_lookup else _fill_placeholders(step.text, sensitive_data)
+                if step.action == "go_to_url":
+                    await page.goto(text, timeout=timeout)
+                elif step.action == "input_text":
+                    await _locate(page, step).fill(text, timeout=timeout)
+                elif step.action == "click_element":
+                    await _locate(page, step).click(timeout=timeout)
+                elif step.action == "send_keys":
+                    await page.keyboard.press(text)
+                else:
+                    raise ValueError(f"Unknown action {step.action}")
+            except Exception as e:
+                raise RuntimeError(f"Playbook step {i + 1} ({step.action}) failed: {e}") from e
+
+        final = urlparse(self.final_url)
+        try:
+            await page.wait_for_url(
+                lambda url: (urlparse(url).netloc, urlparse(url).path) == (final.netloc, final.path),
+                timeout=timeout,
+            )
+        except Exception as e:
+            raise RuntimeError(f"Playbook did not reach {final.netloc}{final.path}: {e}") from e
+
+        deadline = time.monotonic() + step_timeout
+        while await _login_form_visible(page, self.steps):
+            if time.monotonic() >= deadline:
+                raise RuntimeError("Playbook reached the final page but the login form is still shown")
+            await asyncio.sleep(0.25)
+
+    def to_dict(self) -> dict:
+        return {
+            "website": self.website,
+            "final_url": self.final_url,
+            "recorded_at": self.recorded_at,
+            "steps": [step.to_dict() for step in self.steps],
+        }
+
+    @classmethod
+    def from_dict(cls, data: dict) -> "Playbook":
+        return cls(
+            data["website"],
+            [PlaybookStep.from_dict(step) for step in data["steps"]],
+            data["final_url"],
+            data.get("recorded_at"),
+        )
+
+class PlaybookStore:
+    """
+    PlaybookStore keeps one playbook per site, keyed by normalized hostname.
+
+    Pass it to `AgentAuth(playbook_store=...)` to record the agent's
+    successful logins and replay them on later logins to the same site
+    without the LLM. If a replay fails, the login falls back to the agent,
+    whose successful run replaces the playbook. A playbook that fails
+    `max_failures` times in a row is dropped.
+
+    Playbooks hold selectors and placeholders, never passwords or codes. If
+    `path` is provided, they are also written to that directory as JSON so
+    they survive process restarts.
+
+    Args:
+        path (str, optional): Directory for playbook files
+        max_failures (int, optional): Consecutive failed replays after which
+            a playbook is dropped. Defaults to 3.
+        step_timeout (float, optional): Seconds a replay waits for each
+            element. Defaults to 10.
+
+    Example:
+        ```python
+        aa = AgentAuth(credential_manager=credential_manager, playbook_store=PlaybookStore(path=".agentauth/playbooks"))
+
+        # The first login uses the agent, later logins replay its actions
+        cookies = await aa.auth("https://www.example.com", "user1@example.com")
+        cookies = await aa.auth("https://www.example.com", "user2@example.com")
+        ```
+    """
+
+    def __init__(self, path: str = None, max_failures: int = 3, step_timeout: float = 10):
+        self.path = path
+        self.max_failures = max_failures
+        self.step_timeout = step_timeout
+        self._playbooks: Dict[str, Playbook] = {}
+
+        if path:
+            os.makedirs(path, mode=0o700, exist_ok=True)
+
+    def get(self, website: str) -> Optional[Playbook]:
+        """
+        Get the playbook for a website's site.
+
+        Args:
+            website (str): The website URL
+
+        Returns:
+            Playbook: The playbook, or None if none has been recorded
+        """
+        site = normalize_host(website)
+        playbook = self._playbooks.get(site)
+        if playbook is None and self.path:
+            playbook = self._read(site)
+            if playbook is not None:
+                self._playbooks[site] = playbook
+        return playbook
+
+    def set(self, playbook: Playbook):
+        """
+        Store a playbook, replacing any playbook for the same site.
+
+        Args:
+            playbook (Playbook): The playbook
+        """
+        self._playbooks[playbook.site] = playbook
+        if self.path:
+            self._write(playbook)
+
+    def record_success(self, playbook: Playbook):
+        playbook.failures = 0
+
+    def record_failure(self, playbook: Playbook):
+        """
+        Count a failed replay, dropping the playbook after `max_failures`
+        failures in a row.
+
+        Args:
+            playbook (Playbook): The playbook that failed
+        """
+        playbook.failures += 1
+        if playbook.failures >= self.max_failures and self._playbooks.get(playbook.site) is playbook:
+            logger.warning("dropped failing playbook", site=playbook.site, failures=playbook.failures)
+            self.invalidate(playbook.website)
+
+    def invalidate(self, website: str):
+        """
+        Remove the playbook for a website's site.
+
+        Args:
+            website (str): The website URL
+        """
+        site = normalize_host(website)
+        self._playbooks.pop(site, None)
+        if self.path:
+            try:
+                os.remove(self._file_path(site))
+            except FileNotFoundError:
+                pass
+
+    def _file_path(self, site: str) -> str:
+        digest = hashlib.sha256(site.encode()).hexdigest()
+        return os.path.join(self.path, f"{digest}.playbook.json")
+
+    def _read(self, site: str) -> Optional[Playbook]:
+        try:
+            with open(self._file_path(site)) as file:
+                return Playbook.from_dict(json.load(file))
+        except FileNotFoundError:
+            return None
+        except (KeyError, TypeError, ValueError):
+            logger.warning("discarded unreadable playbook", site=site)
+            return None
+
+    def _write(self, playbook: Playbook):
+        file_path = self._file_path(playbook.site)
+        tmp_path = f"{file_path}.{os.getpid()}.tmp"
+        with open(tmp_path, "w") as file:
+            json.dump(playbook.to_dict(), file)
+        os.replace(tmp_path, file_path)
+
+def _locate(page, step: PlaybookStep):
+    # The XPath covers pages whose generated attributes changed since recording
+    locators = []
+    if step.selector:
+        locators.append(page.locator(step.selector))
+    if step.xpath:
+        locators.append(page.locator(f"xpath=/{step.xpath.lstrip('/')}"))
+    if not locators:
+        raise ValueError("Step has no selector")
+    locator = locators[0]
+    for other in locators[1:]:
+        locator = locator.or_(other)
+    return locator.first
+
+async def _login_form_visible(page, steps: List[PlaybookStep]) -> bool:
+    # A password field or any field the playbook typed into
+    locators = [page.locator("input[type=password]").first]
+    locators += [_locate(page, step) for step in steps if step.action == "input_text"]
+    for locator in locators:
+        try:
+            if await locator.is_visible():
+                return True
+        except Exception:
+            # E.g. the page navigated while checking
+            continue
+    return False
+
+def _as_placeholder(text: str, sensitive_data: Dict[str, str]) -> str:
+    # Only whole values, so a short username like "admin" is not replaced
+    # inside other text
+    for name, value in (sensitive_data or {}).items():
+        if value and text == value:
+            return f"<secret>{name}</secret>"
+    return text
+
+def _fill_placeholders(text: str, sensitive_data: Dict[str, str]) -> str:
+    if text is None:
+        return None
+
+    def replace(match: re.Match) -> str:
+        if match.group(1) not in sensitive_data:
+            raise LookupError(f"No sensitive data for {match.group(1)}")
+        return sensitive_data[match.group(1)]
+
+    return SECRET.sub(replace, text)
@@ -0,0 +1,453 @@
+"""
+Runs AgentAuth as a long-lived daemon with a local HTTP API.
+
+Usage:
+    agentauth serve --setup myapp.auth:create_agentauth [--socket /run/agentauth.sock | --host 127.0.0.1 --port 8731]
+        [--token-file ~/.agentauth/server.token] [--refresh]
+"""
+
+import argparse
+import asyncio
+import hmac
+import ipaddress
+import json
+import os
+import secrets
+import signal
+from typing import TYPE_CHECKING, Dict, Iterable, List, Optional, Tuple
+from urllib.parse import parse_qs, urlsplit
+
+from agentauth import logger
+from agentauth.credential_index import normalize_host
+from agentauth.factory import load_agentauth
+
+if TYPE_CHECKING:
+    from agentauth.agentauth import AgentAuth
+    from agentauth.session_refresher import SessionRefresher
+
+MAX_BODY_BYTES = 1024 * 1024
+MAX_HEADERS = 100
+
+REASONS = {
+    200: "OK",
+    400: "Bad Request",
+    401: "Unauthorized",
+    403: "Forbidden",
+    404: "Not Found",
+    405: "Method Not Allowed",
+    411: "Length Required",
+    413: "Content Too Large",
+    415: "Unsupported Media Type",
+    500: "Internal Server Error",
+    502: "Bad Gateway",
+}
+
+class AuthServer:
+    """
+    AuthServer keeps one `AgentAuth` loaded in a long-running process and
+    serves its logins over a small JSON HTTP API, on a local TCP port or a
+    Unix socket. Short-lived agent processes then get cookies without
+    loading credentials, launching browsers or connecting to the inbox
+    themselves, and concurrent requests for the same account share one
+    login. Connections are kept alive between requests.
+
+    Endpoints:
+        GET /health: `{"status": "ok"}`
+        POST /auth: `{"website", "username", "cdp_url"?, "refresh"?}`, returns
+            `{"cookies"}`. With `"refresh": true` and a refresher, the session
+            is kept fresh in the background and later requests for it are
+            answered from memory.
+        POST /auth/batch: `{"jobs": [{"website", "username", "cdp_url"?}],
+            "concurrency"?}`, returns `{"results"}` in job order, each with
+            "website", "username", "ok" and "cookies" or "error"
+        GET /sessions: `{"sessions"}`, the refresher's status of every tracked
+            session. With `?website=...&username=...`, whether that account
+            has cached cookies and its refresh status.
+        POST /sessions/expired: `{"website", "username"}`, reports cookies
+            that stopped working, so the next request logs in again
+
+    Failed logins return 502 and missing credentials 404, with `{"error"}`.
+
+    Listening on TCP requires a token, since any local user could otherwise
+    read cookies. Requests must also name the bound address in their Host
+    header and send POST bodies as `application/json`, so web pages open
+    in a browser on the same machine cannot reach the API, not even
+    through DNS rebinding.
+
+    Args:
+        agent_auth (AgentAuth): Instance that runs the logins
+        host (str, optional): Address to listen on. Defaults to "127.0.0.1".
+        port (int, optional): Port to listen on, or 0 for any free port.
+            Defaults to 8731.
+        unix_socket (str, optional): Path of a Unix socket to listen on
+            instead of TCP. Created with 0600 permissions.
+        token (str, optional): If set, requests must send it as
+            "Authorization: Bearer <token>". Required for TCP.
+        refresher (SessionRefresher, optional): Keeps sessions requested with
+            `"refresh": true` fresh. Started and closed by the caller.
+        max_batch (int, optional): Most jobs accepted in one batch.
+            Defaults to 1000.
+        allowed_hosts (Iterable[str], optional): Host header values accepted
+            besides the bound host:port (and localhost:port on a loopback
+            address), e.g. when listening on all interfaces
+
+    Raises:
+        ValueError: If listening on TCP without a token
+
+    Example:
+        ```python
+        async with AuthServer(aa, unix_socket="/run/agentauth.sock") as server:
+            await server.serve_forever()
+        ```
+    """
+
+    def __init__(
+            self,
+            agent_auth: "AgentAuth",
+            host: str = "127.0.0.1",
+            port: int = 8731,
+            unix_socket: str = None,
+            token: str = None,
+            refresher: "SessionRefresher" = None,
+            max_batch: int = 1000,
+            allowed_hosts: Iterable[str] = None,
+        ):
+        if not unix_socket and not token:
+            raise ValueError("A token is required to listen on TCP. Use a Unix socket to serve without one.")
+
+        self.agent_auth = agent_auth
+        self.host = host
+        self.port = port
+        self.unix_socket = unix_socket
+        self.token = token
+        self.refresher = refresher
+        self.max_batch = max_batch
+        self.allowed_hosts = {host.lower() for host in allowed_hosts or []}
+
+        self._server: asyncio.Server = None
+        # Handler task of each open connection
+        self._connections: Dict[asyncio.StreamWriter, asyncio.Task] = {}
+        # Refreshed sessions reported expired, whose cookies in the
+        # refresher must not be served until the next login
+        self._expired = set()
+
+    async def __aenter__(self) -> "AuthServer":
+        await self.start()
+        return self
+
+    async def __aexit__(self, *exc_info):
+        await self.close()
+
+    async def start(self):
+        """
+        Start listening for requests.
+        """
+        if self.unix_socket:
+            if os.path.exists(self.unix_socket):
+                os.remove(self.unix_socket)
+            # Only the owner may connect, as responses contain cookies
+            old_umask = os.umask(0o177)
+            try:
+                self._server = await asyncio.start_unix_server(self._handle, path=self.unix_socket)
+            finally:
+                os.umask(old_umask)
+        else:
+            self._server = await asyncio.start_server(self._handle, self.host, self.port)
+            self.allowed_hosts |= _bound_hosts(*self._server.sockets[0].getsockname()[:2])
+        logger.info("started auth server", address=self.address)
+
+    async def serve_forever(self):
+        """
+        Serve requests until cancelled.
+        """
+        await self._server.serve_forever()
+
+    async def close(self):
+        """
+        Stop listening and close open connections once their running
+        requests finish.
+        """
+        if self._server is None:
+            return
+        self._server.close()
+        for writer in list(self._connections):
+            writer.close()
+        await asyncio.gather(*self._connections.values(), return_exceptions=True)
+        await self._server.wait_closed()
+        self._server = None
+        if self.unix_socket and os.path.exists(self.unix_socket):
+            os.remove(self.unix_socket)
+        logger.info("stopped auth server")
+
+    @property
+    def address(self) -> str:
+        """
+        Address the server listens on: the Unix socket path, or host:port
+        with the port actually bound.
+        """
+        if self.unix_socket:
+            return self.unix_socket
+        host, port = self._server.sockets[0].getsockname()[:2]
+        return f"{host}:{port}"
+
+    async def _handle(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        self._connections[writer] = asyncio.current_task()
+        try:
+            while True:
+                try:
+                    request = await _read_request(reader)
+                except _HTTPError as e:
+                    writer.write(_response(e.status, {"error": e.message}, keep_alive=False))
+                    await writer.drain()
+                    break
+                if request is None:
+                    break
+
+                method, target, headers, body, keep_alive = request
+                try:
+                    status, payload = await self._dispatch(method, target, headers, body)
+                except _HTTPError as e:
+                    status, payload = e.status, {"error": e.message}
+                except Exception as e:
+                    logger.error("auth server request failed", method=method, target=target, error=str(e))
+                    status, payload = 500, {"error": "Internal server error"}
+
+                writer.write(_response(status, payload, keep_alive))
+                await writer.drain()
+                if not keep_alive:
+                    break
+        except (ConnectionError, asyncio.IncompleteReadError):
+            pass
+        finally:
+            self._connections.pop(writer, None)
+            writer.close()
+
+    async def _dispatch(self, method: str, target: str, headers: dict, body: bytes) -> Tuple[int, dict]:
+        if not self.unix_socket and headers.get("host", "").lower() not in self.allowed_hosts:
+            raise _HTTPError(403, "Host header does not match the server's address")
+        if self.token and not hmac.compare_digest(headers.get("authorization", "").encode(), f"Bearer {self.token}".encode()):
+            raise _HTTPError(401, "Missing or invalid token")
+
+        url = urlsplit(target)
+        routes = {
+            "/health": ("GET", self._health),
+            "/auth": ("POST", self._auth),
+            "/auth/batch": ("POST", self._auth_batch),
+            "/sessions": ("GET", self._sessions),
+            "/sessions/expired": ("POST", self._session_expired),
+        }
+        route = routes.get(url.path)
+        if route is None:
+            raise _HTTPError(404, f"No endpoint {url.path}")
+        if method != route[0]:
+            raise _HTTPError(405, f"{url.path} only accepts {route[0]}")
+
+        if method == "POST":
+            if headers.get("content-type", "").partition(";")[0].strip().lower() != "application/json":
+                raise _HTTPError(415, "Content-Type must be application/json")
+            try:
+                request = json.loads(body or b"null")
+            except ValueError:
+                raise _HTTPError(400, "Body is not valid JSON")
+            if not isinstance(request, dict):
+                raise _HTTPError(400, "Body must be a JSON object")
+        else:
+            request = {name: values[-1] for name, values in parse_qs(url.query).items()}
+        return await route[1](request)
+
+    async def _health(self, request: dict) -> Tuple[int, dict]:
+        return 200, {"status": "ok"}
+
+    async def _auth(self, request: dict) -> Tuple[int, dict]:
+        website, username, cdp_url = _job(request)
+        refresh = self.refresher is not None and bool(request.get("refresh"))
+        if refresh and (normalize_host(website), username) not in self._expired:
+            cookies = self.refresher.get(website, username)
+            if cookies is not None:
+                return 200, {"cookies": cookies}
+
+        try:
+            cookies = await self.agent_auth.auth(website, username, cdp_url=cdp_url)
+        except LookupError as e:
+            return 404, {"error": str(e)}
+        except Exception as e:
+            return 502, {"error": f"{type(e).__name__}: {e}"}
+
+        if refresh:
+            self.refresher.track(website, username, cookies)
+            self._expired.discard((normalize_host(website), username))
+        return 200, {"cookies": cookies}
+
+    async def _auth_batch(self, request: dict) -> Tuple[int, dict]:
+        jobs = request.get("jobs")
+        if not isinstance(jobs, list):
+            raise _HTTPError(400, "Expected a list of jobs")
+        if len(jobs) > self.max_batch:
+            raise _HTTPError(400, f"At most {self.max_batch} jobs are accepted in one batch")
+        if not all(isinstance(job, dict) for job in jobs):
+            raise _HTTPError(400, "Each job must be a JSON object")
+        jobs = [_job(job) for job in jobs]
+        concurrency = request.get("concurrency", 4)
+        if not isinstance(concurrency, int) or concurrency < 1:
+            raise _HTTPError(400, "concurrency must be a positive integer")
+
+        results: List[Optional[dict]] = [None] * len(jobs)
+        async for result in self.agent_auth.auth_many(jobs, concurrency=concurrency):
+            results[result.index] = {"website": result.website, "username": result.username, "ok": result.ok}
+            if result.ok:
+                results[result.index]["cookies"] = result.cookies
+            else:
+                results[result.index]["error"] = f"{type(result.error).__name__}: {result.error}"
+        return 200, {"results": results}
+
+    async def _sessions(self, request: dict) -> Tuple[int, dict]:
+        statuses = self.refresher.status() if self.refresher else []
+        if "website" not in request and "username" not in request:
+            return 200, {"sessions": statuses}
+
+        website, username, _ = _job(request)
+        session_cache = self.agent_auth.session_cache
+        refresh = next((status for status in statuses if normalize_host(status["website"]) == normalize_host(website) and status["username"] == username), None)
+        return 200, {
+            "website": website,
+            "username": username,
+            "cached": bool(session_cache and session_cache.get(website, username) is not None),
+            "refresh": refresh,
+        }
+
+    async def _session_expired(self, request: dict) -> Tuple[int, dict]:
+        website, username, _ = _job(request)
+        if self.agent_auth.session_cache:
+            self.agent_auth.session_cache.invalidate(website, username)
+        if self.refresher and self.refresher.get(website, username) is not None:
+            # The refresher logs in again right away. A request in the
+            # meantime joins that login instead of getting the old cookies.
+            self.refresher.report_expired(website, username)
+            self._expired.add((normalize_host(website), username))
+        return 200, {"status": "ok"}
+
+class _HTTPError(Exception):
+    def __init__(self, status: int, message: str):
+        super().__init__(message)
+        self.status = status
+        self.message = message
+
+async def _read_request(reader: asyncio.StreamReader) -> Optional[tuple]:
+    try:
+        line = await reader.readline()
+        if not line:
+            return None
+        try:
+            method, target, version = line.decode("latin-1").split()
+        except ValueError:
+            raise _HTTPError(400, "Malformed request line")
+
+        headers = {}
+        while True:
+            line = await reader.readline()
+            if line in (b"\r\n", b"\n", b""):
+                break
+            if len(headers) >= MAX_HEADERS:
+                raise _HTTPError(400, "Too many headers")
+            name, _, value = line.decode("latin-1").partition(":")
+            headers[name.strip().lower()] = value.strip()
+    except ValueError:
+        # A line longer than the stream's limit
+        raise _HTTPError(400, "Request line or header too long")
+
+    if "chunked" in headers.get("transfer-encoding", "").lower():
+        raise _HTTPError(411, "Chunked request bodies are not supported")
+    try:
+        length = int(headers.get("content-length", 0))
+    except ValueError:
+        raise _HTTPError(400, "Invalid Content-Length")
+    if length > MAX_BODY_BYTES:
+        raise _HTTPError(413, f"Body larger than {MAX_BODY_BYTES} bytes")
+    body = await reader.readexactly(length) if length > 0 else b""
+
+    connection = headers.get("connection", "").lower()
+    keep_alive = connection != "close" if version == "HTTP/1.1" else connection == "keep-alive"
+    return method.upper(), target, headers, body, keep_alive
+
+def _response(status: int, payload: dict, keep_alive: bool) -> bytes:
+    body = json.dumps(payload).encode()
+    head = (
+        f"HTTP/1.1 {status} {REASONS.get(status, '')}\r\n"
+        "Content-Type: application/json\r\n"
+        f"Content-Length: {len(body)}\r\n"
+        f"Connection: {'keep-alive' if keep_alive else 'close'}\r\n"
+        "\r\n"
+    )
+    return head.encode("latin-1") + body
+
+def _bound_hosts(host: str, port: int) -> set:
+    names = {host}
+    try:
+        if ipaddress.ip_address(host).is_loopback:
+            names.add("localhost")
+    except ValueError:
+        pass
+    return {f"[{name}]:{port}" if ":" in name else f"{name}:{port}" for name in names}
+
+def _job(request: dict) -> Tuple[str, str, Optional[str]]:
+    website, username, cdp_url = request.get("website"), request.get("username"), request.get("cdp_url")
+    if not isinstance(website, str) or not website or not isinstance(username, str) or not username:
+        raise _HTTPError(400, "website and username are required")
+    if cdp_url is not None and not isinstance(cdp_url, str):
+        raise _HTTPError(400, "cdp_url must be a string")
+    return website, username, cdp_url
+
+def main(argv: List[str] = None):
+    parser = argparse.ArgumentParser(prog="agentauth serve", description="Serve logins over a local HTTP API.")
+    parser.add_argument("--setup", required=True, help="'module:function' that creates the AgentAuth to serve")
+    parser.add_argument("--host", default="127.0.0.1", help="Address to listen on")
+    parser.add_argument("--port", type=int, default=8731, help="Port to listen on")
+    parser.add_argument("--socket", help="Unix socket to listen on instead of TCP")
+    parser.add_argument(
+        "--token-file",
+        default=os.path.expanduser("~/.agentauth/server.token"),
+        help="Where to write a new token when listening on TCP without AGENTAUTH_SERVER_TOKEN",
+    )
+    parser.add_argument("--refresh", action="store_true", help="Keep sessions requested with \"refresh\": true fresh in the background")
+    args = parser.parse_args(argv)
+
+    token = os.getenv("AGENTAUTH_SERVER_TOKEN")
+    if not token and not args.socket:
+        token = _write_token(args.token_file)
+        logger.info("generated server token", path=args.token_file)
+
+    asyncio.run(_serve(args, token))
+
+def _write_token(path: str) -> str:
+    token = secrets.token_urlsafe(32)
+    os.makedirs(os.path.dirname(os.path.abspath(path)), mode=0o700, exist_ok=True)
+    fd = os.open(path, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o600)
+    with os.fdopen(fd, "w") as file:
+        os.fchmod(file.fileno(), 0o600)
+        file.write(token)
+    return token
+
+async def _serve(args: argparse.Namespace, token: Optional[str]):
+    from agentauth.session_refresher import SessionRefresher
+
+    aa = await load_agentauth(args.setup)
+    refresher = SessionRefresher(aa) if args.refresh else None
+    server = AuthServer(aa, args.host, args.port, args.socket, token, refresher)
+
+    stop = asyncio.Event()
+    loop = asyncio.get_running_loop()
+    for signal_number in (signal.SIGINT, signal.SIGTERM):
+        loop.add_signal_handler(signal_number, stop.set)
+
+    try:
+        async with server:
+            if refresher:
+                refresher.start()
+            await stop.wait()
+    finally:
+        if refresher:
+            await refresher.close()
+        await aa.close()
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,219 @@
+from collections import OrderedDict
+import hashlib
+import json
+import os
+import time
+from typing import List, Optional, Tuple
+
+from cryptography.fernet import Fernet, InvalidToken
+
+from agentauth import logger
+from agentauth.credential_index import normalize_host
+
+class _CacheEntry:
+    __slots__ = ("cookies", "expires_at")
+
+    def __init__(self, cookies: List[dict], expires_at: float):
+        self.cookies = cookies
+        self.expires_at = expires_at
+
+class SessionCache:
+    """
+    SessionCache stores authenticated session cookies so that repeated calls
+    to `AgentAuth.auth` for the same website and username can skip the
+    browser and the LLM entirely.
+
+    Entries are keyed by normalized hostname and username. An entry expires
+    when the earliest `expires` timestamp among its cookies is reached (minus
+    a safety margin). Session cookies without an expiry are kept for at most
+    `default_ttl` seconds.
+
+    The cache always has an in-memory tier with LRU eviction. If `path` is
+    provided, entries are also written to that directory, encrypted with
+    Fernet (AES-128-CBC with HMAC-SHA256), so they survive process restarts.
+
+    Args:
+        max_entries (int, optional): Maximum number of entries kept in memory.
+            Defaults to 1024.
+        default_ttl (float, optional): Maximum lifetime in seconds of an entry,
+            used as is when no cookie has an expiry. Defaults to 3600.
+        expiry_margin (float, optional): Seconds before the earliest cookie
+            expiry at which an entry is considered expired. Defaults to 60.
+        path (str, optional): Directory for the encrypted on-disk tier.
+        encryption_key (str | bytes, optional): Fernet key for the on-disk tier.
+            Required if path is provided. See `SessionCache.generate_key`.
+
+    Example:
+        ```python
+        cache = SessionCache(path=".agentauth/sessions", encryption_key=os.getenv("SESSION_CACHE_KEY"))
+        aa = AgentAuth(credential_manager=credential_manager, session_cache=cache)
+
+        # Only the first call launches a browser
+        cookies = await aa.auth("https://www.example.com", "user@example.com")
+        cookies = await aa.auth("https://www.example.com", "user@example.com")
+        ```
+    """
+
+    def __init__(
+            self,
+            max_entries: int = 1024,
+            default_ttl: float = 3600,
+            expiry_margin: float = 60,
+            path: str = None,
+            encryption_key: str | bytes = None,
+        ):
+        if path and not encryption_key:
+            raise ValueError("An encryption key is required for the on-disk session cache")
+
+        self.max_entries = max_entries
+        self.default_ttl = default_ttl
+        self.expiry_margin = expiry_margin
+        self.path = path
+
+        self._entries: OrderedDict[Tuple[str, str], _CacheEntry] = OrderedDict()
+        self._fernet = Fernet(encryption_key) if path else None
+
+        if path:
+            os.makedirs(path, mode=0o700, exist_ok=True)
+
+    @staticmethod
+    def generate_key() -> str:
+        """
+        Generate a new key for the encrypted on-disk tier.
+
+        Returns:
+            str: A URL-safe base64-encoded 32-byte key
+        """
+        return Fernet.generate_key().decode()
+
+    def get(self, website: str, username: str) -> Optional[List[dict]]:
+        """
+        Get unexpired cookies for a website and username.
+
+        Args:
+            website (str): The website URL
+            username (str): The username
+
+        Returns:
+            List[dict]: A copy of the cached cookies, or None if there is no
+                valid entry
+        """
+        key = (normalize_host(website), username)
+        now = time.time()
+
+        entry = self._entries.get(key)
+        if entry is not None:
+            if entry.expires_at > now:
+                self._entries.move_to_end(key)
+                return [dict(cookie) for cookie in entry.cookies]
+            del self._entries[key]
+
+        if self._fernet:
+            entry = self._read(key)
+            if entry is not None:
+                if entry.expires_at > now:
+                    self._remember(key, entry)
+                    return [dict(cookie) for cookie in entry.cookies]
+                self._delete(key)
+
+        return None
+
+    def set(self, website: str, username: str, cookies: List[dict]):
+        """
+        Cache cookies for a website and username.
+
+        Args:
+            website (str): The website URL
+            username (str): The username
+            cookies (List[dict]): Cookies as returned by Playwright's
+                `BrowserContext.cookies()`
+        """
+        key = (normalize_host(website), username)
+        entry = _CacheEntry([dict(cookie) for cookie in cookies], self._expires_at(cookies))
+        if entry.expires_at <= time.time():
+            return
+
+        self._remember(key, entry)
+        if self._fernet:
+            self._write(key, entry)
+
+    def invalidate(self, website: str, username: str):
+        """
+        Remove any cached cookies for a website and username.
+
+        Args:
+            website (str): The website URL
+            username (str): The username
+        """
+        key = (normalize_host(website), username)
+        self._entries.pop(key, None)
+        if self._fernet:
+            self._delete(key)
+
+    def clear(self):
+        """
+        Remove all cached cookies from memory and disk.
+        """
+        self._entries.clear()
+        if self._fernet:
+            for file_name in os.listdir(self.path):
+                if file_name.endswith(".session"):
+                    os.remove(os.path.join(self.path, file_name))
+
+    def _expires_at(self, cookies: List[dict]) -> float:
+        expires_at = time.time() + self.default_ttl
+        for cookie in cookies:
+            expires = cookie.get("expires")
+            # Playwright uses -1 for session cookies
+            if expires is not None and expires > 0:
+                expires_at = min(expires_at, expires - self.expiry_margin)
+        return expires_at
+
+    def _remember(self, key: Tuple[str, str], entry: _CacheEntry):
+        self._entries[key] = entry
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    def _file_path(self, key: Tuple[str, str]) -> str:
+        digest = hashlib.sha256("\0".join(key).encode()).hexdigest()
+        return os.path.join(self.path, f"{digest}.session")
+
+    def _read(self, key: Tuple[str, str]) -> Optional[_CacheEntry]:
+        try:
+            with open(self._file_path(key), "rb") as file:
+                token = file.read()
+        except FileNotFoundError:
+            return None
+
+        try:
+            data = json.loads(self._fernet.decrypt(token))
+        except (InvalidToken, ValueError):
+            logger.warning("discarded unreadable session cache entry", host=key[0], username=key[1])
+            self._delete(key)
+            return None
+
+        if data.get("host") != key[0] or data.get("username") != key[1]:
+            return None
+        return _CacheEntry(data["cookies"], data["expires_at"])
+
+    def _write(self, key: Tuple[str, str], entry: _CacheEntry):
+        token = self._fernet.encrypt(json.dumps({
+            "host": key[0],
+            "username": key[1],
+            "expires_at": entry.expires_at,
+            "cookies": entry.cookies,
+        }).encode())
+
+        file_path = self._file_path(key)
+        tmp_path = f"{file_path}.{os.getpid()}.tmp"
+        fd = os.open(tmp_path, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o600)
+        with os.fdopen(fd, "wb") as file:
+            file.write(token)
+        os.replace(tmp_path, file_path)
+
+    def _delete(self, key: Tuple[str, str]):
+        try:
+            os.remove(self._file_path(key))
+        except FileNotFoundError:
+            pass
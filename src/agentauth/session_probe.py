@@ -0,0 +1,174 @@
+import asyncio
+import time
+from typing import TYPE_CHECKING, List
+from urllib.error import HTTPError, URLError
+from urllib.parse import urlparse
+from urllib.request import HTTPRedirectHandler, Request, build_opener
+
+from agentauth import logger
+
+if TYPE_CHECKING:
+    from browser_use.browser.context import BrowserContext
+
+# Enough of a page to find a logged-in marker without reading large downloads
+MAX_BODY_BYTES = 1024 * 1024
+
+USER_AGENT = "Mozilla/5.0 (compatible; agentauth session probe)"
+
+class SessionProbe:
+    """
+    SessionProbe checks whether session cookies are still logged in, by
+    requesting a page that only logged-in users can see.
+
+    By default the probe is a single HTTP request without following
+    redirects. The session is valid if the page answers with a 2xx status
+    and, if `text` is given, the page contains it. A redirect (usually to
+    the login page), 401 or 403 means the session has ended.
+
+    Pages that render with JavaScript can be probed in a browser instead,
+    with `selector` or `browser=True`. The page is opened in a reused
+    browser, and the session is valid if the page does not redirect to
+    another path and, if given, the selector matches and the text is shown.
+
+    Args:
+        url (str): A page only logged-in users can see, e.g. an account page
+        selector (str, optional): CSS selector of an element only shown to
+            logged-in users. Requires a browser.
+        text (str, optional): Text only shown to logged-in users
+        browser (bool, optional): Whether to probe in a browser. Defaults to
+            False, or True if `selector` is given.
+        timeout (float, optional): Seconds to wait for the page. Defaults to 10.
+
+    Example:
+        ```python
+        probe = SessionProbe("https://www.example.com/account", text="Sign out")
+        cookies = await aa.ensure_session("https://www.example.com", "user@example.com", cookies, probe)
+        ```
+    """
+
+    def __init__(self, url: str, selector: str = None, text: str = None, browser: bool = False, timeout: float = 10):
+        self.url = url
+        self.selector = selector
+        self.text = text
+        self.browser = browser or selector is not None
+        self.timeout = timeout
+
+    async def check(self, cookies: List[dict], browser_context: "BrowserContext" = None) -> bool:
+        """
+        Check whether cookies are still logged in.
+
+        Args:
+            cookies (List[dict]): Cookies as returned by `AgentAuth.auth`
+            browser_context (BrowserContext, optional): Browser context to
+                probe in. Required if the probe uses a browser.
+
+        Returns:
+            bool: Whether the session is still valid
+        """
+        if not self.browser:
+            return await asyncio.to_thread(self.check_http, cookies)
+
+        if browser_context is None:
+            raise ValueError("A browser context is required to probe with a browser")
+        return await self._check_browser(cookies, browser_context)
+
+    def check_http(self, cookies: List[dict]) -> bool:
+        """
+        Check cookies with a single HTTP request. Blocks until the response
+        is read; use `check` from async code.
+
+        Args:
+            cookies (List[dict]): Cookies as returned by `AgentAuth.auth`
+
+        Returns:
+            bool: Whether the session is still valid
+        """
+        request = Request(self.url, headers={"User-Agent": USER_AGENT})
+        cookie_header = cookie_header_for(cookies, self.url)
+        if cookie_header:
+            request.add_header("Cookie", cookie_header)
+
+        try:
+            with _OPENER.open(request, timeout=self.timeout) as response:
+                body = response.read(MAX_BODY_BYTES) if self.text else b""
+        except HTTPError as e:
+            logger.info("session probe rejected cookies", url=self.url, status=e.code, location=e.headers.get("Location"))
+            return False
+        except (URLError, OSError) as e:
+            raise RuntimeError(f"Session probe of {self.url} failed: {e}") from e
+
+        if self.text and self.text not in body.decode(errors="replace"):
+            logger.info("session probe page is missing logged-in text", url=self.url)
+            return False
+        return True
+
+    async def _check_browser(self, cookies: List[dict], browser_context: "BrowserContext") -> bool:
+        browser_session = await browser_context.get_session()
+        context = browser_session.context
+        if cookies:
+            await context.add_cookies(cookies)
+
+        page = await context.new_page()
+        try:
+            await page.goto(self.url, timeout=self.timeout * 1000, wait_until="domcontentloaded")
+
+            probed, final = urlparse(self.url), urlparse(page.url)
+            if (final.netloc, final.path) != (probed.netloc, probed.path):
+                logger.info("session probe was redirected", url=self.url, final_url=page.url)
+                return False
+
+            if self.selector:
+                try:
+                    await page.locator(self.selector).first.wait_for(timeout=self.timeout * 1000)
+                except Exception:
+                    logger.info("session probe page is missing logged-in element", url=self.url, selector=self.selector)
+                    return False
+
+            if self.text and self.text not in await page.content():
+                logger.info("session probe page is missing logged-in text", url=self.url)
+                return False
+            return True
+        finally:
+            await page.close()
+
+def cookie_header_for(cookies: List[dict], url: str) -> str:
+    """
+    Build the Cookie header a browser would send to a URL.
+
+    Args:
+        cookies (List[dict]): Cookies as returned by Playwright's
+            `BrowserContext.cookies()`
+        url (str): The URL being requested
+
+    Returns:
+        str: The header value, or an empty string if no cookie applies
+    """
+    parsed = urlparse(url)
+    host = (parsed.hostname or "").lower()
+    path = parsed.path or "/"
+    now = time.time()
+
+    pairs = []
+    for cookie in cookies:
+        domain = (cookie.get("domain") or host).lower().lstrip(".")
+        if host != domain and not host.endswith(f".{domain}"):
+            continue
+        cookie_path = cookie.get("path") or "/"
+        if not (path == cookie_path or path.startswith(cookie_path.rstrip("/") + "/")):
+            continue
+        if cookie.get("secure") and parsed.scheme != "https":
+            continue
+        # Playwright uses -1 for session cookies
+        expires = cookie.get("expires")
+        if expires is not None and 0 < expires <= now:
+            continue
+        pairs.append(f"{cookie['name']}={cookie['value']}")
+    return "; ".join(pairs)
+
+class _NoRedirect(HTTPRedirectHandler):
+    # Redirects raise HTTPError, so a redirect to the login page reads as
+    # logged out and cookies are never sent to another host
+    def redirect_request(self, req, fp, code, msg, headers, newurl):
+        return None
+
+_OPENER = build_opener(_NoRedirect)
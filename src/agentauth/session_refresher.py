@@ -0,0 +1,391 @@
+import asyncio
+import heapq
+import inspect
+import random
+import time
+from typing import TYPE_CHECKING, Callable, Dict, List, Optional, Tuple
+
+from agentauth import logger
+from agentauth.credential_index import normalize_host
+
+if TYPE_CHECKING:
+    from agentauth.agentauth import AgentAuth
+
+class _TrackedSession:
+    __slots__ = ("key", "website", "username", "cookies", "obtained_at", "expires_at", "refresh_at", "failures", "error", "refreshing", "ready")
+
+    def __init__(self, website: str, username: str):
+        self.key = _key(website, username)
+        self.website = website
+        self.username = username
+        self.cookies: List[dict] = None
+        self.obtained_at = 0.0
+        self.expires_at = 0.0
+        self.refresh_at = 0.0
+        self.failures = 0
+        self.error: Exception = None
+        self.refreshing = False
+        # Set once the first login succeeds or fails
+        self.ready = asyncio.Event()
+
+class SessionRefresher:
+    """
+    SessionRefresher keeps the cookies of long-lived sessions fresh by
+    logging in again in the background before they expire, so agents read
+    current cookies instead of waiting on a login.
+
+    A session's expiry is the earliest `expires` value among its cookies.
+    Cookies without an expiry are assumed to last `default_lifetime`
+    seconds. When an agent finds a session ended early and calls
+    `report_expired`, the lifetime it observed is used for later sessions
+    of the same site. Each session is refreshed up to `refresh_ahead`
+    seconds before it expires, moved earlier by a random share (`jitter`)
+    of its remaining lifetime, so sessions obtained together are not
+    refreshed together. At most `concurrency` logins run at once. Failed
+    refreshes are retried with exponential backoff while the old cookies
+    are kept.
+
+    New cookies are published to subscribers and returned by `get`.
+    Sessions are identified by hostname and username like `SessionCache`,
+    so "https://example.com/login" and "https://example.com" are the same
+    session.
+
+    Args:
+        agent_auth (AgentAuth): Instance used to log in
+        concurrency (int, optional): Maximum concurrent refreshes. Defaults to 4.
+        refresh_ahead (float, optional): Seconds before expiry to refresh.
+            Defaults to 300.
+        jitter (float, optional): Fraction of the remaining lifetime by which
+            a refresh may randomly be moved earlier. Defaults to 0.1.
+        default_lifetime (float, optional): Assumed lifetime in seconds of
+            cookies without an expiry. Defaults to 3600.
+        retry_interval (float, optional): Seconds before the first retry of a
+            failed refresh, doubled for each further failure up to
+            `max_retry_interval`. Defaults to 30.
+        max_retry_interval (float, optional): Longest wait between retries.
+            Defaults to 600.
+        cdp_url (str, optional): CDP URL for remote browser service
+        headless (bool, optional): Whether to run local browsers in headless mode.
+            Defaults to True.
+
+    Example:
+        ```python
+        async with SessionRefresher(aa) as refresher:
+            refresher.subscribe(lambda website, username, cookies: print("refreshed", website))
+            refresher.track("https://www.example.com", "user@example.com", cookies)
+
+            # In the agent, always current and never blocking
+            cookies = refresher.get("https://www.example.com", "user@example.com")
+        ```
+    """
+
+    def __init__(
+            self,
+            agent_auth: "AgentAuth",
+            concurrency: int = 4,
+            refresh_ahead: float = 300,
+            jitter: float = 0.1,
+            default_lifetime: float = 3600,
+            retry_interval: float = 30,
+            max_retry_interval: float = 600,
+            cdp_url: str = None,
+            headless: bool = True,
+        ):
+        if concurrency < 1:
+            raise ValueError("concurrency must be at least 1")
+
+        self.agent_auth = agent_auth
+        self.concurrency = concurrency
+        self.refresh_ahead = refresh_ahead
+        self.jitter = jitter
+        self.default_lifetime = default_lifetime
+        self.retry_interval = retry_interval
+        self.max_retry_interval = max_retry_interval
+        self.cdp_url = cdp_url
+        self.headless = headless
+
+        self._sessions: Dict[Tuple[str, str], _TrackedSession] = {}
+        # Observed session lifetime in seconds per site
+        self._lifetimes: Dict[str, float] = {}
+        self._subscribers: List[Tuple[Callable, Optional[str], Optional[str]]] = []
+        # Min-heap of (refresh_at, sequence, key); entries whose time no
+        # longer matches their session's refresh_at are skipped
+        self._schedule: List[Tuple[float, int, Tuple[str, str]]] = []
+        self._sequence = 0
+        self._semaphore = asyncio.Semaphore(concurrency)
+        self._wakeup = asyncio.Event()
+        self._scheduler: asyncio.Task = None
+        self._tasks = set()
+
+    async def __aenter__(self) -> "SessionRefresher":
+        self.start()
+        return self
+
+    async def __aexit__(self, *exc_info):
+        await self.close()
+
+    def start(self):
+        """
+        Start refreshing in the background. Must be called from a running
+        event loop.
+        """
+        if self._scheduler is None:
+            self._scheduler = asyncio.create_task(self._run())
+
+    async def close(self):
+        """
+        Stop refreshing and cancel refreshes in progress.
+        """
+        tasks = list(self._tasks)
+        if self._scheduler is not None:
+            tasks.append(self._scheduler)
+            self._scheduler = None
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+
+    def track(self, website: str, username: str, cookies: List[dict] = None):
+        """
+        Keep a session fresh. Without cookies, the session is logged into
+        in the background as soon as possible.
+
+        Args:
+            website (str): The website URL
+            username (str): The username
+            cookies (List[dict], optional): Current cookies of the session
+        """
+        key = _key(website, username)
+        session = self._sessions.get(key)
+        if session is None:
+            session = self._sessions[key] = _TrackedSession(website, username)
+
+        if cookies:
+            self._update(session, cookies, publish=False)
+        elif not session.refreshing:
+            self._reschedule(session, time.time())
+
+    def untrack(self, website: str, username: str):
+        """
+        Stop refreshing a session.
+
+        Args:
+            website (str): The website URL
+            username (str): The username
+        """
+        self._sessions.pop(_key(website, username), None)
+
+    def get(self, website: str, username: str) -> Optional[List[dict]]:
+        """
+        Get the latest cookies of a tracked session without waiting.
+
+        Args:
+            website (str): The website URL
+            username (str): The username
+
+        Returns:
+            List[dict]: The cookies, or None if the session is not tracked or
+                its first login has not finished
+        """
+        session = self._sessions.get(_key(website, username))
+        return session.cookies if session else None
+
+    async def wait(self, website: str, username: str, timeout: float = None) -> List[dict]:
+        """
+        Get the cookies of a tracked session, waiting for its first login
+        if needed.
+
+        Args:
+            website (str): The website URL
+            username (str): The username
+            timeout (float, optional): Seconds to wait. Defaults to no limit.
+
+        Returns:
+            List[dict]: The cookies
+
+        Raises:
+            LookupError: If the session is not tracked
+            RuntimeError: If the session has no cookies because its last
+                login failed. The login is still retried in the background.
+            asyncio.TimeoutError: If the timeout passes first
+        """
+        session = self._sessions.get(_key(website, username))
+        if session is None:
+            raise LookupError(f"Session for {username} on {website} is not tracked")
+        await asyncio.wait_for(session.ready.wait(), timeout)
+        if session.cookies is None:
+            raise RuntimeError(f"Failed to log in as {username} on {website}: {session.error}") from session.error
+        return session.cookies
+
+    def report_expired(self, website: str, username: str):
+        """
+        Report that a session's cookies stopped working. The session is
+        refreshed right away, and the lifetime it had is used to schedule
+        later sessions of the same site.
+
+        Args:
+            website (str): The website URL
+            username (str): The username
+        """
+        session = self._sessions.get(_key(website, username))
+        if session is None or session.cookies is None:
+            return
+
+        now = time.time()
+        lifetime = now - session.obtained_at
+        if lifetime > 0 and now < session.expires_at:
+            self._lifetimes[normalize_host(website)] = lifetime
+            logger.info("observed early session expiry", website=website, username=username, lifetime=round(lifetime, 1))
+        if not session.refreshing:
+            self._reschedule(session, now)
+
+    def subscribe(self, callback: Callable, website: str = None, username: str = None) -> Callable[[], None]:
+        """
+        Call a function with the new cookies after each refresh.
+
+        The callback receives `(website, username, cookies)`. It may be a
+        coroutine function, in which case it runs as a task. Exceptions it
+        raises are logged and do not affect refreshes.
+
+        Args:
+            callback (Callable): The function to call
+            website (str, optional): Only call it for this website
+            username (str, optional): Only call it for this username
+
+        Returns:
+            Callable[[], None]: A function that unsubscribes the callback
+        """
+        subscriber = (callback, normalize_host(website) if website is not None else None, username)
+        self._subscribers.append(subscriber)
+
+        def unsubscribe():
+            if subscriber in self._subscribers:
+                self._subscribers.remove(subscriber)
+
+        return unsubscribe
+
+    def status(self) -> List[dict]:
+        """
+        Get the refresh state of every tracked session.
+
+        Returns:
+            List[dict]: Website, username, expiry and next refresh (Unix
+                times), consecutive failures and whether a refresh is running
+        """
+        return [
+            {
+                "website": session.website,
+                "username": session.username,
+                "expires_at": session.expires_at if session.cookies else None,
+                "refresh_at": session.refresh_at,
+                "failures": session.failures,
+                "refreshing": session.refreshing,
+            }
+            for session in self._sessions.values()
+        ]
+
+    async def _run(self):
+        while True:
+            now = time.time()
+            while self._schedule and self._schedule[0][0] <= now:
+                refresh_at, _, key = heapq.heappop(self._schedule)
+                session = self._sessions.get(key)
+                if session is None or session.refreshing or session.refresh_at != refresh_at:
+                    continue
+                session.refreshing = True
+                task = asyncio.create_task(self._refresh(session))
+                self._tasks.add(task)
+                task.add_done_callback(self._tasks.discard)
+
+            timeout = self._schedule[0][0] - now if self._schedule else None
+            self._wakeup.clear()
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), timeout)
+            except asyncio.TimeoutError:
+                pass
+
+    async def _refresh(self, session: _TrackedSession):
+        try:
+            async with self._semaphore:
+                # The cached cookies are the ones being replaced
+                if self.agent_auth.session_cache:
+                    self.agent_auth.session_cache.invalidate(session.website, session.username)
+                start = time.perf_counter()
+                cookies = await self.agent_auth.auth(session.website, session.username, cdp_url=self.cdp_url, headless=self.headless)
+        except Exception as e:
+            session.failures += 1
+            session.error = e
+            # Callers waiting for the first login get the failure
+            session.ready.set()
+            delay = min(self.retry_interval * 2 ** (session.failures - 1), self.max_retry_interval)
+            logger.warning(
+                "failed to refresh session",
+                website=session.website,
+                username=session.username,
+                failures=session.failures,
+                retry_in=round(delay, 1),
+                error=str(e),
+            )
+            session.refreshing = False
+            self._reschedule(session, time.time() + delay * random.uniform(1 - self.jitter, 1))
+        else:
+            session.refreshing = False
+            session.failures = 0
+            session.error = None
+            logger.info("refreshed session", website=session.website, username=session.username, seconds=round(time.perf_counter() - start, 3))
+            self._update(session, cookies)
+
+    def _update(self, session: _TrackedSession, cookies: List[dict], publish: bool = True):
+        now = time.time()
+        session.cookies = cookies
+        session.obtained_at = now
+        session.expires_at = self._expires_at(session.website, cookies, now)
+        session.ready.set()
+
+        usable = max(0.0, session.expires_at - now)
+        lead = min(self.refresh_ahead, usable / 2)
+        self._reschedule(session, session.expires_at - lead - random.uniform(0, self.jitter * (usable - lead)))
+
+        if publish and self._sessions.get(session.key) is session:
+            self._publish(session)
+
+    def _expires_at(self, website: str, cookies: List[dict], now: float) -> float:
+        expires_at = None
+        for cookie in cookies:
+            expires = cookie.get("expires")
+            # Playwright uses -1 for session cookies
+            if expires is not None and expires > 0:
+                expires_at = expires if expires_at is None else min(expires_at, expires)
+
+        lifetime = self._lifetimes.get(normalize_host(website))
+        if lifetime is not None:
+            expires_at = now + lifetime if expires_at is None else min(expires_at, now + lifetime)
+        return expires_at if expires_at is not None else now + self.default_lifetime
+
+    def _reschedule(self, session: _TrackedSession, refresh_at: float):
+        session.refresh_at = refresh_at
+        self._sequence += 1
+        heapq.heappush(self._schedule, (refresh_at, self._sequence, session.key))
+        self._wakeup.set()
+
+    def _publish(self, session: _TrackedSession):
+        for callback, website, username in list(self._subscribers):
+            if website is not None and website != session.key[0]:
+                continue
+            if username is not None and username != session.username:
+                continue
+            try:
+                result = callback(session.website, session.username, session.cookies)
+                if inspect.isawaitable(result):
+                    task = asyncio.ensure_future(result)
+                    self._tasks.add(task)
+                    task.add_done_callback(self._subscriber_done)
+            except Exception as e:
+                logger.warning("session subscriber failed", website=session.website, username=session.username, error=str(e))
+
+    def _subscriber_done(self, task: asyncio.Task):
+        self._tasks.discard(task)
+        if not task.cancelled() and task.exception():
+            logger.warning("session subscriber failed", error=str(task.exception()))
+
+def _key(website: str, username: str) -> Tuple[str, str]:
+    return normalize_host(website), username
@@ -0,0 +1,124 @@
+import asyncio
+from contextlib import asynccontextmanager
+import hashlib
+import os
+import time
+from typing import Any, AsyncIterator, Awaitable, Callable, Dict, Hashable
+
+class SingleFlight:
+    """
+    SingleFlight runs at most one call per key at a time. Callers that ask
+    for a key while its call is in flight wait for that call and get its
+    result or exception instead of starting another.
+
+    A caller that is cancelled stops waiting without cancelling the call,
+    which other callers may still be waiting for. The call is cancelled
+    once all of its callers are, so e.g. a login that every caller timed
+    out on does not keep holding a browser.
+    """
+
+    def __init__(self):
+        self._calls: Dict[Hashable, _Call] = {}
+
+    def in_flight(self, key: Hashable) -> bool:
+        return key in self._calls
+
+    async def do(self, key: Hashable, function: Callable[[], Awaitable[Any]]) -> Any:
+        """
+        Run `function()` for a key, or join the call already in flight.
+
+        Args:
+            key (Hashable): Key of the call
+            function (Callable[[], Awaitable]): Starts the call if none is in flight
+
+        Returns:
+            Any: The result of the call
+        """
+        call = self._calls.get(key)
+        if call is None:
+            call = _Call(asyncio.ensure_future(function()))
+            self._calls[key] = call
+            call.future.add_done_callback(lambda done: self._finish(key, done))
+
+        call.waiters += 1
+        try:
+            return await asyncio.shield(call.future)
+        except asyncio.CancelledError:
+            if call.waiters == 1:
+                call.future.cancel()
+            raise
+        finally:
+            call.waiters -= 1
+
+    def _finish(self, key: Hashable, future: asyncio.Future):
+        call = self._calls.get(key)
+        if call is not None and call.future is future:
+            del self._calls[key]
+        # Retrieve the exception so a call whose callers were all cancelled
+        # does not log "exception was never retrieved"
+        if not future.cancelled():
+            future.exception()
+
+class _Call:
+    __slots__ = ("future", "waiters")
+
+    def __init__(self, future: asyncio.Future):
+        self.future = future
+        self.waiters = 0
+
+class FileLock:
+    """
+    FileLock is an exclusive lock per key shared by all processes on a host,
+    using `flock` on one file per key in a directory. Locks are released
+    when their holder exits, even if it crashes. Requires a POSIX system.
+
+    Args:
+        path (str): Directory for the lock files
+        poll_interval (float, optional): Seconds between attempts to take a
+            held lock. Defaults to 0.05.
+    """
+
+    def __init__(self, path: str, poll_interval: float = 0.05):
+        import fcntl
+
+        self._fcntl = fcntl
+        self.path = path
+        self.poll_interval = poll_interval
+        os.makedirs(path, mode=0o700, exist_ok=True)
+
+    @asynccontextmanager
+    async def hold(self, key: str, timeout: float = None) -> AsyncIterator[float]:
+        """
+        Hold the lock for a key while the block runs, waiting for other
+        holders without blocking the event loop.
+
+        Args:
+            key (str): Key of the lock
+            timeout (float, optional): Seconds to wait for the lock.
+                Defaults to waiting indefinitely.
+
+        Yields:
+            float: Seconds spent waiting for the lock
+
+        Raises:
+            TimeoutError: If the lock was not taken within the timeout
+        """
+        digest = hashlib.sha256(key.encode()).hexdigest()
+        fd = os.open(os.path.join(self.path, f"{digest}.lock"), os.O_RDWR | os.O_CREAT, 0o600)
+        try:
+            start = time.monotonic()
+            while True:
+                try:
+                    self._fcntl.flock(fd, self._fcntl.LOCK_EX | self._fcntl.LOCK_NB)
+                    break
+                except BlockingIOError:
+                    if timeout is not None and time.monotonic() - start >= timeout:
+                        raise TimeoutError(f"Timed out waiting for lock {key!r}")
+                    await asyncio.sleep(self.poll_interval)
+
+            try:
+                yield time.monotonic() - start
+            finally:
+                self._fcntl.flock(fd, self._fcntl.LOCK_UN)
+        finally:
+            os.close(fd)
@@ -0,0 +1,270 @@
+"""
+Runs logins from a JobQueue in several worker processes.
+
+Usage:
+    AGENTAUTH_QUEUE_KEY=... agentauth workers --queue jobs.db --setup myapp.auth:create_agentauth
+        [--processes 4] [--concurrency 4]
+"""
+
+import argparse
+import asyncio
+import multiprocessing
+import os
+import signal
+import time
+from typing import TYPE_CHECKING, Callable, Dict, List
+
+from agentauth import logger
+from agentauth.factory import load_agentauth
+from agentauth.job_queue import Job, JobQueue
+
+if TYPE_CHECKING:
+    from agentauth.agentauth import AgentAuth
+
+class WorkerPool:
+    """
+    WorkerPool runs logins from a `JobQueue` in several processes, so
+    throughput scales across the cores of one host instead of being limited
+    by one event loop.
+
+    Each process calls `setup` once to create its own `AgentAuth`, with its
+    own credential manager, browser pool and inbox connection, and then runs
+    up to `concurrency` jobs at once. Each attempt is limited to the job's
+    timeout, and failed attempts are retried with backoff.
+    Processes are started with the "spawn" method, so `setup` must be
+    importable: a module-level function or a "module:function" string. It
+    may be a coroutine function.
+
+    Stopping the pool lets running jobs finish. Jobs of a process that dies
+    are claimed again by the others once their lease expires, and
+    `ensure_running` replaces dead processes.
+
+    Args:
+        queue_path (str): Path of the queue's SQLite database
+        encryption_key (str | bytes): Fernet key of the queue
+        setup (Callable[[], AgentAuth] | str): Creates each worker's AgentAuth
+        processes (int, optional): Number of worker processes. Defaults to
+            the number of CPUs.
+        concurrency (int, optional): Jobs each process runs at once. Defaults to 4.
+        poll_interval (float, optional): Seconds between checks of an empty
+            queue. Defaults to 0.2.
+        retry_delay (float, optional): Seconds before a failed job's first
+            retry. See `JobQueue`. Defaults to 5.
+        lease_grace (float, optional): Seconds a running job's lease lasts
+            beyond its timeout. See `JobQueue`. Defaults to 30.
+
+    Example:
+        ```python
+        # myapp/auth.py
+        async def create_agentauth() -> AgentAuth:
+            credential_manager = CredentialManager()
+            credential_manager.load_json("credentials.json")
+            return AgentAuth(credential_manager=credential_manager, browser_pool=BrowserPool())
+
+        # Submitting jobs and running the pool
+        queue = JobQueue("jobs.db", encryption_key=key)
+        job_ids = queue.submit_many(jobs)
+        with WorkerPool("jobs.db", key, "myapp.auth:create_agentauth", processes=4):
+            results = await queue.wait(job_ids)
+        ```
+    """
+
+    def __init__(
+            self,
+            queue_path: str,
+            encryption_key: str | bytes,
+            setup: Callable[[], "AgentAuth"] | str,
+            processes: int = None,
+            concurrency: int = 4,
+            poll_interval: float = 0.2,
+            retry_delay: float = 5,
+            lease_grace: float = 30,
+        ):
+        if concurrency < 1:
+            raise ValueError("concurrency must be at least 1")
+
+        self.queue_path = queue_path
+        self.encryption_key = encryption_key
+        self.setup = setup
+        self.processes = processes or os.cpu_count() or 1
+        self.concurrency = concurrency
+        self.poll_interval = poll_interval
+        self.retry_delay = retry_delay
+        self.lease_grace = lease_grace
+
+        self._context = multiprocessing.get_context("spawn")
+        self._stop = self._context.Event()
+        self._workers: List[multiprocessing.Process] = []
+
+        # Create the database here so the workers do not race to create it
+        JobQueue(queue_path, encryption_key).close()
+
+    def __enter__(self) -> "WorkerPool":
+        self.start()
+        return self
+
+    def __exit__(self, *exc_info):
+        self.stop()
+
+    def start(self):
+        """
+        Start the worker processes.
+        """
+        self._stop.clear()
+        self._workers = [self._start_worker(index) for index in range(self.processes)]
+        logger.info("started worker pool", processes=self.processes, concurrency=self.concurrency, queue=self.queue_path)
+
+    def ensure_running(self) -> int:
+        """
+        Replace worker processes that have died.
+
+        Returns:
+            int: Number of processes replaced
+        """
+        replaced = 0
+        for index, worker in enumerate(self._workers):
+            if not worker.is_alive() and not self._stop.is_set():
+                logger.warning("replacing dead worker", worker=index, exitcode=worker.exitcode)
+                self._workers[index] = self._start_worker(index)
+                replaced += 1
+        return replaced
+
+    def stop(self, timeout: float = 60):
+        """
+        Stop the worker processes after their running jobs finish.
+
+        Args:
+            timeout (float, optional): Seconds to wait before terminating
+                workers that are still running. Defaults to 60.
+        """
+        self._stop.set()
+        deadline = time.monotonic() + timeout
+        for worker in self._workers:
+            worker.join(max(0, deadline - time.monotonic()))
+        for worker in self._workers:
+            if worker.is_alive():
+                logger.warning("terminating worker that did not stop in time", pid=worker.pid)
+                worker.terminate()
+                worker.join()
+        self._workers = []
+        logger.info("stopped worker pool", queue=self.queue_path)
+
+    @property
+    def alive(self) -> int:
+        return sum(worker.is_alive() for worker in self._workers)
+
+    def _start_worker(self, index: int) -> multiprocessing.Process:
+        worker = self._context.Process(
+            target=_work,
+            args=(
+                self.queue_path, self.encryption_key, self.retry_delay, self.lease_grace,
+                self.setup, index, self.concurrency, self.poll_interval, self._stop,
+            ),
+            name=f"agentauth-worker-{index}",
+            daemon=True,
+        )
+        worker.start()
+        return worker
+
+def _work(queue_path: str, encryption_key: str | bytes, retry_delay: float, lease_grace: float, setup, index: int, concurrency: int, poll_interval: float, stop):
+    # The parent decides when workers stop, so Ctrl+C in a terminal does
+    # not abort running logins
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+    queue = JobQueue(queue_path, encryption_key, retry_delay, lease_grace)
+    asyncio.run(_work_async(queue, setup, f"{index}:{os.getpid()}", concurrency, poll_interval, stop))
+
+async def _work_async(queue: JobQueue, setup, name: str, concurrency: int, poll_interval: float, stop):
+    aa = await load_agentauth(setup)
+    logger.info("worker ready", worker=name)
+
+    running: Dict[asyncio.Task, Job] = {}
+    try:
+        while not stop.is_set():
+            while len(running) < concurrency:
+                job = await asyncio.to_thread(queue.claim, name)
+                if job is None:
+                    break
+                running[asyncio.create_task(_run_job(aa, queue, job, name))] = job
+
+            if running:
+                done, _ = await asyncio.wait(running, timeout=poll_interval, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    _check_job_task(task, running.pop(task), name)
+            else:
+                await asyncio.sleep(poll_interval)
+
+        if running:
+            done, _ = await asyncio.wait(running)
+            for task in done:
+                _check_job_task(task, running.pop(task), name)
+    finally:
+        await aa.close()
+        queue.close()
+        logger.info("worker stopped", worker=name)
+
+async def _run_job(aa: "AgentAuth", queue: JobQueue, job: Job, name: str):
+    start = time.perf_counter()
+    try:
+        cookies = await asyncio.wait_for(aa.auth(job.website, job.username, cdp_url=job.cdp_url), job.timeout)
+    except asyncio.TimeoutError:
+        error = f"Timed out after {job.timeout:g}s"
+    except Exception as e:
+        error = f"{type(e).__name__}: {e}"
+    else:
+        if await asyncio.to_thread(queue.complete, job.id, cookies, name):
+            logger.info("job succeeded", worker=name, job_id=job.id, website=job.website, username=job.username, seconds=round(time.perf_counter() - start, 3))
+        else:
+            logger.warning("dropped result of job claimed by another worker", worker=name, job_id=job.id)
+        return
+
+    status = await asyncio.to_thread(queue.fail, job.id, error, name)
+    if status is None:
+        logger.warning("dropped result of job claimed by another worker", worker=name, job_id=job.id)
+        return
+    logger.warning(
+        "job failed",
+        worker=name,
+        job_id=job.id,
+        website=job.website,
+        username=job.username,
+        attempt=job.attempts,
+        retrying=status == "queued",
+        error=error,
+    )
+
+def _check_job_task(task: asyncio.Task, job: Job, name: str):
+    # _run_job records login failures itself, so an exception here means
+    # recording the result failed. The job runs again once its lease expires.
+    if not task.cancelled() and task.exception() is not None:
+        logger.error("failed to record job result", worker=name, job_id=job.id, website=job.website, username=job.username, error=repr(task.exception()))
+
+def main(argv: List[str] = None):
+    parser = argparse.ArgumentParser(prog="agentauth workers", description="Run logins from a job queue in several worker processes.")
+    parser.add_argument("--queue", required=True, help="Path of the job queue's SQLite database")
+    parser.add_argument("--setup", required=True, help="'module:function' that creates each worker's AgentAuth")
+    parser.add_argument("--processes", type=int, default=None, help="Worker processes (default: number of CPUs)")
+    parser.add_argument("--concurrency", type=int, default=4, help="Jobs each process runs at once")
+    args = parser.parse_args(argv)
+
+    encryption_key = os.getenv("AGENTAUTH_QUEUE_KEY")
+    if not encryption_key:
+        parser.error("AGENTAUTH_QUEUE_KEY environment variable not set. Generate a key with JobQueue.generate_key().")
+
+    stopping = []
+    signal.signal(signal.SIGTERM, lambda *_: stopping.append(True))
+    pool = WorkerPool(args.queue, encryption_key, args.setup, args.processes, args.concurrency)
+    queue = JobQueue(args.queue, encryption_key)
+    pool.start()
+    try:
+        while not stopping:
+            time.sleep(5)
+            pool.ensure_running()
+            logger.info("job queue status", **queue.counts())
+    except KeyboardInterrupt:
+        pass
+    finally:
+        pool.stop()
+        queue.close()
+
+if __name__ == "__main__":
+    main()
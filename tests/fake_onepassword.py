@@ -0,0 +1,140 @@
+"""
+An in-memory stand-in for the 1Password SDK client, for offline tests and
+benchmarks of CredentialManager.load_1password.
+
+It mimics the onepassword-sdk calls AgentAuth uses: `vaults.list_all()`,
+`items.list_all(vault_id)`, `secrets.resolve(reference)` and, when
+`batch=True`, `secrets.resolve_all(references)`. Every call sleeps for
+`latency` seconds and is counted. Items can be added, updated and deleted
+to exercise refreshes, and references can be made to fail once.
+"""
+
+import asyncio
+from datetime import datetime, timedelta, timezone
+from types import SimpleNamespace
+
+class FakeOnePasswordClient:
+    """
+    Args:
+        vaults (int, optional): Number of vaults
+        items_per_vault (int, optional): Login items per vault
+        websites_per_item (int, optional): Websites per login item
+        latency (float, optional): Seconds each call takes
+        batch (bool, optional): Whether to offer `secrets.resolve_all`
+    """
+
+    def __init__(
+            self,
+            vaults: int = 3,
+            items_per_vault: int = 10,
+            websites_per_item: int = 3,
+            latency: float = 0.0,
+            batch: bool = True,
+        ):
+        self.latency = latency
+        self.calls = {"vaults": 0, "items": 0, "resolve": 0, "resolve_all": 0}
+        self.in_flight = 0
+        self.max_in_flight = 0
+        # References whose next resolve fails, as if 1Password were unavailable
+        self.failing = set()
+
+        self._vaults = [SimpleNamespace(id=f"vault{v}") for v in range(vaults)]
+        self._items = {
+            vault.id: [
+                SimpleNamespace(
+                    id=f"item{i}",
+                    vault_id=vault.id,
+                    websites=[SimpleNamespace(url=f"https://site{i}-{w}.{vault.id}.com") for w in range(websites_per_item)],
+                    updated_at=datetime(2025, 1, 1, tzinfo=timezone.utc),
+                )
+                for i in range(items_per_vault)
+            ]
+            for vault in self._vaults
+        }
+
+        # Every third item has a TOTP secret and every tenth has no password
+        self.values = {}
+        for vault_id, items in self._items.items():
+            for i, item in enumerate(items):
+                prefix = f"op://{vault_id}/{item.id}"
+                self.values[f"{prefix}/username"] = f"user{i}@{vault_id}.com"
+                if i % 10 != 9:
+                    self.values[f"{prefix}/password"] = f"password-{vault_id}-{i}"
+                if i % 3 == 0:
+                    self.values[f"{prefix}/one-time password"] = "JBSWY3DPEHPK3PXP"
+
+        self.vaults = SimpleNamespace(list_all=self._list_vaults)
+        self.items = SimpleNamespace(list_all=self._list_items)
+        self.secrets = SimpleNamespace(resolve=self._resolve)
+        if batch:
+            self.secrets.resolve_all = self._resolve_all
+
+    def add_item(self, vault_id: str, item_id: str, websites: list, username: str, password: str):
+        item = SimpleNamespace(
+            id=item_id,
+            vault_id=vault_id,
+            websites=[SimpleNamespace(url=url) for url in websites],
+            updated_at=datetime.now(timezone.utc),
+        )
+        self._items[vault_id].append(item)
+        self.values[f"op://{vault_id}/{item_id}/username"] = username
+        self.values[f"op://{vault_id}/{item_id}/password"] = password
+
+    def update_item(self, vault_id: str, item_id: str, field: str, value: str):
+        item = next(item for item in self._items[vault_id] if item.id == item_id)
+        item.updated_at += timedelta(seconds=1)
+        self.values[f"op://{vault_id}/{item_id}/{field}"] = value
+
+    def delete_item(self, vault_id: str, item_id: str):
+        self._items[vault_id] = [item for item in self._items[vault_id] if item.id != item_id]
+
+    def authenticate(self):
+        """
+        Get a replacement for `Client.authenticate` that returns this client.
+        """
+        async def authenticate(**kwargs):
+            return self
+        return authenticate
+
+    async def _call(self, name: str):
+        self.calls[name] += 1
+        self.in_flight += 1
+        self.max_in_flight = max(self.max_in_flight, self.in_flight)
+        try:
+            await asyncio.sleep(self.latency)
+        finally:
+            self.in_flight -= 1
+
+    async def _list_vaults(self):
+        await self._call("vaults")
+        return _iterate(self._vaults)
+
+    async def _list_items(self, vault_id: str):
+        await self._call("items")
+        return _iterate(self._items[vault_id])
+
+    async def _resolve(self, reference: str) -> str:
+        await self._call("resolve")
+        if reference in self.failing:
+            self.failing.discard(reference)
+            raise Exception("error resolving secret reference: service unavailable")
+        if reference not in self.values:
+            raise Exception("error resolving secret reference: the specified field cannot be found within the item")
+        return self.values[reference]
+
+    async def _resolve_all(self, references: list):
+        await self._call("resolve_all")
+        responses = {}
+        for reference in references:
+            if reference in self.failing:
+                self.failing.discard(reference)
+                responses[reference] = SimpleNamespace(content=None, error=SimpleNamespace(type="internal"))
+            elif reference in self.values:
+                responses[reference] = SimpleNamespace(content=SimpleNamespace(secret=self.values[reference]), error=None)
+            else:
+                responses[reference] = SimpleNamespace(content=None, error=SimpleNamespace(type="fieldNotFound"))
+        return SimpleNamespace(individual_responses=responses)
+
+async def _iterate(entries: list):
+    for entry in entries:
+        yield entry
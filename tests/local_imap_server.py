@@ -0,0 +1,227 @@
+"""
+A small in-process IMAP4rev1 server for offline tests and benchmarks.
+
+It implements just enough of the protocol for EmailService: LOGIN, SELECT,
+UID SEARCH (ALL, SINCE, UID ranges), UID FETCH, IDLE, NOOP and LOGOUT over
+TLS with a self-signed certificate. Use `client_ssl_context()` on the
+client side to trust it.
+"""
+
+import asyncio
+from datetime import datetime, timedelta, timezone
+from email.message import EmailMessage
+from email.utils import format_datetime
+import os
+import re
+import ssl
+import tempfile
+
+from cryptography import x509
+from cryptography.hazmat.primitives import hashes, serialization
+from cryptography.hazmat.primitives.asymmetric import ec
+from cryptography.x509.oid import NameOID
+
+def make_email(
+        subject: str,
+        text: str,
+        html: str = None,
+        from_: str = "no-reply@example.com",
+        to: str = "agent@example.com",
+        date: datetime = None,
+    ) -> bytes:
+    msg = EmailMessage()
+    msg["Subject"] = subject
+    msg["From"] = from_
+    msg["To"] = to
+    msg["Date"] = format_datetime(date or datetime.now(timezone.utc))
+    msg.set_content(text)
+    if html:
+        msg.add_alternative(html, subtype="html")
+    return msg.as_bytes()
+
+def _self_signed_certificate(directory: str) -> tuple[str, str]:
+    key = ec.generate_private_key(ec.SECP256R1())
+    name = x509.Name([x509.NameAttribute(NameOID.COMMON_NAME, "localhost")])
+    now = datetime.now(timezone.utc)
+    certificate = (
+        x509.CertificateBuilder()
+        .subject_name(name)
+        .issuer_name(name)
+        .public_key(key.public_key())
+        .serial_number(x509.random_serial_number())
+        .not_valid_before(now - timedelta(days=1))
+        .not_valid_after(now + timedelta(days=1))
+        .add_extension(x509.SubjectAlternativeName([x509.DNSName("localhost")]), critical=False)
+        .sign(key, hashes.SHA256())
+    )
+
+    cert_path = os.path.join(directory, "cert.pem")
+    key_path = os.path.join(directory, "key.pem")
+    with open(cert_path, "wb") as file:
+        file.write(certificate.public_bytes(serialization.Encoding.PEM))
+    with open(key_path, "wb") as file:
+        file.write(key.private_bytes(
+            serialization.Encoding.PEM,
+            serialization.PrivateFormat.PKCS8,
+            serialization.NoEncryption(),
+        ))
+    return cert_path, key_path
+
+class LocalImapServer:
+    """
+    Args:
+        username (str, optional): Accepted login username
+        password (str, optional): Accepted login password
+        idle (bool, optional): Whether to advertise and support IDLE
+    """
+
+    def __init__(self, username: str = "agent@example.com", password: str = "password", idle: bool = True):
+        self.username = username
+        self.password = password
+        self.idle = idle
+
+        # (uid, internal date, raw message)
+        self.messages: list[tuple[int, datetime, bytes]] = []
+        self.next_uid = 1
+
+        self.connections = 0
+        self.logins = 0
+        self.searches = 0
+        self.fetched_messages = 0
+
+        self._idlers: set[asyncio.StreamWriter] = set()
+        self._server = None
+        self._directory = tempfile.TemporaryDirectory()
+        self._cert_path, self._key_path = _self_signed_certificate(self._directory.name)
+
+    async def start(self) -> int:
+        server_context = ssl.create_default_context(ssl.Purpose.CLIENT_AUTH)
+        server_context.load_cert_chain(self._cert_path, self._key_path)
+        self._server = await asyncio.start_server(self._handle, "127.0.0.1", 0, ssl=server_context)
+        return self.port
+
+    async def stop(self):
+        self._server.close()
+        for writer in list(self._idlers):
+            writer.close()
+        await self._server.wait_closed()
+        self._directory.cleanup()
+
+    @property
+    def port(self) -> int:
+        return self._server.sockets[0].getsockname()[1]
+
+    def client_ssl_context(self) -> ssl.SSLContext:
+        return ssl.create_default_context(cafile=self._cert_path)
+
+    def deliver(self, raw: bytes, date: datetime = None) -> int:
+        uid = self.next_uid
+        self.next_uid += 1
+        self.messages.append((uid, date or datetime.now(timezone.utc), raw))
+        for writer in list(self._idlers):
+            writer.write(f"* {len(self.messages)} EXISTS\r\n".encode())
+        return uid
+
+    async def _handle(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        self.connections += 1
+        writer.write(b"* OK LocalImapServer ready\r\n")
+        capabilities = "IMAP4rev1 IDLE" if self.idle else "IMAP4rev1"
+        try:
+            while True:
+                line = await reader.readline()
+                if not line:
+                    break
+                parts = line.decode().rstrip("\r\n").split(" ")
+                tag, command, args = parts[0], parts[1].upper(), parts[2:]
+
+                if command == "CAPABILITY":
+                    writer.write(f"* CAPABILITY {capabilities}\r\n{tag} OK CAPABILITY completed\r\n".encode())
+                elif command == "LOGIN":
+                    username, password = args[0].strip('"'), " ".join(args[1:]).strip('"')
+                    if (username, password) != (self.username, self.password):
+                        writer.write(f"{tag} NO [AUTHENTICATIONFAILED] Invalid credentials\r\n".encode())
+                        continue
+                    self.logins += 1
+                    writer.write(f"{tag} OK [CAPABILITY {capabilities}] LOGIN completed\r\n".encode())
+                elif command == "SELECT":
+                    writer.write(
+                        f"* {len(self.messages)} EXISTS\r\n* 0 RECENT\r\n"
+                        f"* OK [UIDVALIDITY 1] UIDs valid\r\n* OK [UIDNEXT {self.next_uid}] Predicted next UID\r\n"
+                        f"{tag} OK [READ-WRITE] SELECT completed\r\n".encode()
+                    )
+                elif command == "NOOP":
+                    writer.write(f"* {len(self.messages)} EXISTS\r\n{tag} OK NOOP completed\r\n".encode())
+                elif command == "IDLE" and self.idle:
+                    self._idlers.add(writer)
+                    writer.write(b"+ idling\r\n")
+                    await writer.drain()
+                    done = await reader.readline()
+                    self._idlers.discard(writer)
+                    if not done:
+                        break
+                    writer.write(f"{tag} OK IDLE terminated\r\n".encode())
+                elif command == "UID" and args[0].upper() == "SEARCH":
+                    self.searches += 1
+                    uids = self._search(args[1:])
+                    writer.write(f"* SEARCH {' '.join(map(str, uids))}\r\n{tag} OK SEARCH completed\r\n".encode())
+                elif command == "UID" and args[0].upper() == "FETCH":
+                    uids = set(self._uids_in(args[1]))
+                    for sequence, (uid, _, raw) in enumerate(self.messages, start=1):
+                        if uid in uids:
+                            self.fetched_messages += 1
+                            writer.write(f"* {sequence} FETCH (UID {uid} RFC822 {{{len(raw)}}}\r\n".encode())
+                            writer.write(raw)
+                            writer.write(b")\r\n")
+                    writer.write(f"{tag} OK FETCH completed\r\n".encode())
+                elif command == "LOGOUT":
+                    writer.write(f"* BYE Logging out\r\n{tag} OK LOGOUT completed\r\n".encode())
+                    await writer.drain()
+                    break
+                else:
+                    writer.write(f"{tag} BAD Unsupported command\r\n".encode())
+                await writer.drain()
+        except (ConnectionError, ssl.SSLError):
+            pass
+        finally:
+            self._idlers.discard(writer)
+            writer.close()
+
+    def _uids_in(self, message_set: str) -> list[int]:
+        uids = []
+        last = self.messages[-1][0] if self.messages else 0
+        for part in message_set.split(","):
+            if ":" in part:
+                start, end = part.split(":")
+                start = last if start == "*" else int(start)
+                end = last if end == "*" else int(end)
+                start, end = min(start, end), max(start, end)
+                uids.extend(uid for uid, _, _ in self.messages if start <= uid <= end)
+            else:
+                uid = last if part == "*" else int(part)
+                uids.extend(existing for existing, _, _ in self.messages if existing == uid)
+        return uids
+
+    def _search(self, criteria: list[str]) -> list[int]:
+        if criteria and criteria[0].upper() == "CHARSET":
+            criteria = criteria[2:]
+
+        uids = [uid for uid, _, _ in self.messages]
+        index = 0
+        while index < len(criteria):
+            criterion = criteria[index].upper()
+            if criterion == "SINCE":
+                since = datetime.strptime(criteria[index + 1], "%d-%b-%Y").date()
+                allowed = {uid for uid, date, _ in self.messages if date.date() >= since}
+                uids = [uid for uid in uids if uid in allowed]
+                index += 2
+            elif criterion == "UID":
+                allowed = set(self._uids_in(criteria[index + 1]))
+                uids = [uid for uid in uids if uid in allowed]
+                index += 2
+            elif re.fullmatch(r"[\d*:,]+", criterion):
+                allowed = set(self._uids_in(criterion))
+                uids = [uid for uid in uids if uid in allowed]
+                index += 1
+            else:
+                index += 1
+        return uids
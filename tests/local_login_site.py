@@ -0,0 +1,242 @@
+"""
+A local website with one login page per login method, for offline tests
+and benchmarks of AgentAuth.auth.
+
+Each flow lives under its own path and ends on /welcome, which shows
+"Signed in as <username>" and sets a `session` cookie:
+
+- /password: username and password
+- /totp: username and password, then a TOTP code
+- /email-code: username, then a code sent by email
+- /magic-link: username, then a sign-in link sent by email
+
+Emails are delivered to a LocalImapServer from tests/local_imap_server.py
+on the event loop it runs on. The server runs in a background thread.
+"""
+
+import asyncio
+from html import escape
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+import random
+import secrets
+import threading
+from urllib.parse import parse_qs, urlparse
+
+import pyotp
+
+from local_imap_server import make_email
+
+FLOWS = ("password", "totp", "email-code", "magic-link")
+
+PAGE = """<!DOCTYPE html>
+<html>
+<head><title>{title}</title></head>
+<body>
+<h1>{title}</h1>
+{body}
+</body>
+</html>
+"""
+
+class LocalLoginSite:
+    """
+    Args:
+        imap_server (LocalImapServer, optional): Inbox that email flows send to
+        loop (asyncio.AbstractEventLoop, optional): Event loop the IMAP server runs on
+    """
+
+    def __init__(self, imap_server=None, loop: asyncio.AbstractEventLoop = None):
+        self.imap_server = imap_server
+        self.loop = loop
+        # username -> (password, totp secret)
+        self.accounts = {}
+        self.logins = {flow: 0 for flow in FLOWS}
+        self.failures = 0
+
+        # Pending second steps: token -> (flow, username, expected code)
+        self._pending = {}
+        self._lock = threading.Lock()
+        self._server = None
+        self._thread = None
+
+    def add_account(self, username: str, password: str, totp_secret: str = None):
+        self.accounts[username] = (password, totp_secret)
+
+    def start(self) -> str:
+        """
+        Start serving in a background thread.
+
+        Returns:
+            str: Base URL of the site, e.g. "http://127.0.0.1:54321"
+        """
+        class Handler(_Handler):
+            site = self
+
+        self._server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+        self._server.daemon_threads = True
+        self._thread = threading.Thread(target=self._server.serve_forever, daemon=True)
+        self._thread.start()
+        return self.url
+
+    def stop(self):
+        self._server.shutdown()
+        self._server.server_close()
+
+    @property
+    def url(self) -> str:
+        return f"http://127.0.0.1:{self._server.server_address[1]}"
+
+    def _send_email(self, to: str, subject: str, text: str):
+        raw = make_email(subject, text, from_="no-reply@login.example.com", to=to)
+        if self.loop is not None:
+            self.loop.call_soon_threadsafe(self.imap_server.deliver, raw)
+        else:
+            self.imap_server.deliver(raw)
+
+    def _start_second_step(self, flow: str, username: str, code: str = None) -> str:
+        token = secrets.token_urlsafe(16)
+        with self._lock:
+            self._pending[token] = (flow, username, code)
+        return token
+
+    def _pending_step(self, token: str, flow: str) -> tuple:
+        with self._lock:
+            pending = self._pending.get(token)
+        return pending if pending is not None and pending[0] == flow else None
+
+    def _complete(self, flow: str, username: str):
+        # Codes and links of a finished login stop working
+        with self._lock:
+            self.logins[flow] += 1
+            self._pending = {token: pending for token, pending in self._pending.items() if pending[:2] != (flow, username)}
+
+class _Handler(BaseHTTPRequestHandler):
+    site: LocalLoginSite = None
+
+    def do_GET(self):
+        url = urlparse(self.path)
+        flow = url.path.strip("/")
+        query = parse_qs(url.query)
+
+        if flow in FLOWS:
+            password = '<input type="password" name="password" placeholder="Password">' if flow in ("password", "totp") else ""
+            self._page("Sign in", f"""
+<form method="post" action="/{flow}">
+<input type="email" name="username" placeholder="Email">
+{password}
+<button type="submit" name="submit">Sign in</button>
+</form>""")
+        elif url.path == "/verify":
+            token = query.get("token", [""])[0]
+            pending = self.site._pending_step(token, "totp") or self.site._pending_step(token, "email-code")
+            if pending is None:
+                self._page("Sign in", "<p>This sign-in attempt has expired.</p>", 400)
+                return
+            hint = "from your authenticator app" if pending[0] == "totp" else "we emailed to you"
+            self._page("Verify it's you", f"""
+<p>Enter the 6-digit code {hint}.</p>
+<form method="post" action="/verify">
+<input type="hidden" name="token" value="{escape(token)}">
+<input type="text" name="code" placeholder="Code" inputmode="numeric">
+<button type="submit" name="submit">Verify</button>
+</form>""")
+        elif url.path == "/check-email":
+            self._page("Check your email", "<p>Check your email for a sign-in link.</p>")
+        elif url.path == "/magic":
+            pending = self.site._pending_step(query.get("token", [""])[0], "magic-link")
+            if pending is None:
+                self._page("Sign in", "<p>This sign-in link has expired.</p>", 400)
+                return
+            self._signed_in("magic-link", pending[1])
+        elif url.path == "/welcome":
+            username = self._session_user()
+            if username is None:
+                self._redirect("/password")
+                return
+            self._page("Welcome", f"<p>Signed in as {escape(username)}</p>")
+        else:
+            self._page("Not found", "<p>Not found</p>", 404)
+
+    def do_POST(self):
+        url = urlparse(self.path)
+        flow = url.path.strip("/")
+        form = {key: values[0] for key, values in parse_qs(self.rfile.read(int(self.headers.get("Content-Length") or 0)).decode()).items()}
+        username = form.get("username", "")
+        account = self.site.accounts.get(username)
+
+        if flow in ("password", "totp"):
+            if account is None or form.get("password") != account[0]:
+                self.site.failures += 1
+                self._page("Sign in", "<p>Incorrect email or password.</p>")
+            elif flow == "password":
+                self._signed_in(flow, username)
+            else:
+                self._redirect(f"/verify?token={self.site._start_second_step(flow, username)}")
+        elif flow == "email-code":
+            if account is None:
+                self.site.failures += 1
+                self._page("Sign in", "<p>Unknown email.</p>")
+                return
+            code = f"{random.randint(0, 999999):06d}"
+            token = self.site._start_second_step(flow, username, code)
+            self.site._send_email(username, "Your sign-in code", f"Your sign-in code is {code}. It expires in 10 minutes.")
+            self._redirect(f"/verify?token={token}")
+        elif flow == "magic-link":
+            if account is None:
+                self.site.failures += 1
+                self._page("Sign in", "<p>Unknown email.</p>")
+                return
+            token = self.site._start_second_step(flow, username)
+            link = f"{self.site.url}/magic?token={token}"
+            self.site._send_email(username, "Sign in to Local Login", f"Click the link below to sign in:\n\n{link}\n\nThe link expires in 10 minutes.")
+            self._redirect("/check-email")
+        elif url.path == "/verify":
+            token = form.get("token", "")
+            pending = self.site._pending_step(token, "totp") or self.site._pending_step(token, "email-code")
+            if pending is None:
+                self._page("Sign in", "<p>This sign-in attempt has expired.</p>", 400)
+                return
+            flow, username, code = pending
+            if flow == "totp":
+                valid = pyotp.TOTP(self.site.accounts[username][1]).verify(form.get("code", ""), valid_window=1)
+            else:
+                valid = form.get("code") == code
+            if not valid:
+                self.site.failures += 1
+                self._redirect(f"/verify?token={token}")
+                return
+            self._signed_in(flow, username)
+        else:
+            self._page("Not found", "<p>Not found</p>", 404)
+
+    def _signed_in(self, flow: str, username: str):
+        self.site._complete(flow, username)
+        self.send_response(303)
+        self.send_header("Location", "/welcome")
+        self.send_header("Set-Cookie", f"session={username}; Path=/; HttpOnly")
+        self.send_header("Content-Length", "0")
+        self.end_headers()
+
+    def _session_user(self) -> str:
+        for part in (self.headers.get("Cookie") or "").split(";"):
+            name, _, value = part.strip().partition("=")
+            if name == "session" and value in self.site.accounts:
+                return value
+        return None
+
+    def _redirect(self, location: str):
+        self.send_response(303)
+        self.send_header("Location", location)
+        self.send_header("Content-Length", "0")
+        self.end_headers()
+
+    def _page(self, title: str, body: str, status: int = 200):
+        data = PAGE.format(title=escape(title), body=body).encode()
+        self.send_response(status)
+        self.send_header("Content-Type", "text/html; charset=utf-8")
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def log_message(self, format, *args):
+        pass
@@ -0,0 +1,163 @@
+"""
+A scripted stand-in for the LLM, for offline tests and benchmarks of
+AgentAuth.auth against the pages in tests/local_login_site.py.
+
+ScriptedLoginLLM reads the page state browser-use sends each step and
+answers with the next login action, the way a capable model would: open
+the website, fill in the username and password, look up a TOTP or email
+code and type it in, or look up an email link and open it, then finish
+once the page says "Signed in". It also answers EmailService's fallback
+questions about login codes and links.
+
+Each call sleeps for `latency` seconds and reports token usage of roughly
+one token per four characters, so LLM metrics look like a real model's.
+"""
+
+import asyncio
+import json
+import re
+import time
+from typing import Any, List, Optional
+
+from langchain_core.callbacks import AsyncCallbackManagerForLLMRun, CallbackManagerForLLMRun
+from langchain_core.language_models.chat_models import BaseChatModel
+from langchain_core.messages import AIMessage, BaseMessage
+from langchain_core.outputs import ChatGeneration, ChatResult
+from langchain_core.runnables import RunnableLambda
+
+ELEMENT = re.compile(r"^\[(\d+)\]<(\w+)([^>]*)>(.*?)</\w+>$", re.MULTILINE)
+ACTION_RESULT = re.compile(r"^Action result \d+/\d+: (.*)$", re.MULTILINE)
+
+class ScriptedLoginLLM(BaseChatModel):
+    """
+    Args:
+        latency (float, optional): Seconds each call takes
+    """
+
+    latency: float = 0.0
+    calls: int = 0
+
+    @property
+    def _llm_type(self) -> str:
+        return "scripted-login"
+
+    def _generate(
+            self,
+            messages: List[BaseMessage],
+            stop: Optional[List[str]] = None,
+            run_manager: Optional[CallbackManagerForLLMRun] = None,
+            **kwargs: Any,
+        ) -> ChatResult:
+        time.sleep(self.latency)
+        return self._respond(messages)
+
+    async def _agenerate(
+            self,
+            messages: List[BaseMessage],
+            stop: Optional[List[str]] = None,
+            run_manager: Optional[AsyncCallbackManagerForLLMRun] = None,
+            **kwargs: Any,
+        ) -> ChatResult:
+        await asyncio.sleep(self.latency)
+        return self._respond(messages)
+
+    def with_structured_output(self, schema, include_raw: bool = False, **kwargs):
+        def parse(message: AIMessage):
+            parsed = schema.model_validate_json(message.content)
+            return {"raw": message, "parsed": parsed, "parsing_error": None} if include_raw else parsed
+
+        async def ainvoke(messages):
+            return parse(await self.ainvoke(messages))
+
+        return RunnableLambda(lambda messages: parse(self.invoke(messages)), afunc=ainvoke)
+
+    def _respond(self, messages: List[BaseMessage]) -> ChatResult:
+        self.calls += 1
+        prompt = "\n".join(_text(message) for message in messages)
+        last = _text(messages[-1])
+        if "Current url:" in last:
+            content = json.dumps(next_step(last))
+        else:
+            content = answer_email_question(last)
+
+        message = AIMessage(content, usage_metadata={
+            "input_tokens": len(prompt) // 4,
+            "output_tokens": len(content) // 4,
+            "total_tokens": (len(prompt) + len(content)) // 4,
+        })
+        return ChatResult(generations=[ChatGeneration(message=message)])
+
+def next_step(state: str) -> dict:
+    """
+    Decide the agent's next step from a browser-use state message.
+
+    Args:
+        state (str): The state message, with the current URL, interactive
+            elements and results of the previous actions
+
+    Returns:
+        dict: An AgentOutput as JSON-compatible data
+    """
+    url = re.search(r"^Current url: (.*)$", state, re.MULTILINE).group(1).strip()
+    elements = {}
+    for index, tag, attributes, text in ELEMENT.findall(state):
+        name = re.search(r'name="([^"]*)"', attributes)
+        elements[(name.group(1) if name else text.strip().lower()) or tag] = int(index)
+    results = ACTION_RESULT.findall(state)
+    result = results[-1].strip() if results else ""
+
+    def step(goal: str, *actions: dict) -> dict:
+        return {
+            "current_state": {
+                "page_summary": f"Page at {url}",
+                "evaluation_previous_goal": "Success",
+                "memory": "",
+                "next_goal": goal,
+            },
+            "action": list(actions),
+        }
+
+    if "Signed in" in state:
+        return step("Finish", {"done": {"text": "Logged in"}})
+    if result.startswith("http"):
+        return step("Open the email link", {"go_to_url": {"url": result}})
+    if "code" in elements:
+        if re.fullmatch(r"\d{4,8}", result):
+            return step(
+                "Submit the code",
+                {"input_text": {"index": elements["code"], "text": result}},
+                {"click_element": {"index": elements.get("submit", elements["code"])}},
+            )
+        if "authenticator" in state:
+            return step("Look up the TOTP code", {"lookup_totp": {}})
+        return step("Look up the email code", {"lookup_email_code": {}})
+    if "Check your email" in state:
+        return step("Look up the email link", {"lookup_email_link": {}})
+    if "username" in elements:
+        actions = [{"input_text": {"index": elements["username"], "text": "<secret>x_username</secret>"}}]
+        if "password" in elements:
+            actions.append({"input_text": {"index": elements["password"], "text": "<secret>x_password</secret>"}})
+        actions.append({"click_element": {"index": elements.get("submit", elements["username"])}})
+        return step("Log in", *actions)
+    return step("Open the website", {"go_to_url": {"url": "<secret>x_website</secret>"}})
+
+def answer_email_question(question: str) -> str:
+    """
+    Answer EmailService's question about a login code or link in an email.
+
+    Args:
+        question (str): The question, with the email text
+
+    Returns:
+        str: The code or link, or "no"
+    """
+    if "login link" in question:
+        match = re.search(r"https?://\S+", question)
+    else:
+        match = re.search(r"\b\d{4,8}\b", question)
+    return match.group(0) if match else "no"
+
+def _text(message: BaseMessage) -> str:
+    if isinstance(message.content, str):
+        return message.content
+    return "\n".join(part.get("text", "") for part in message.content if isinstance(part, dict))
@@ -26,16 +26,18 @@ async def main():
 
     test_results = {}
 
-    for credential in credential_manager.credentials:
-        WEBSITE = credential.website
-        USERNAME = credential.username
-
-        cdp_url = get_browserbase_cdp_url()
-
-        try:
-            cookies = await agentauth.auth(WEBSITE, USERNAME, cdp_url=cdp_url)
-        except Exception as e:
-            print(f"Could not authenticate {WEBSITE} with {USERNAME}: {e}")
+    # Create each remote browser session right before its login starts
+    jobs = (
+        (credential.website, credential.username, get_browserbase_cdp_url())
+        for credential in credential_manager.credentials
+    )
+
+    async for result in agentauth.auth_many(jobs, concurrency=4):
+        WEBSITE = result.website
+        USERNAME = result.username
+
+        if not result.ok:
+            print(f"Could not authenticate {WEBSITE} with {USERNAME}: {result.error}")
             test_results[WEBSITE] = {
                 "username": USERNAME,
                 "status": "❌ Failed",
@@ -43,6 +45,8 @@ async def main():
             }
             continue
 
+        cookies = result.cookies
+
         async with async_playwright() as playwright:
             browser = await playwright.chromium.launch()
             context = await browser.new_context()
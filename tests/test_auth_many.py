@@ -0,0 +1,41 @@
+"""
+Tests that AgentAuth.auth_many runs jobs concurrently and reports per-job errors.
+
+- Does not require network access; auth() is replaced with a stub
+"""
+
+import asyncio
+import time
+
+from agentauth import AgentAuth
+
+class StubAgentAuth(AgentAuth):
+    async def auth(self, website: str, username: str, cdp_url: str = None, headless: bool = True) -> list:
+        await asyncio.sleep(0.1)
+        if username == "locked@example.com":
+            raise RuntimeError("Failed to authenticate")
+        return [{"name": "session", "value": username}]
+
+async def main():
+    aa = StubAgentAuth(llm=object())
+
+    jobs = [("https://www.example.com", f"user{i}@example.com") for i in range(20)]
+    jobs.append(("https://www.example.com", "locked@example.com", "wss://example.com/cdp"))
+
+    start = time.perf_counter()
+    results = [result async for result in aa.auth_many(jobs, concurrency=10)]
+    elapsed = time.perf_counter() - start
+
+    assert len(results) == 21
+    assert sorted(result.index for result in results) == list(range(21))
+
+    failed = [result for result in results if not result.ok]
+    assert len(failed) == 1
+    assert failed[0].username == "locked@example.com"
+    assert failed[0].cdp_url == "wss://example.com/cdp"
+
+    # 21 jobs of 0.1s each at concurrency 10 take 3 rounds, not 21
+    assert elapsed < 0.5, elapsed
+
+if __name__ == "__main__":
+    asyncio.run(main())
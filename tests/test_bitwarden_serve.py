@@ -0,0 +1,126 @@
+"""
+Tests that CredentialManager can load credentials from a `bw serve` endpoint,
+unlocking and syncing only when needed and parsing items as they stream in.
+
+- Uses a local stand-in for the `bw serve` Vault Management API
+"""
+
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+import json
+import threading
+
+from agentauth import CredentialManager
+from agentauth.bitwarden import BitwardenServeClient
+
+MASTER_PASSWORD = "master-password"
+
+class BitwardenServeStandIn(BaseHTTPRequestHandler):
+    status = "locked"
+    items = []
+    requests = {"unlock": 0, "sync": 0, "list": 0}
+    # Set to hold the item list after its first half until released
+    release = None
+
+    def do_GET(self):
+        if self.path == "/status":
+            self._send({"success": True, "data": {"object": "template", "template": {"status": self.status}}})
+        elif self.path == "/list/object/items":
+            self.requests["list"] += 1
+            if self.status != "unlocked":
+                self._send({"success": False, "message": "Vault is locked."}, 400)
+                return
+            self._send_items()
+        else:
+            self._send({"success": False, "message": "Not found"}, 404)
+
+    def do_POST(self):
+        body = json.loads(self.rfile.read(int(self.headers.get("Content-Length") or 0)) or b"{}")
+        if self.path == "/unlock":
+            self.requests["unlock"] += 1
+            if body.get("password") != MASTER_PASSWORD:
+                self._send({"success": False, "message": "Invalid master password."}, 400)
+                return
+            type(self).status = "unlocked"
+            self._send({"success": True, "data": {"object": "message", "title": "Your vault is now unlocked!", "raw": "session"}})
+        elif self.path == "/sync":
+            self.requests["sync"] += 1
+            self._send({"success": True, "data": {"object": "message", "title": "Syncing complete."}})
+        else:
+            self._send({"success": False, "message": "Not found"}, 404)
+
+    def _send(self, payload: dict, status: int = 200):
+        data = json.dumps(payload).encode()
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def _send_items(self):
+        data = json.dumps({"success": True, "data": {"object": "list", "data": self.items}}).encode()
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.end_headers()
+        half = len(data) // 2
+        self.wfile.write(data[:half])
+        self.wfile.flush()
+        if self.release is not None:
+            self.release.wait(5)
+        self.wfile.write(data[half:])
+
+    def log_message(self, format, *args):
+        pass
+
+def make_item(i: int) -> dict:
+    login = {
+        "username": f"user{i}@example.com",
+        "password": f"password{i}",
+        "totp": "JBSWY3DPEHPK3PXP" if i % 2 else None,
+        "uris": [{"match": None, "uri": f"https://site{i}.example.com"}, {"match": None, "uri": f"https://app{i}.example.com"}],
+    }
+    return {"object": "item", "id": f"id{i}", "type": 1, "name": f"Site {i}", "notes": "x" * 200, "login": login}
+
+def main():
+    BitwardenServeStandIn.items = [make_item(i) for i in range(2000)] + [{"object": "item", "id": "note", "type": 2, "login": None}]
+    server = ThreadingHTTPServer(("127.0.0.1", 0), BitwardenServeStandIn)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    url = f"http://127.0.0.1:{server.server_address[1]}"
+    requests = BitwardenServeStandIn.requests
+
+    # A locked vault needs the master password
+    try:
+        CredentialManager().load_bitwarden_serve(url)
+        assert False, "expected a locked vault error"
+    except RuntimeError:
+        pass
+
+    try:
+        CredentialManager().load_bitwarden_serve(url, master_password="wrong")
+        assert False, "expected a wrong password error"
+    except RuntimeError:
+        pass
+
+    credential_manager = CredentialManager()
+    credential_manager.load_bitwarden_serve(url, master_password=MASTER_PASSWORD)
+    assert len(credential_manager.credentials) == 2000 * 2
+    credential = credential_manager.get_credential("https://app7.example.com", "user7@example.com")
+    assert credential.password == "password7"
+    assert credential.has_totp
+    assert requests == {"unlock": 2, "sync": 0, "list": 1}
+
+    # Later loads reuse the unlocked session and only sync when asked
+    CredentialManager().load_bitwarden_serve(url, master_password=MASTER_PASSWORD)
+    CredentialManager().load_bitwarden_serve(url, sync=True)
+    assert requests == {"unlock": 2, "sync": 1, "list": 3}
+
+    # Items are parsed before the whole response has arrived
+    BitwardenServeStandIn.release = threading.Event()
+    items = BitwardenServeClient(url).iter_items()
+    assert next(items)["id"] == "id0"
+    BitwardenServeStandIn.release.set()
+    assert sum(1 for _ in items) == 2000
+
+    server.shutdown()
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,110 @@
+"""
+Tests BrowserPool reuse, recycling and idle expiry.
+
+- Does not launch real browsers; Browser is replaced with a stub
+"""
+
+import asyncio
+
+from agentauth import browser_pool
+from agentauth.browser_pool import BrowserPool
+
+class StubPlaywrightBrowser:
+    def __init__(self):
+        self.connected = True
+
+    def is_connected(self) -> bool:
+        return self.connected
+
+class StubBrowserContext:
+    def __init__(self, browser):
+        self.browser = browser
+        self.session = None
+        self.closed = False
+
+    async def close(self):
+        self.closed = True
+
+class StubBrowser:
+    launched = 0
+
+    def __init__(self, config):
+        self.config = config
+        self.playwright_browser = None
+
+    async def get_playwright_browser(self):
+        StubBrowser.launched += 1
+        self.playwright_browser = StubPlaywrightBrowser()
+        return self.playwright_browser
+
+    async def new_context(self):
+        return StubBrowserContext(self)
+
+    async def close(self):
+        self.playwright_browser = None
+
+async def main():
+    browser_pool.Browser = StubBrowser
+
+    pool = BrowserPool(max_idle=2, max_uses=3, idle_timeout=60)
+    await pool.warm(1)
+
+    # Reused browsers get a fresh context each time
+    contexts = []
+    for _ in range(3):
+        async with pool.context() as browser_context:
+            contexts.append(browser_context)
+    assert len({id(context.browser) for context in contexts}) == 1
+    assert all(context.closed for context in contexts)
+
+    metrics = pool.metrics()
+    assert metrics["hits"] == 3
+    assert metrics["misses"] == 0
+    assert metrics["launches"] == 1
+    assert metrics["recycled"] == 1  # max_uses reached after the third login
+    assert metrics["idle"] == 0
+
+    # Concurrent checkouts each get their own browser
+    async def login():
+        async with pool.context() as browser_context:
+            await asyncio.sleep(0.01)
+            return browser_context.browser
+    browsers = await asyncio.gather(*(login() for _ in range(3)))
+    assert len({id(browser) for browser in browsers}) == 3
+    assert pool.metrics()["idle"] == 2  # max_idle
+
+    # Disconnected browsers are replaced
+    for idle in pool._idle.values():
+        for pooled_browser in idle:
+            pooled_browser.browser.playwright_browser.connected = False
+    async with pool.context():
+        pass
+    assert pool.metrics()["unhealthy"] == 2
+
+    # Idle browsers expire
+    pool.idle_timeout = 0
+    await asyncio.sleep(0.01)
+    async with pool.context():
+        pass
+    assert pool.metrics()["expired"] == 1
+
+    await pool.close()
+    assert pool.metrics()["idle"] == 0
+
+    # Idle browsers are closed even when no more logins come
+    pool = BrowserPool(idle_timeout=0.05)
+    await pool.warm(2)
+    browsers = [pooled_browser.browser for idle in pool._idle.values() for pooled_browser in idle]
+    await asyncio.sleep(0.2)
+    assert pool.metrics()["idle"] == 0
+    assert pool.metrics()["expired"] == 2
+    assert all(browser.playwright_browser is None for browser in browsers)
+    assert pool._reaper.done()
+
+    async with pool.context():
+        pass
+    await pool.close()
+    assert pool._reaper is None
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,114 @@
+"""
+Tests that CredentialManager refreshes a credential source incrementally,
+in the background, without disturbing lookups.
+
+- Uses the fake 1Password client in tests/fake_onepassword.py
+"""
+
+import asyncio
+from types import SimpleNamespace
+
+import onepassword.client
+
+from fake_onepassword import FakeOnePasswordClient
+
+from agentauth import Credential, CredentialManager, CredentialSource, OnePasswordSource
+
+class FlakySource(CredentialSource):
+    name = "flaky"
+
+    def __init__(self):
+        self.fetches = 0
+
+    async def fetch(self, revisions: dict):
+        self.fetches += 1
+        if self.fetches == 1:
+            raise RuntimeError("Password manager is unavailable")
+        return {"item": 1}, {"item": [Credential("https://www.example.com", "user@example.com", "password")]}
+
+async def main():
+    # 3 vaults of 10 items with 3 websites each; every tenth item has no password
+    client = FakeOnePasswordClient()
+    onepassword.client.Client = SimpleNamespace(authenticate=client.authenticate())
+
+    credential_manager = CredentialManager()
+    source = OnePasswordSource("token")
+    await credential_manager.load_source(source)
+    assert len(credential_manager.credentials) == 81
+    assert client.calls["resolve_all"] == 1
+
+    # Nothing changed, so no secrets are resolved and nothing is replaced
+    before = list(credential_manager.credentials)
+    assert await credential_manager.refresh_source(source) == {"added": 0, "updated": 0, "removed": 0}
+    assert client.calls["resolve_all"] == 1
+    assert all(a is b for a, b in zip(before, credential_manager.credentials))
+
+    # Only changed items are fetched, and their old credentials are replaced
+    client.update_item("vault1", "item3", "password", "new-password")
+    client.delete_item("vault2", "item0")
+    client.add_item("vault0", "item99", ["https://new.example.com"], "new@example.com", "password99")
+    assert await credential_manager.refresh_source(source) == {"added": 1, "updated": 1, "removed": 1}
+    assert client.calls["resolve_all"] == 2
+
+    assert len(credential_manager.credentials) == 81 - 3 + 1
+    assert credential_manager.get_credential("https://site3-1.vault1.com", "user3@vault1.com").password == "new-password"
+    assert credential_manager.get_credential("https://site0-0.vault2.com", "user0@vault2.com") is None
+    assert credential_manager.get_credential("https://new.example.com", "new@example.com").password == "password99"
+    assert not any(credential.password == "password-vault1-3" for credential in credential_manager.credentials)
+
+    # Background refreshes pick up changes while lookups keep answering
+    credential_manager = CredentialManager()
+    await credential_manager.load_source(OnePasswordSource("token"), refresh_interval=0.05)
+    client.latency = 0.01
+    client.update_item("vault0", "item1", "password", "rotated")
+
+    seen = set()
+    for _ in range(100):
+        credential = credential_manager.get_credential("https://site1-0.vault0.com", "user1@vault0.com")
+        assert credential is not None
+        seen.add(credential.password)
+        await asyncio.sleep(0.005)
+    assert seen == {"password-vault0-1", "rotated"}, seen
+
+    await credential_manager.close()
+
+    # A source can only be loaded once per manager
+    try:
+        await credential_manager.load_source(source)
+        await credential_manager.load_source(source)
+        assert False, "expected ValueError"
+    except ValueError:
+        pass
+
+    # Items whose secrets fail to resolve are fetched again on the next refresh
+    for batch in (True, False):
+        client = FakeOnePasswordClient(batch=batch)
+        onepassword.client.Client = SimpleNamespace(authenticate=client.authenticate())
+        client.failing = {"op://vault0/item0/password", "op://vault1/item1/username"}
+        credential_manager = CredentialManager()
+        source = OnePasswordSource("token")
+        await credential_manager.load_source(source)
+        assert len(credential_manager.credentials) == 81 - 6
+        assert credential_manager.get_credential("https://site0-0.vault0.com", "user0@vault0.com") is None
+        assert await credential_manager.refresh_source(source) == {"added": 2, "updated": 0, "removed": 0}
+        assert credential_manager.get_credential("https://site0-0.vault0.com", "user0@vault0.com").password == "password-vault0-0"
+        assert credential_manager.get_credential("https://site1-2.vault1.com", "user1@vault1.com").password == "password-vault1-1"
+
+        # Once resolved they are not fetched again
+        calls = dict(client.calls)
+        assert await credential_manager.refresh_source(source) == {"added": 0, "updated": 0, "removed": 0}
+        assert client.calls["resolve"] + client.calls["resolve_all"] == calls["resolve"] + calls["resolve_all"]
+
+    # A source whose first refresh fails can be loaded again
+    credential_manager = CredentialManager()
+    source = FlakySource()
+    try:
+        await credential_manager.load_source(source)
+        assert False, "expected RuntimeError"
+    except RuntimeError:
+        pass
+    await credential_manager.load_source(source)
+    assert credential_manager.get_credential("https://www.example.com", "user@example.com").password == "password"
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,113 @@
+"""
+Tests that CredentialManager.save_snapshot and load_snapshot round-trip
+credentials through an encrypted, memory-mapped snapshot file.
+"""
+
+import asyncio
+import os
+import tempfile
+
+from agentauth import Credential, CredentialManager, CredentialSnapshot, LazyCredential
+
+async def main():
+    key = CredentialSnapshot.generate_key()
+
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, "credentials.snap")
+
+        credential_manager = CredentialManager()
+        credential_manager.load_credentials([
+            {"website": f"https://site{i}.example.com/login", "username": f"user{i}@example.com", "password": f"password{i}"}
+            for i in range(1000)
+        ])
+        credential_manager.load_credential({"website": "https://example.org", "username": "admin", "password": "parent", "totp_secret": "JBSWY3DPEHPK3PXP"})
+        credential_manager.load_credential({"website": "https://10.0.0.1", "username": "admin", "password": "router"})
+        credential_manager.load_credential({"website": "http://[fd00::1]:8080/", "username": "admin", "password": "ipv6"})
+        # Duplicates keep the first credential, like the in-memory index
+        credential_manager.load_credential({"website": "https://site5.example.com", "username": "user5@example.com", "password": "duplicate"})
+        # Lazy credentials have no secrets to save
+        credential_manager._add_credentials([LazyCredential("https://lazy.example.com", "lazy", None, "vault/item")])
+        assert credential_manager.save_snapshot(path, key) == 1003
+
+        # The file is only readable by the current user and holds no plaintext
+        assert os.stat(path).st_mode & 0o777 == 0o600
+        with open(path, "rb") as file:
+            content = file.read()
+        assert b"password5" not in content and b"site5.example.com" not in content
+
+        loaded = CredentialManager()
+        loaded.load_snapshot(path, key)
+        assert loaded.credentials == []
+        assert loaded.get_credential("https://site5.example.com/account", "user5@example.com").password == "password5"
+        assert loaded.get_credential("https://site999.example.com", "user999@example.com").website == "https://site999.example.com/login"
+        assert loaded.get_credential("https://site5.example.com", "user6@example.com") is None
+        assert loaded.get_credential("https://lazy.example.com", "lazy") is None
+
+        # Parent domains match subdomains, but IP addresses only match exactly
+        credential = loaded.get_credential("https://app.eu.example.org", "admin")
+        assert credential.password == "parent" and credential.has_totp
+        assert loaded.get_credential("https://10.0.0.1/admin", "admin").password == "router"
+        assert loaded.get_credential("https://10.0.0.1:8443", "admin") is None
+        assert loaded.get_credential("http://[FD00::1]:8080/login", "admin").password == "ipv6"
+        assert loaded.get_credential("http://[fd00::1]", "admin") is None
+        assert loaded.get_credential("https://0.0.1", "admin") is None
+        assert (await loaded.aget_credential("https://example.org", "admin")).password == "parent"
+
+        # Credentials loaded in memory take precedence over the snapshot
+        loaded.load_credential({"website": "https://site1.example.com", "username": "user1@example.com", "password": "fresh"})
+        assert loaded.get_credential("https://site1.example.com", "user1@example.com").password == "fresh"
+
+        # An exact match in the snapshot wins over a parent domain match in memory
+        loaded.load_credential({"website": "https://example.com", "username": "user2@example.com", "password": "parent"})
+        assert loaded.get_credential("https://site2.example.com", "user2@example.com").password == "password2"
+        assert loaded.get_credential("https://other.example.com", "user2@example.com").password == "parent"
+
+        # IPv6 hosts match in memory as well as in the snapshot
+        loaded.load_credential({"website": "http://[::1]/", "username": "admin", "password": "loopback"})
+        assert loaded.get_credential("http://[::1]/", "admin").password == "loopback"
+        assert loaded.get_credential("http://[fd00::1]:8080", "admin").password == "ipv6"
+
+        # Saving again includes the snapshot credentials
+        resaved = os.path.join(directory, "resaved.snap")
+        assert loaded.save_snapshot(resaved, key) == 1005
+        await loaded.close()
+
+        # A wrong key, a file that is not a snapshot and a tampered record are rejected
+        for bad_key in (CredentialSnapshot.generate_key(), "short"):
+            try:
+                CredentialSnapshot(path, bad_key)
+                assert False, "expected ValueError"
+            except ValueError:
+                pass
+
+        not_snapshot = os.path.join(directory, "credentials.json")
+        with open(not_snapshot, "w") as file:
+            file.write("[]")
+        try:
+            CredentialManager().load_snapshot(not_snapshot, key)
+            assert False, "expected ValueError"
+        except ValueError:
+            pass
+
+        tampered = bytearray(content)
+        tampered[-5] ^= 1
+        with open(path, "wb") as file:
+            file.write(tampered)
+        snapshot = CredentialSnapshot(path, key)
+        assert snapshot.get("https://site0.example.com", "user0@example.com").password == "password0"
+        try:
+            list(snapshot)
+            assert False, "expected ValueError"
+        except ValueError:
+            pass
+        snapshot.close()
+
+        # An empty snapshot loads and finds nothing
+        CredentialSnapshot.write(path, [Credential(None, "nobody", "password")], key)
+        snapshot = CredentialSnapshot(path, key)
+        assert len(snapshot) == 0
+        assert snapshot.get("https://example.com", "nobody") is None
+        snapshot.close()
+
+if __name__ == "__main__":
+    asyncio.run(main())
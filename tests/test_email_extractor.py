@@ -0,0 +1,85 @@
+"""
+Measures the rule-based email extractor against a corpus of login emails.
+
+Reports the hit rate and latency of the extractor, and checks that it is
+never confidently wrong. If OPENAI_API_KEY is set, the same corpus is also
+sent through the LLM-only path for comparison.
+"""
+
+import asyncio
+import json
+import os
+import time
+
+from dotenv import load_dotenv
+from local_imap_server import make_email
+from imap_tools import MailMessage
+
+from agentauth.email_extractor import extract_code, extract_link
+from agentauth.email_service import CODE_QUERY, LINK_QUERY
+
+load_dotenv(override=True)
+
+THRESHOLD = 0.8
+
+def load_corpus() -> list:
+    with open(os.path.join(os.path.dirname(__file__), "email_corpus.json")) as file:
+        corpus = json.load(file)
+
+    for sample in corpus:
+        raw = make_email(sample["subject"], sample["text"], html=sample.get("html"), from_=sample["from"])
+        msg = MailMessage.from_bytes(raw)
+        # Emulate HTML-only emails
+        if not sample["text"]:
+            msg.__dict__["text"] = ""
+        sample["msg"] = msg
+    return corpus
+
+def run_extractor(sample: dict) -> tuple:
+    if sample["kind"] == "code":
+        return extract_code(sample["msg"])
+    return extract_link(sample["msg"], sample["website"])
+
+async def run_llm(corpus: list):
+    from langchain_openai import ChatOpenAI
+
+    llm = ChatOpenAI(model="gpt-4o", temperature=0.0)
+    hits = 0
+    start = time.perf_counter()
+    for sample in corpus:
+        query = CODE_QUERY if sample["kind"] == "code" else LINK_QUERY
+        text = sample["msg"].text or sample["msg"].html
+        response = (await llm.ainvoke(query.format(text=text))).content.strip()
+        answer = None if response.lower() == "no" else response
+        hits += answer == sample["expected"]
+    elapsed = time.perf_counter() - start
+    print(f"LLM only:  {hits}/{len(corpus)} correct, {elapsed / len(corpus) * 1000:.1f} ms/email")
+
+def main():
+    corpus = load_corpus()
+
+    confident_hits = 0
+    wrong = []
+    start = time.perf_counter()
+    for sample in corpus:
+        value, confidence = run_extractor(sample)
+        if confidence < THRESHOLD:
+            # Falls back to the LLM, which is fine for ambiguous emails
+            continue
+        if value == sample["expected"]:
+            confident_hits += 1
+        else:
+            wrong.append((sample["subject"], value, sample["expected"]))
+    elapsed = time.perf_counter() - start
+
+    answerable = sum(1 for sample in corpus if sample["expected"] is not None)
+    print(f"Extractor: {confident_hits}/{answerable} answered without the LLM, {elapsed / len(corpus) * 1000:.3f} ms/email")
+
+    assert not wrong, wrong
+    assert confident_hits / answerable >= 0.9
+
+    if os.getenv("OPENAI_API_KEY"):
+        asyncio.run(run_llm(corpus))
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,92 @@
+"""
+Tests that EmailService waits for email without blocking the event loop,
+over a single IMAP connection that fetches each new message once.
+
+- Uses the local IMAP server in tests/local_imap_server.py and a stub LLM
+"""
+
+import asyncio
+from datetime import datetime, timedelta, timezone
+import re
+import time
+
+from local_imap_server import LocalImapServer, make_email
+
+from agentauth.email_service import EmailService
+
+class StubResponse:
+    def __init__(self, content: str):
+        self.content = content
+
+class StubLLM:
+    async def ainvoke(self, query: str) -> StubResponse:
+        if "login code" in query:
+            match = re.search(r"\b(\d{6})\b", query)
+            return StubResponse(match.group(1) if match else "no")
+        match = re.search(r"https://\S+", query)
+        return StubResponse(match.group(0) if match else "no")
+
+async def main():
+    server = LocalImapServer()
+    port = await server.start()
+
+    two_days_ago = datetime.now(timezone.utc) - timedelta(days=2)
+    for _ in range(200):
+        server.deliver(make_email("Old code", "Your code is 111111", date=two_days_ago), date=two_days_ago)
+
+    email_service = EmailService(
+        "localhost",
+        port,
+        server.username,
+        server.password,
+        StubLLM(),
+        timeout=5,
+        ssl_context=server.client_ssl_context(),
+    )
+
+    # Emails from before the login started are ignored
+    email_service.timeout = 0.3
+    assert await email_service.get_code(datetime.now(timezone.utc)) is None
+    email_service.timeout = 5
+
+    # Old mail is filtered on the server and never fetched
+    assert server.fetched_messages == 0
+
+    login_start_time = datetime.now(timezone.utc)
+
+    async def deliver_later():
+        await asyncio.sleep(0.3)
+        server.deliver(make_email("Your code", "Your code is 654321"))
+        server.deliver(make_email("Sign in", "Click https://www.example.com/magic?token=abc to sign in"))
+
+    # Measure how late a ticking task runs while the lookups wait
+    max_lag = 0.0
+    async def heartbeat():
+        nonlocal max_lag
+        while True:
+            start = time.perf_counter()
+            await asyncio.sleep(0.01)
+            max_lag = max(max_lag, time.perf_counter() - start - 0.01)
+
+    ticker = asyncio.create_task(heartbeat())
+    delivery = asyncio.create_task(deliver_later())
+
+    results = await asyncio.gather(
+        email_service.get_code(login_start_time),
+        email_service.get_link(login_start_time, "https://www.example.com"),
+    )
+    ticker.cancel()
+    await delivery
+
+    assert results == ["654321", "https://www.example.com/magic?token=abc"]
+    assert max_lag < 0.25, max_lag
+
+    # One connection serves every lookup, and each new message is fetched once
+    assert server.logins == 1
+    assert server.fetched_messages == 2
+
+    await email_service.close()
+    await server.stop()
+
+if __name__ == "__main__":
+    asyncio.run(main())
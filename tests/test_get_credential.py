@@ -0,0 +1,76 @@
+from agentauth import CredentialManager
+
+def main():
+    credential_manager = CredentialManager()
+    credential_manager.load_credentials([
+        {
+            "website": "https://www.example.com/login",
+            "username": "user@example.com",
+            "password": "www_password"
+        },
+        {
+            "website": "https://example.com",
+            "username": "user@example.com",
+            "password": "root_password"
+        },
+        {
+            "website": "https://example.com",
+            "username": "user@example.com",
+            "password": "duplicate_password"
+        },
+        {
+            "website": "http://127.0.0.1:8000",
+            "username": "admin",
+            "password": "local_password"
+        }
+    ])
+
+    # Exact host match, regardless of scheme, default port, case and path
+    credential = credential_manager.get_credential("http://WWW.Example.com/account", "user@example.com")
+    assert credential.password == "www_password"
+    credential = credential_manager.get_credential("https://WWW.Example.com:443/account", "user@example.com")
+    assert credential.password == "www_password"
+    for website in ("www.example.com", "WWW.example.com./login", "https://admin@www.example.com/", "https://www.example.com?next=/"):
+        assert credential_manager.get_credential(website, "user@example.com").password == "www_password", website
+
+    # Other ports are other sites, and fall back to parent domains on the same port
+    assert credential_manager.get_credential("https://www.example.com:8443", "user@example.com") is None
+    credential_manager.load_credential({"website": "https://example.com:8443", "username": "user@example.com", "password": "port_password"})
+    assert credential_manager.get_credential("https://www.example.com:8443", "user@example.com").password == "port_password"
+    assert credential_manager.get_credential("https://www.example.com:9443", "user@example.com") is None
+
+    # First loaded credential wins for duplicate host and username
+    credential = credential_manager.get_credential("https://example.com", "user@example.com")
+    assert credential.password == "root_password"
+
+    # Subdomains fall back to the closest parent domain
+    credential = credential_manager.get_credential("https://app.eu.example.com", "user@example.com")
+    assert credential.password == "root_password"
+
+    # Parent domains never match a subdomain credential
+    credential_manager = CredentialManager()
+    credential_manager.load_credential({
+        "website": "https://app.example.com",
+        "username": "user@example.com",
+        "password": "app_password"
+    })
+    assert credential_manager.get_credential("https://example.com", "user@example.com") is None
+    assert credential_manager.get_credential("https://notexample.com", "user@example.com") is None
+    assert credential_manager.get_credential("https://app.example.com", "other@example.com") is None
+
+    # IP addresses only match exactly
+    credential_manager = CredentialManager()
+    credential_manager.load_credential({
+        "website": "http://127.0.0.1:8000",
+        "username": "admin",
+        "password": "local_password"
+    })
+    assert credential_manager.get_credential("http://127.0.0.1:8000/login", "admin").password == "local_password"
+    assert credential_manager.get_credential("http://127.0.0.1", "admin") is None
+    assert credential_manager.get_credential("http://0.0.1:8000", "admin") is None
+    credential_manager.load_credential({"website": "http://[::1]:8000", "username": "admin", "password": "ipv6_password"})
+    assert credential_manager.get_credential("http://[::1]:8000", "admin").password == "ipv6_password"
+    assert credential_manager.get_credential("http://[::1]:9000", "admin") is None
+
+if __name__ == "__main__":
+    main()
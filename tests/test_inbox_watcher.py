@@ -0,0 +1,89 @@
+"""
+Tests that InboxWatcher fetches each message once and routes it to the
+right one of many concurrent logins, with and without IMAP IDLE.
+
+- Uses the local IMAP server in tests/local_imap_server.py
+"""
+
+import asyncio
+from contextvars import ContextVar
+from datetime import datetime, timedelta, timezone
+
+from local_imap_server import LocalImapServer, make_email
+
+from agentauth.email_extractor import extract_code
+from agentauth.imap_connection import ImapConnection
+from agentauth.inbox_watcher import InboxWatcher
+
+login_id: ContextVar[str] = ContextVar("login_id", default=None)
+read_by = {}
+
+async def read_code(msg) -> str:
+    code, _ = extract_code(msg)
+    read_by.setdefault(login_id.get(), set()).add(code)
+    return code
+
+async def wait_as(watcher: InboxWatcher, name: str, *args, **kwargs):
+    login_id.set(name)
+    return await watcher.wait_for(*args, **kwargs)
+
+async def check_routing(idle: bool):
+    server = LocalImapServer(idle=idle)
+    port = await server.start()
+    connection = ImapConnection("localhost", port, server.username, server.password, server.client_ssl_context())
+    watcher = InboxWatcher(connection, poll_interval=0.05)
+
+    start = datetime.now(timezone.utc) - timedelta(seconds=1)
+
+    # Sent before the logins started
+    server.deliver(make_email("Your code", "Your code is 999999", date=start - timedelta(minutes=1)))
+
+    # 20 logins told apart by recipient, 20 by website only
+    waits = {}
+    read_by.clear()
+    for i in range(20):
+        waits[f"recipient-{i}"] = wait_as(watcher, f"recipient-{i}", start, read_code, f"https://site{i}.com", f"agent+{i}@example.com", timeout=5)
+        waits[f"website-{i}"] = wait_as(watcher, f"website-{i}", start, read_code, f"https://www.other{i}.com", timeout=5)
+    tasks = {key: asyncio.create_task(wait) for key, wait in waits.items()}
+
+    await asyncio.sleep(0.2)
+    assert watcher.waiting == 40
+
+    # Deliver in reverse order, so arrival order alone would pick the wrong login
+    for i in reversed(range(20)):
+        server.deliver(make_email("Your code", f"Your code is {100000 + i}", from_=f"no-reply@site{i}.com", to=f"agent+{i}@example.com"))
+        server.deliver(make_email("Your code", f"Your code is {200000 + i}", from_=f"no-reply@mail.other{i}.com"))
+
+    results = {key: await task for key, task in tasks.items()}
+    for i in range(20):
+        assert results[f"recipient-{i}"] == str(100000 + i), results
+        assert results[f"website-{i}"] == str(200000 + i), results
+
+    # Each login's messages are read in that login's context, not in the
+    # context of the login that started the watcher
+    for key, code in results.items():
+        assert code in read_by[key], (key, read_by)
+    assert None not in read_by
+
+    # A login that starts waiting after its email arrived still gets it
+    server.deliver(make_email("Your code", "Your code is 314159", from_="no-reply@late.com"))
+    await asyncio.sleep(0.3)
+    assert await watcher.wait_for(start, read_code, "https://late.com", timeout=5) == "314159"
+
+    # A claimed message is not given to another login
+    assert await watcher.wait_for(start, read_code, "https://late.com", timeout=0.3) is None
+
+    # One connection, and every new message fetched exactly once
+    assert server.logins == 1
+    assert server.fetched_messages == 42, server.fetched_messages
+
+    await watcher.close()
+    await connection.close()
+    await server.stop()
+
+async def main():
+    await check_routing(idle=True)
+    await check_routing(idle=False)
+
+if __name__ == "__main__":
+    asyncio.run(main())
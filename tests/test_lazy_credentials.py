@@ -0,0 +1,79 @@
+"""
+Tests that lazily loaded 1Password credentials resolve their secrets on
+first use and keep them in a bounded TTL cache.
+
+- Uses the fake 1Password client in tests/fake_onepassword.py
+"""
+
+import asyncio
+from types import SimpleNamespace
+
+import onepassword.client
+
+from fake_onepassword import FakeOnePasswordClient
+
+from agentauth import CredentialManager, LazyCredential, OnePasswordSource
+from agentauth.login_session import LoginSession
+
+async def main():
+    # 3 vaults of 10 items with 3 websites each; every tenth item has no password
+    client = FakeOnePasswordClient(batch=False)
+    onepassword.client.Client = SimpleNamespace(authenticate=client.authenticate())
+
+    # Only usernames are kept at startup, and no secrets are held. Items
+    # without a password are skipped like in the eager mode.
+    credential_manager = CredentialManager()
+    await credential_manager.load_1password("token", lazy=True)
+    assert client.calls["resolve"] == 60
+    assert len(credential_manager.credentials) == 27 * 3
+    assert all(isinstance(credential, LazyCredential) for credential in credential_manager.credentials)
+    assert not any(credential.password or credential.totp_secret for credential in credential_manager.credentials)
+
+    # The sync lookup returns metadata only, the async lookup resolves secrets
+    lazy = credential_manager.get_credential("https://site3-0.vault1.com", "user3@vault1.com")
+    assert lazy.password is None
+
+    # Concurrent lookups of one item share a single resolve of password and TOTP
+    credentials = await asyncio.gather(*(
+        credential_manager.aget_credential(f"https://site3-{w}.vault1.com", "user3@vault1.com") for w in range(3)
+    ))
+    assert all(credential.password == "password-vault1-3" and credential.has_totp for credential in credentials)
+    assert client.calls["resolve"] == 62
+
+    # Later lookups are served from the cache
+    await credential_manager.aget_credential("https://site3-0.vault1.com", "user3@vault1.com")
+    assert client.calls["resolve"] == 62
+
+    # Items without a password are not loaded
+    assert credential_manager.get_credential("https://site9-0.vault1.com", "user9@vault1.com") is None
+
+    # An item whose username fails to resolve is fetched again on refresh
+    client.failing = {"op://vault0/item1/username"}
+    source = OnePasswordSource("token", lazy=True)
+    credential_manager = CredentialManager()
+    await credential_manager.load_source(source)
+    assert credential_manager.get_credential("https://site1-0.vault0.com", "user1@vault0.com") is None
+    await credential_manager.refresh_source(source)
+    assert (await credential_manager.aget_credential("https://site1-0.vault0.com", "user1@vault0.com")).password == "password-vault0-1"
+
+    # Cached secrets expire and the cache is bounded
+    source = OnePasswordSource("token", lazy=True, secret_ttl=0.1, max_cached_secrets=2)
+    credential_manager = CredentialManager()
+    await credential_manager.load_source(source)
+    for i in range(3):
+        await credential_manager.aget_credential(f"https://site{i}-0.vault0.com", f"user{i}@vault0.com")
+    assert len(source._secrets) == 2
+
+    calls = client.calls["resolve"]
+    await asyncio.sleep(0.15)
+    await credential_manager.aget_credential("https://site2-0.vault0.com", "user2@vault0.com")
+    assert client.calls["resolve"] == calls + 2
+
+    # A login session resolves its credential before building the task
+    session = LoginSession("https://site4-0.vault2.com", "user4@vault2.com", "agent", credential_manager)
+    await session.resolve_credential()
+    _, sensitive_data = session.build_auth_task()
+    assert sensitive_data["x_password"] == "password-vault2-4"
+
+if __name__ == "__main__":
+    asyncio.run(main())
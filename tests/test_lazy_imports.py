@@ -0,0 +1,39 @@
+"""
+Tests that importing agentauth for credentials only does not load browser_use,
+LangChain, the 1Password SDK or the IMAP libraries, and that public names
+still resolve on first access.
+"""
+
+import subprocess
+import sys
+
+HEAVY_MODULES = ("browser_use", "langchain_core", "langchain_openai", "onepassword", "imap_tools", "aioimaplib")
+
+def loaded_modules(statement: str) -> set:
+    output = subprocess.run(
+        [sys.executable, "-c", f"{statement}\nimport sys\nprint(' '.join(sys.modules))"],
+        capture_output=True,
+        text=True,
+        check=True,
+    ).stdout
+    return {name.split(".")[0] for name in output.split()}
+
+def main():
+    modules = loaded_modules("from agentauth import Credential, CredentialManager, OnePasswordSource, BitwardenServeSource")
+    assert not modules & set(HEAVY_MODULES), modules & set(HEAVY_MODULES)
+
+    modules = loaded_modules("from agentauth import AgentAuth")
+    assert "browser_use" in modules
+
+    import agentauth
+    assert set(agentauth.__all__) <= set(dir(agentauth))
+    for name in agentauth.__all__:
+        assert getattr(agentauth, name).__name__ == name
+    try:
+        agentauth.Missing
+        assert False, "expected AttributeError"
+    except AttributeError:
+        pass
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,48 @@
+"""
+Tests that CredentialManager.load_1password resolves each item's secrets once,
+in batches when the SDK supports it, with bounded concurrency.
+
+- Uses the fake 1Password client in tests/fake_onepassword.py
+"""
+
+import asyncio
+from types import SimpleNamespace
+
+import onepassword.client
+
+from fake_onepassword import FakeOnePasswordClient
+
+from agentauth import CredentialManager
+
+async def load(client: FakeOnePasswordClient, **kwargs) -> CredentialManager:
+    onepassword.client.Client = SimpleNamespace(authenticate=client.authenticate())
+    credential_manager = CredentialManager()
+    await credential_manager.load_1password("token", **kwargs)
+    return credential_manager
+
+async def main():
+    # 3 vaults of 10 items with 3 websites each; every tenth item has no password
+    client = FakeOnePasswordClient(latency=0.001)
+    credential_manager = await load(client, concurrency=4, batch_size=20)
+
+    assert len(credential_manager.credentials) == 3 * 9 * 3
+    assert client.calls["resolve_all"] == 5
+    assert client.calls["resolve"] == 0
+    assert client.max_in_flight <= 4
+
+    credential = credential_manager.get_credential("https://site3-2.vault1.com", "user3@vault1.com")
+    assert credential.password == "password-vault1-3"
+    assert credential.has_totp
+    assert not credential_manager.get_credential("https://site4-0.vault1.com", "user4@vault1.com").has_totp
+    assert credential_manager.get_credential("https://site9-0.vault1.com", "user9@vault1.com") is None
+
+    # Without resolve_all, each secret is resolved once per item, not once per website
+    client = FakeOnePasswordClient(latency=0.001, batch=False)
+    credential_manager = await load(client, concurrency=4)
+
+    assert len(credential_manager.credentials) == 3 * 9 * 3
+    assert client.calls["resolve"] == 3 * 10 * 3
+    assert client.max_in_flight <= 4
+
+if __name__ == "__main__":
+    asyncio.run(main())
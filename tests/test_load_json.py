@@ -0,0 +1,66 @@
+"""
+Tests that CredentialManager.load_json streams JSON arrays and JSON Lines files.
+"""
+
+import json
+import os
+import tempfile
+
+from agentauth import CredentialManager
+
+def credentials(count: int) -> list:
+    return [
+        {
+            "website": f"https://site{i}.example.com",
+            "username": f"user{i}@example.com",
+            "password": f"password{i}",
+            "totp_secret": "JBSWY3DPEHPK3PXP" if i % 2 else None,
+        }
+        for i in range(count)
+    ]
+
+def main():
+    with tempfile.TemporaryDirectory() as directory:
+        # A JSON array, added in several batches
+        array_path = os.path.join(directory, "credentials.json")
+        with open(array_path, "w") as file:
+            json.dump(credentials(2500), file, indent=2)
+
+        credential_manager = CredentialManager()
+        credential_manager.load_json(array_path, batch_size=1000, progress_every=1000)
+        assert len(credential_manager.credentials) == 2500
+        credential = credential_manager.get_credential("https://site1777.example.com", "user1777@example.com")
+        assert credential.password == "password1777"
+        assert credential.has_totp
+
+        # JSON Lines, with blank lines ignored
+        lines_path = os.path.join(directory, "credentials.jsonl")
+        with open(lines_path, "w") as file:
+            for entry in credentials(10):
+                file.write(json.dumps(entry) + "\n\n")
+
+        credential_manager = CredentialManager()
+        credential_manager.load_json(lines_path)
+        assert len(credential_manager.credentials) == 10
+        assert credential_manager.get_credential("https://site9.example.com", "user9@example.com").password == "password9"
+
+        # Empty files and arrays load nothing
+        empty_path = os.path.join(directory, "empty.json")
+        for content in ("", " []\n"):
+            with open(empty_path, "w") as file:
+                file.write(content)
+            credential_manager = CredentialManager()
+            credential_manager.load_json(empty_path)
+            assert credential_manager.credentials == []
+
+        # Invalid JSON is reported
+        with open(empty_path, "w") as file:
+            file.write('{"website": "https://example.com"}\n{"website": ')
+        try:
+            CredentialManager().load_json(empty_path)
+            assert False, "expected ValueError"
+        except ValueError:
+            pass
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,67 @@
+"""
+Tests that concurrent logins on one AgentAuth instance keep separate state.
+
+- Does not require network access or an LLM
+"""
+
+import warnings
+
+from agentauth import AgentAuth, CredentialManager
+
+def main():
+    credential_manager = CredentialManager()
+    credential_manager.load_credentials([
+        {
+            "website": "https://www.example.com",
+            "username": "user1@example.com",
+            "password": "user1_password",
+            "totp_secret": "JBSWY3DPEHPK3PXP"
+        },
+        {
+            "website": "https://www.fakewebsite.com",
+            "username": "user2@example.com",
+            "password": "user2_password"
+        }
+    ])
+
+    aa = AgentAuth(credential_manager=credential_manager, llm=object(), agent_id="test-agent")
+
+    session1 = aa._new_session("https://www.example.com", "user1@example.com")
+    session2 = aa._new_session("https://www.fakewebsite.com", "user2@example.com")
+
+    task1, sensitive_data1 = session1.build_auth_task()
+    task2, sensitive_data2 = session2.build_auth_task()
+
+    assert sensitive_data1["x_password"] == "user1_password"
+    assert sensitive_data2["x_password"] == "user2_password"
+    assert "TOTP" in task1
+    assert "TOTP" not in task2
+
+    # Each session registers actions on its own controller
+    assert "lookup_totp" in session1.controller.registry.registry.actions
+    assert "lookup_totp" not in session2.controller.registry.registry.actions
+
+    assert session1.agent_id == session2.agent_id == "test-agent"
+    assert session1.login_id != session2.login_id
+    assert session2.login_start_time >= session1.login_start_time
+
+    # The old AgentAuth helpers still work, with a deprecation warning
+    with warnings.catch_warnings(record=True) as caught:
+        warnings.simplefilter("always")
+        try:
+            aa.lookup_password()
+            assert False, "expected LookupError"
+        except LookupError:
+            pass
+        task, sensitive_data = aa.build_auth_task("https://www.example.com", "user1@example.com")
+        assert task == task1 and sensitive_data == sensitive_data1
+        assert "lookup_totp" in aa.controller.registry.registry.actions
+        assert aa.lookup_password() == "user1_password"
+        assert len(aa.lookup_totp()) == 6
+    deprecations = [warning for warning in caught if warning.category is DeprecationWarning and "AgentAuth." in str(warning.message)]
+    assert len(deprecations) == 4
+    assert all(warning.filename == __file__ for warning in deprecations)
+    assert "LoginSession.build_auth_task" in str(deprecations[1].message)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,114 @@
+"""
+Tests the login timing spans, LLM usage counting and Prometheus exporter.
+
+- Does not require network access, a browser or an LLM
+"""
+
+import asyncio
+from contextlib import asynccontextmanager
+import time
+
+from langchain_core.language_models.fake_chat_models import GenericFakeChatModel
+from langchain_core.messages import AIMessage
+
+from agentauth import AgentAuth, CredentialManager, MetricsHook, PrometheusExporter, SessionCache, Span
+from agentauth.llm_usage import track_llm_usage
+from agentauth.metrics import SpanRecorder
+
+class CollectingHook(MetricsHook):
+    def __init__(self):
+        self.spans = []
+
+    def on_span(self, span: Span):
+        self.spans.append(span)
+
+class FailingHook(MetricsHook):
+    def on_span(self, span: Span):
+        raise RuntimeError("metrics backend is down")
+
+class NoBrowserAgentAuth(AgentAuth):
+    @asynccontextmanager
+    async def _browser_context(self, cdp_url: str, headless: bool):
+        await asyncio.sleep(0.01)
+        raise RuntimeError("Browser failed to launch")
+        yield
+
+async def main():
+    hook = CollectingHook()
+    exporter = PrometheusExporter(buckets=(0.001, 1))
+
+    credential_manager = CredentialManager()
+    credential_manager.load_credential({
+        "website": "https://www.example.com",
+        "username": "user@example.com",
+        "password": "password",
+        "totp_secret": "JBSWY3DPEHPK3PXP",
+    })
+
+    # Lookup actions are timed, and failing hooks do not break the login
+    aa = AgentAuth(credential_manager=credential_manager, llm=object(), metrics_hooks=[hook, exporter, FailingHook()])
+    session = aa._new_session("https://www.example.com", "user@example.com")
+    session.build_auth_task()
+    session.lookup_totp()
+    assert [span.name for span in hook.spans] == ["lookup_password", "lookup_totp"]
+    assert all(span.ok and span.site == "www.example.com" and span.login_id == session.login_id for span in hook.spans)
+
+    # A cached login records the cache lookup and the whole call
+    cookies = [{"name": "session", "value": "abc", "domain": ".example.com", "path": "/", "expires": time.time() + 600}]
+    aa.session_cache = SessionCache()
+    aa.session_cache.set("https://www.example.com", "user@example.com", cookies)
+    hook.spans = []
+    assert await aa.auth("https://www.example.com", "user@example.com") == cookies
+    assert [span.name for span in hook.spans] == ["cache_lookup", "auth"]
+    assert hook.spans[0].attributes["hit"] is True
+    assert hook.spans[1].attributes["cached"] is True
+    assert hook.spans[1].attributes["llm_calls"] == 0
+
+    # A failed phase is recorded as an error in its span and the whole call
+    aa = NoBrowserAgentAuth(credential_manager=credential_manager, llm=object(), metrics_hooks=[hook, exporter])
+    hook.spans = []
+    try:
+        await aa.auth("https://app.example.org", "user@example.com")
+        assert False, "expected RuntimeError"
+    except RuntimeError:
+        pass
+    assert [span.name for span in hook.spans] == ["credential_lookup", "browser_launch", "auth"]
+    assert [span.error for span in hook.spans] == [None, "RuntimeError", "RuntimeError"]
+    assert hook.spans[1].duration >= 0.01
+    assert hook.spans[2].duration >= hook.spans[1].duration
+
+    # LLM calls are counted per login, with tokens, including calls made in other tasks
+    llm = GenericFakeChatModel(messages=iter([
+        AIMessage("first", usage_metadata={"input_tokens": 100, "output_tokens": 20, "total_tokens": 120}),
+        AIMessage("second", usage_metadata={"input_tokens": 150, "output_tokens": 30, "total_tokens": 180}),
+        AIMessage("outside"),
+    ]))
+    recorder = SpanRecorder("https://app.example.org", "login-1", [hook])
+    hook.spans = []
+    with track_llm_usage(recorder) as usage:
+        await llm.ainvoke("hello")
+        await asyncio.create_task(llm.ainvoke("again"))
+    await llm.ainvoke("not counted")
+    assert (usage.calls, usage.input_tokens, usage.output_tokens) == (2, 250, 50)
+    assert [span.name for span in hook.spans] == ["llm_call", "llm_call"]
+    assert hook.spans[1].attributes == {"input_tokens": 150, "output_tokens": 30}
+    assert usage.as_attributes()["llm_calls"] == 2
+
+    exporter.on_span(Span("auth", "https://app.example.org", "login-1", usage.as_attributes()))
+
+    # The exporter renders cumulative histograms per phase, site and outcome
+    metrics = exporter.render()
+    lines = metrics.splitlines()
+    assert metrics.endswith("\n")
+    assert "# TYPE agentauth_phase_duration_seconds histogram" in lines
+    assert 'agentauth_phase_duration_seconds_count{phase="lookup_totp",site="www.example.com",outcome="success"} 1' in lines
+    assert 'agentauth_phase_duration_seconds_bucket{phase="browser_launch",site="app.example.org",outcome="error",le="0.001"} 0' in lines
+    assert 'agentauth_phase_duration_seconds_bucket{phase="browser_launch",site="app.example.org",outcome="error",le="1"} 1' in lines
+    assert 'agentauth_phase_duration_seconds_bucket{phase="browser_launch",site="app.example.org",outcome="error",le="+Inf"} 1' in lines
+    assert 'agentauth_phase_duration_seconds_count{phase="auth",site="app.example.org",outcome="success"} 1' in lines
+    assert 'agentauth_llm_calls_total{site="app.example.org"} 2' in lines
+    assert 'agentauth_llm_tokens_total{site="app.example.org",type="input"} 250' in lines
+    assert 'agentauth_llm_tokens_total{site="www.example.com",type="output"} 0' in lines
+
+if __name__ == "__main__":
+    asyncio.run(main())
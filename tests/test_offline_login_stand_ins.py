@@ -0,0 +1,151 @@
+"""
+Tests the offline stand-ins used by benchmarks/auth_throughput.py: the local
+login site, the scripted LLM and their use of the local IMAP server.
+
+- Drives the login pages over HTTP, so no browser is needed
+"""
+
+import asyncio
+from datetime import datetime, timezone
+from http.cookiejar import CookieJar
+from urllib.error import HTTPError
+from urllib.parse import urlencode
+from urllib.request import HTTPCookieProcessor, build_opener
+
+from browser_use.agent.views import AgentOutput
+from langchain_core.messages import HumanMessage
+
+from local_imap_server import LocalImapServer
+from local_login_site import LocalLoginSite
+from scripted_llm import ScriptedLoginLLM, next_step
+
+from agentauth import Credential
+from agentauth.email_service import EmailService
+from agentauth.llm_usage import track_llm_usage
+from agentauth.login_session import LoginSession
+
+TOTP_SECRET = "JBSWY3DPEHPK3PXP"
+
+def state(url: str, elements: str, result: str = None) -> str:
+    text = f"""
+[Task history memory ends here]
+[Current state starts here]
+Current url: {url}
+Available tabs:
+[TabInfo(page_id=0, url='{url}', title='Sign in')]
+Interactive elements from current page:
+[Start of page]
+{elements}
+[End of page]
+"""
+    if result:
+        text += f"\nAction result 1/1: {result}"
+    return text
+
+class Browser:
+    """
+    Follows redirects and keeps cookies, like a browser tab.
+    """
+
+    def __init__(self):
+        self.cookies = CookieJar()
+        self._opener = build_opener(HTTPCookieProcessor(self.cookies))
+
+    def get(self, url: str) -> tuple:
+        with self._opener.open(url) as response:
+            return response.url, response.read().decode()
+
+    def post(self, url: str, form: dict) -> tuple:
+        with self._opener.open(url, data=urlencode(form).encode()) as response:
+            return response.url, response.read().decode()
+
+async def main():
+    imap_server = LocalImapServer()
+    await imap_server.start()
+    site = LocalLoginSite(imap_server, asyncio.get_running_loop())
+    site.add_account("user@example.com", "password", TOTP_SECRET)
+    base = site.start()
+
+    email_service = EmailService("localhost", imap_server.port, imap_server.username, imap_server.password,
+                                 ScriptedLoginLLM(), timeout=5, ssl_context=imap_server.client_ssl_context())
+    credential = Credential(base, "user@example.com", "password", TOTP_SECRET)
+
+    # Password and TOTP flows
+    browser = Browser()
+    url, page = await asyncio.to_thread(browser.post, f"{base}/password", {"username": "user@example.com", "password": "password"})
+    assert url == f"{base}/welcome" and "Signed in as user@example.com" in page
+
+    browser = Browser()
+    url, page = await asyncio.to_thread(browser.post, f"{base}/totp", {"username": "user@example.com", "password": "wrong"})
+    assert "Incorrect" in page and site.failures == 1
+    url, page = await asyncio.to_thread(browser.post, f"{base}/totp", {"username": "user@example.com", "password": "password"})
+    assert "authenticator app" in page
+    token = url.split("token=")[1]
+    url, page = await asyncio.to_thread(browser.post, f"{base}/verify", {"token": token, "code": credential.totp()})
+    assert "Signed in" in page
+
+    # Email flows deliver to the local inbox, where EmailService finds them
+    login_start_time = datetime.now(timezone.utc)
+    browser = Browser()
+    url, page = await asyncio.to_thread(browser.post, f"{base}/email-code", {"username": "user@example.com"})
+    assert "we emailed to you" in page
+    code = await email_service.get_code(login_start_time, f"{base}/email-code", "user@example.com")
+    url, page = await asyncio.to_thread(browser.post, f"{base}/verify", {"token": url.split("token=")[1], "code": code})
+    assert "Signed in" in page
+
+    login_start_time = datetime.now(timezone.utc)
+    browser = Browser()
+    url, page = await asyncio.to_thread(browser.post, f"{base}/magic-link", {"username": "user@example.com"})
+    assert "Check your email" in page
+    link = await email_service.get_link(login_start_time, f"{base}/magic-link", "user@example.com")
+    assert link.startswith(f"{base}/magic?token=")
+    url, page = await asyncio.to_thread(browser.get, link)
+    assert "Signed in" in page
+    # Links work once
+    try:
+        await asyncio.to_thread(Browser().get, link)
+        assert False, "expected HTTPError"
+    except HTTPError as e:
+        assert e.code == 400
+    assert site.logins == {"password": 1, "totp": 1, "email-code": 1, "magic-link": 1}
+
+    # The scripted LLM walks through each page like a capable model
+    step = next_step(state("about:blank", ""))
+    assert step["action"] == [{"go_to_url": {"url": "<secret>x_website</secret>"}}]
+
+    login_form = '[0]<input type="email" name="username" placeholder="Email"></input>\n[1]<input type="password" name="password" placeholder="Password"></input>\n[2]<button type="submit" name="submit">Sign in</button>'
+    step = next_step(state("<secret>x_website</secret>", login_form))
+    assert step["action"] == [
+        {"input_text": {"index": 0, "text": "<secret>x_username</secret>"}},
+        {"input_text": {"index": 1, "text": "<secret>x_password</secret>"}},
+        {"click_element": {"index": 2}},
+    ]
+
+    verify_form = '[]Enter the 6-digit code from your authenticator app.\n[3]<input type="text" name="code" placeholder="Code"></input>\n[4]<button type="submit" name="submit">Verify</button>'
+    assert next_step(state(f"{base}/verify", verify_form))["action"] == [{"lookup_totp": {}}]
+    assert next_step(state(f"{base}/verify", verify_form.replace("from your authenticator app", "we emailed to you")))["action"] == [{"lookup_email_code": {}}]
+    assert next_step(state(f"{base}/verify", verify_form, "123456"))["action"] == [
+        {"input_text": {"index": 3, "text": "123456"}},
+        {"click_element": {"index": 4}},
+    ]
+    assert next_step(state(f"{base}/check-email", "[]Check your email for a sign-in link."))["action"] == [{"lookup_email_link": {}}]
+    assert next_step(state(f"{base}/check-email", "[]Check your email for a sign-in link.", link))["action"] == [{"go_to_url": {"url": link}}]
+    assert next_step(state(f"{base}/welcome", "[]Signed in as <secret>x_username</secret>"))["action"] == [{"done": {"text": "Logged in"}}]
+
+    # Answers parse into browser-use's action model, including lookup actions, and report token usage
+    session = LoginSession(f"{base}/totp", "user@example.com", "agent", email_service=email_service)
+    session._credential = credential
+    session.build_auth_task()
+    output_model = AgentOutput.type_with_custom_actions(session.controller.registry.create_action_model())
+    llm = ScriptedLoginLLM()
+    with track_llm_usage() as usage:
+        response = await llm.with_structured_output(output_model, include_raw=True).ainvoke([HumanMessage(state(f"{base}/verify", verify_form))])
+    assert response["parsed"].action[0].model_dump(exclude_unset=True) == {"lookup_totp": {}}
+    assert usage.calls == 1 and usage.input_tokens > 0 and usage.output_tokens > 0
+
+    await email_service.close()
+    site.stop()
+    await imap_server.stop()
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,217 @@
+"""
+Tests recording login playbooks from agent history, replaying them and
+storing them per site.
+
+- Does not launch real browsers; the Playwright page is replaced with a stub
+"""
+
+import asyncio
+import os
+import tempfile
+
+from browser_use.agent.views import ActionResult, AgentHistory, AgentHistoryList, AgentOutput
+from browser_use.browser.views import BrowserStateHistory
+from browser_use.dom.history_tree_processor.view import DOMHistoryElement
+import pyotp
+
+from agentauth import AgentAuth, CredentialManager, MetricsHook, Playbook, PlaybookStore
+
+SITE = "https://login.example.com"
+TOTP_SECRET = "JBSWY3DPEHPK3PXP"
+
+def element(name: str, tag: str = "input") -> DOMHistoryElement:
+    return DOMHistoryElement(tag, f"html/body/form/{tag}[@name='{name}']", 1, [], {"name": name}, css_selector=f'{tag}[name="{name}"]')
+
+class StubLocator:
+    def __init__(self, page, selector: str):
+        self.page = page
+        self.selector = selector
+
+    @property
+    def first(self):
+        return self
+
+    def or_(self, other):
+        return self
+
+    async def fill(self, text: str, timeout: float = None):
+        if self.selector not in self.page.elements:
+            raise TimeoutError(f"{self.selector} not found")
+        self.page.filled[self.page.elements[self.selector]] = text
+
+    async def click(self, timeout: float = None):
+        if self.selector not in self.page.elements:
+            raise TimeoutError(f"{self.selector} not found")
+        self.page.url = self.page.next_urls.pop(0)
+
+    async def is_visible(self) -> bool:
+        return self.selector in self.page.visible
+
+class StubPage:
+    def __init__(self, elements: dict, next_urls: list):
+        self.url = "about:blank"
+        self.elements = elements
+        self.next_urls = next_urls
+        self.filled = {}
+        self.visible = set()
+
+    async def goto(self, url: str, timeout: float = None):
+        self.url = url
+
+    def locator(self, selector: str) -> StubLocator:
+        return StubLocator(self, selector)
+
+    async def wait_for_url(self, predicate, timeout: float = None):
+        if not predicate(self.url):
+            raise TimeoutError(f"still on {self.url}")
+
+class StubBrowserContext:
+    def __init__(self, page: StubPage):
+        self.page = page
+
+    async def get_current_page(self) -> StubPage:
+        return self.page
+
+class SpanNames(MetricsHook):
+    def __init__(self):
+        self.names = []
+
+    def on_span(self, span):
+        self.names.append((span.name, span.ok))
+
+def totp_history(session) -> AgentHistoryList:
+    ActionModel = session.controller.registry.create_action_model()
+    Output = AgentOutput.type_with_custom_actions(ActionModel)
+
+    def item(url: str, actions: list, results: list, elements: list) -> AgentHistory:
+        output = Output(
+            current_state={"page_summary": "", "evaluation_previous_goal": "", "memory": "", "next_goal": ""},
+            action=[ActionModel(**action) for action in actions],
+        )
+        return AgentHistory(
+            model_output=output,
+            result=results,
+            state=BrowserStateHistory(url=url, title="", tabs=[], interacted_element=elements),
+        )
+
+    return AgentHistoryList(history=[
+        item("about:blank", [{"go_to_url": {"url": f"{SITE}/login"}}], [ActionResult()], [None]),
+        item(
+            f"{SITE}/totp",
+            [
+                {"click_element": {"index": 9}},
+                {"scroll_down": {}},
+                {"input_text": {"index": 1, "text": "<secret>x_username</secret>"}},
+                {"input_text": {"index": 2, "text": "user1_password"}},
+                {"click_element": {"index": 3}},
+            ],
+            [ActionResult(error="Element not found"), ActionResult(), ActionResult(), ActionResult(), ActionResult()],
+            [element("remember"), None, element("username"), element("password"), element("submit", "button")],
+        ),
+        item(f"{SITE}/verify?token=abc", [{"lookup_totp": {}}], [ActionResult(extracted_content="123456")], [None]),
+        item(
+            f"{SITE}/verify?token=abc",
+            [{"input_text": {"index": 1, "text": "123456"}}, {"click_element": {"index": 2}}],
+            [ActionResult(), ActionResult()],
+            [element("code"), element("submit", "button")],
+        ),
+        item(f"{SITE}/welcome", [{"done": {"text": "Logged in"}}], [ActionResult(is_done=True, extracted_content="Logged in")], [None]),
+    ])
+
+async def main():
+    credential_manager = CredentialManager()
+    credential_manager.load_credentials([
+        {"website": SITE, "username": "user1@example.com", "password": "user1_password", "totp_secret": TOTP_SECRET},
+        {"website": SITE, "username": "user2@example.com", "password": "user2_password", "totp_secret": TOTP_SECRET},
+    ])
+    spans = SpanNames()
+    aa = AgentAuth(credential_manager=credential_manager, llm=object(), metrics_hooks=[spans])
+
+    # Recording keeps successful actions, drops page-reading ones and
+    # replaces secrets and lookup results
+    session = aa._new_session(SITE, "user1@example.com")
+    _, sensitive_data = session.build_auth_task()
+    playbook = Playbook.from_history(SITE, totp_history(session), sensitive_data)
+    assert playbook.site == "login.example.com"
+    assert playbook.final_url == f"{SITE}/welcome"
+    assert [step.to_dict() for step in playbook.steps] == [
+        {"action": "go_to_url", "text": f"{SITE}/login"},
+        {"action": "input_text", "selector": 'input[name="username"]', "xpath": "html/body/form/input[@name='username']", "text": "<secret>x_username</secret>"},
+        {"action": "input_text", "selector": 'input[name="password"]', "xpath": "html/body/form/input[@name='password']", "text": "<secret>x_password</secret>"},
+        {"action": "click_element", "selector": 'button[name="submit"]', "xpath": "html/body/form/button[@name='submit']"},
+        {"action": "lookup_totp"},
+        {"action": "input_text", "selector": 'input[name="code"]', "xpath": "html/body/form/input[@name='code']", "from_lookup": True},
+        {"action": "click_element", "selector": 'button[name="submit"]', "xpath": "html/body/form/button[@name='submit']"},
+    ]
+    assert "user1_password" not in str(playbook.to_dict())
+
+    # Only whole typed values become placeholders, so a short username
+    # does not break URLs that contain it
+    recorded = Playbook.from_history(SITE, totp_history(session), {**sensitive_data, "x_username": "login"})
+    assert recorded.steps[0].text == f"{SITE}/login"
+
+    # Unfinished runs are not recorded
+    unfinished = totp_history(session)
+    unfinished.history.pop()
+    assert Playbook.from_history(SITE, unfinished, sensitive_data) is None
+
+    # Replaying for another user fills in that user's secrets and a fresh TOTP code
+    page = StubPage(
+        {'input[name="username"]': "username", 'input[name="password"]': "password", 'input[name="code"]': "code", 'button[name="submit"]': "submit"},
+        [f"{SITE}/verify?token=def", f"{SITE}/welcome"],
+    )
+    session = aa._new_session(SITE, "user2@example.com")
+    _, sensitive_data = session.build_auth_task()
+    await playbook.replay(StubBrowserContext(page), session, sensitive_data)
+    assert page.url == f"{SITE}/welcome"
+    assert page.filled["username"] == "user2@example.com"
+    assert page.filled["password"] == "user2_password"
+    assert pyotp.TOTP(TOTP_SECRET).verify(page.filled["code"], valid_window=1)
+
+    # Reaching the final URL with the login form still shown fails the replay
+    page = StubPage(
+        {'input[name="username"]': "username", 'input[name="password"]': "password", 'input[name="code"]': "code", 'button[name="submit"]': "submit"},
+        [f"{SITE}/verify?token=def", f"{SITE}/welcome"],
+    )
+    page.visible.add('input[name="password"]')
+    try:
+        await playbook.replay(StubBrowserContext(page), session, sensitive_data, step_timeout=0.3)
+        assert False, "expected RuntimeError"
+    except RuntimeError as e:
+        assert "login form is still shown" in str(e)
+
+    # A missing element fails the replay
+    page = StubPage({'input[name="username"]': "username"}, [])
+    try:
+        await playbook.replay(StubBrowserContext(page), session, sensitive_data)
+        assert False, "expected RuntimeError"
+    except RuntimeError as e:
+        assert "step 3 (input_text)" in str(e)
+
+    # Playbooks persist per site and are dropped after repeated failures
+    with tempfile.TemporaryDirectory() as path:
+        store = PlaybookStore(path=path, max_failures=2)
+        store.set(playbook)
+        loaded = PlaybookStore(path=path).get(f"{SITE}/other-page")
+        assert loaded.to_dict() == playbook.to_dict()
+        assert PlaybookStore(path=path).get("https://www.example.com") is None
+
+        store.record_failure(playbook)
+        store.record_success(playbook)
+        store.record_failure(playbook)
+        assert store.get(SITE) is playbook
+        store.record_failure(playbook)
+        assert store.get(SITE) is None
+        assert os.listdir(path) == []
+
+    # AgentAuth reports whether the replay worked so it can fall back to the agent
+    playbook = Playbook.from_dict(playbook.to_dict())
+    aa.playbook_store = PlaybookStore()
+    aa.playbook_store.set(playbook)
+    page = StubPage({}, [])
+    assert not await aa._replay(session, playbook, StubBrowserContext(page), sensitive_data)
+    assert playbook.failures == 1
+    assert ("playbook_replay", False) in spans.names
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,175 @@
+"""
+Tests the AuthServer HTTP API over TCP and a Unix socket: single and batch
+logins, session status, expired sessions, tokens, Host and Content-Type
+checks, keep-alive connections and malformed requests.
+
+- Does not launch browsers; the browser login is replaced with a stub
+"""
+
+import asyncio
+import json
+import os
+import tempfile
+import urllib.error
+import urllib.request
+
+from agentauth import AgentAuth, AuthServer, SessionCache, SessionRefresher
+
+class StubAgentAuth(AgentAuth):
+    logins = []
+
+    async def _browser_auth(self, session, cdp_url, headless, llm_usage, auth_span) -> list:
+        StubAgentAuth.logins.append(session.username)
+        await asyncio.sleep(0.1)
+        if session.username == "locked@example.com":
+            raise RuntimeError("Failed to authenticate")
+        return [{"name": "session", "value": f"{session.username}:{len(StubAgentAuth.logins)}", "expires": -1}]
+
+class Client:
+    def __init__(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter, token: str = None, host: str = "localhost"):
+        self.reader = reader
+        self.writer = writer
+        self.token = token
+        self.host = host
+
+    async def request(self, method: str, path: str, body=None, raw: bytes = None, content_type: str = "application/json"):
+        data = raw if raw is not None else (json.dumps(body).encode() if body is not None else b"")
+        head = f"{method} {path} HTTP/1.1\r\nHost: {self.host}\r\nContent-Length: {len(data)}\r\n"
+        if method == "POST":
+            head += f"Content-Type: {content_type}\r\n"
+        if self.token:
+            head += f"Authorization: Bearer {self.token}\r\n"
+        self.writer.write(head.encode() + b"\r\n" + data)
+        await self.writer.drain()
+
+        status = int((await self.reader.readline()).split()[1])
+        headers = {}
+        while (line := await self.reader.readline()) != b"\r\n":
+            name, _, value = line.decode().partition(":")
+            headers[name.lower()] = value.strip()
+        payload = json.loads(await self.reader.readexactly(int(headers["content-length"])))
+        return status, payload, headers
+
+    def close(self):
+        self.writer.close()
+
+async def over_tcp():
+    aa = StubAgentAuth(llm=object(), session_cache=SessionCache())
+    try:
+        AuthServer(aa, port=0)
+        assert False, "Expected ValueError"
+    except ValueError:
+        pass
+
+    async with AuthServer(aa, port=0, token="secret") as server:
+        host, port = server.address.rsplit(":", 1)
+        client = Client(*await asyncio.open_connection(host, int(port)), token="secret", host=server.address)
+
+        status, payload, headers = await client.request("GET", "/health")
+        assert (status, payload, headers["connection"]) == (200, {"status": "ok"}, "keep-alive")
+
+        # Concurrent requests for one account share a login, and later
+        # requests are served from the session cache
+        others = [Client(*await asyncio.open_connection(host, int(port)), token="secret", host=f"localhost:{port}") for _ in range(3)]
+        responses = await asyncio.gather(*[
+            other.request("POST", "/auth", {"website": "https://www.example.com", "username": "user@example.com"})
+            for other in others
+        ])
+        assert all(status == 200 and payload["cookies"][0]["value"] == "user@example.com:1" for status, payload, _ in responses)
+        status, payload, _ = await client.request("POST", "/auth", {"website": "https://www.example.com", "username": "user@example.com"})
+        assert payload["cookies"][0]["value"] == "user@example.com:1"
+        assert StubAgentAuth.logins == ["user@example.com"]
+
+        status, payload, _ = await client.request("GET", "/sessions?website=https://www.example.com&username=user@example.com")
+        assert (status, payload["cached"], payload["refresh"]) == (200, True, None)
+
+        # Failed logins, in a batch and alone
+        status, payload, _ = await client.request("POST", "/auth/batch", {"jobs": [
+            {"website": "https://www.example.com", "username": "locked@example.com"},
+            {"website": "https://www.example.com", "username": "other@example.com"},
+        ], "concurrency": 2})
+        assert status == 200
+        assert [result["ok"] for result in payload["results"]] == [False, True]
+        assert payload["results"][0]["error"] == "RuntimeError: Failed to authenticate"
+        assert payload["results"][1]["username"] == "other@example.com"
+        status, payload, _ = await client.request("POST", "/auth", {"website": "https://www.example.com", "username": "locked@example.com"})
+        assert (status, payload) == (502, {"error": "RuntimeError: Failed to authenticate"})
+
+        # Reporting cookies as expired makes the next request log in again
+        status, _, _ = await client.request("POST", "/sessions/expired", {"website": "https://www.example.com", "username": "user@example.com"})
+        assert status == 200
+        status, payload, _ = await client.request("POST", "/auth", {"website": "https://www.example.com", "username": "user@example.com"})
+        assert payload["cookies"][0]["value"] != "user@example.com:1"
+
+        # Bad requests keep the connection usable
+        assert (await client.request("POST", "/auth", raw=b"{not json"))[0] == 400
+        assert (await client.request("POST", "/auth", {"website": "https://www.example.com"}))[0] == 400
+        assert (await client.request("POST", "/auth/batch", {"jobs": ["x"]}))[0] == 400
+        assert (await client.request("GET", "/auth"))[0] == 405
+        assert (await client.request("GET", "/nope"))[0] == 404
+        client.token = None
+        assert (await client.request("GET", "/health"))[0] == 401
+        client.token = "secret"
+        assert (await client.request("GET", "/health"))[0] == 200
+
+        # Requests a web page could send are refused
+        client.host = f"attacker.example:{port}"
+        assert (await client.request("GET", "/health"))[0] == 403
+        client.host = server.address
+        body = {"website": "https://www.example.com", "username": "user@example.com"}
+        assert (await client.request("POST", "/auth", body, content_type="text/plain"))[0] == 415
+        assert (await client.request("POST", "/auth", body, content_type="application/json; charset=utf-8"))[0] == 200
+
+        # A standard client works too
+        request = urllib.request.Request(
+            f"http://{host}:{port}/auth",
+            data=json.dumps({"website": "https://www.example.com", "username": "other@example.com"}).encode(),
+            headers={"Authorization": "Bearer secret", "Content-Type": "application/json"},
+        )
+        response = await asyncio.to_thread(urllib.request.urlopen, request)
+        assert json.loads(response.read())["cookies"][0]["value"].startswith("other@example.com")
+        try:
+            await asyncio.to_thread(urllib.request.urlopen, f"http://{host}:{port}/health")
+            assert False, "Expected 401"
+        except urllib.error.HTTPError as e:
+            assert e.code == 401
+
+        client.close()
+        for other in others:
+            other.close()
+
+async def over_unix_socket():
+    StubAgentAuth.logins.clear()
+    aa = StubAgentAuth(llm=object())
+    with tempfile.TemporaryDirectory() as path:
+        socket_path = os.path.join(path, "agentauth.sock")
+        async with SessionRefresher(aa) as refresher:
+            async with AuthServer(aa, unix_socket=socket_path, refresher=refresher) as server:
+                assert server.address == socket_path
+                assert oct(os.stat(socket_path).st_mode & 0o777) == "0o600"
+                client = Client(*await asyncio.open_unix_connection(socket_path))
+
+                # Refreshed sessions are answered from the refresher
+                body = {"website": "https://www.example.com", "username": "user@example.com", "refresh": True}
+                first = (await client.request("POST", "/auth", body))[1]["cookies"]
+                second = (await client.request("POST", "/auth", body))[1]["cookies"]
+                assert first == second
+                assert StubAgentAuth.logins == ["user@example.com"]
+
+                status, payload, _ = await client.request("GET", "/sessions")
+                assert [(session["website"], session["username"]) for session in payload["sessions"]] == [("https://www.example.com", "user@example.com")]
+                status, payload, _ = await client.request("GET", "/sessions?website=https://www.example.com&username=user@example.com")
+                assert payload["cached"] is False and payload["refresh"]["username"] == "user@example.com"
+
+                # After an expiry report, requests do not get the old cookies
+                await client.request("POST", "/sessions/expired", {"website": "https://www.example.com", "username": "user@example.com"})
+                third = (await client.request("POST", "/auth", body))[1]["cookies"]
+                assert third != first
+                assert (await client.request("POST", "/auth", body))[1]["cookies"] == third
+                client.close()
+
+        assert not os.path.exists(socket_path)
+
+if __name__ == "__main__":
+    asyncio.run(over_tcp())
+    asyncio.run(over_unix_socket())
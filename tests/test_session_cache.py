@@ -0,0 +1,45 @@
+import tempfile
+import time
+
+from agentauth.session_cache import SessionCache
+
+def main():
+    now = time.time()
+    cookies = [
+        {"name": "session", "value": "abc", "domain": ".example.com", "path": "/", "expires": -1},
+        {"name": "auth", "value": "def", "domain": ".example.com", "path": "/", "expires": now + 600},
+    ]
+
+    cache = SessionCache(max_entries=2, expiry_margin=60)
+    assert cache.get("https://www.example.com", "user@example.com") is None
+
+    cache.set("https://www.example.com/login", "user@example.com", cookies)
+    assert cache.get("https://WWW.example.com", "user@example.com") == cookies
+    assert cache.get("https://www.example.com", "other@example.com") is None
+
+    # Entries expire at the earliest cookie expiry, minus the margin
+    cache.set("https://expiring.example.com", "user@example.com", [
+        {"name": "auth", "value": "x", "domain": "expiring.example.com", "path": "/", "expires": now + 30},
+    ])
+    assert cache.get("https://expiring.example.com", "user@example.com") is None
+
+    # Least recently used entries are evicted
+    cache.set("https://a.example.com", "user@example.com", cookies)
+    cache.get("https://www.example.com", "user@example.com")
+    cache.set("https://b.example.com", "user@example.com", cookies)
+    assert cache.get("https://a.example.com", "user@example.com") is None
+    assert cache.get("https://www.example.com", "user@example.com") == cookies
+
+    cache.invalidate("https://www.example.com", "user@example.com")
+    assert cache.get("https://www.example.com", "user@example.com") is None
+
+    # The encrypted on-disk tier survives a new cache instance
+    with tempfile.TemporaryDirectory() as path:
+        key = SessionCache.generate_key()
+        SessionCache(path=path, encryption_key=key).set("https://www.example.com", "user@example.com", cookies)
+
+        assert SessionCache(path=path, encryption_key=key).get("https://www.example.com", "user@example.com") == cookies
+        assert SessionCache(path=path, encryption_key=SessionCache.generate_key()).get("https://www.example.com", "user@example.com") is None
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,101 @@
+"""
+Tests SessionProbe over HTTP and AgentAuth.ensure_session skipping or
+running a login depending on the probe.
+
+- Runs a local HTTP server; auth() is replaced with a stub
+"""
+
+import asyncio
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+import threading
+import time
+
+from agentauth import AgentAuth, SessionCache, SessionProbe
+from agentauth.session_probe import cookie_header_for
+
+class AccountHandler(BaseHTTPRequestHandler):
+    requests = []
+
+    def do_GET(self):
+        cookie = self.headers.get("Cookie") or ""
+        AccountHandler.requests.append((self.path, cookie))
+        if "session=valid" not in cookie:
+            self.send_response(302)
+            self.send_header("Location", "/login")
+            self.send_header("Content-Length", "0")
+            self.end_headers()
+            return
+
+        body = b"<p>Signed in as alice</p>" if self.path == "/account" else b"<p>Welcome</p>"
+        self.send_response(200)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+class StubAgentAuth(AgentAuth):
+    logins = 0
+
+    async def auth(self, website: str, username: str, cdp_url: str = None, headless: bool = True) -> list:
+        StubAgentAuth.logins += 1
+        return [{"name": "session", "value": "valid", "domain": "127.0.0.1", "path": "/"}]
+
+def cookie(name: str, value: str, domain: str = "127.0.0.1", path: str = "/", **kwargs) -> dict:
+    return {"name": name, "value": value, "domain": domain, "path": path, "expires": -1, "secure": False, **kwargs}
+
+async def main():
+    server = ThreadingHTTPServer(("127.0.0.1", 0), AccountHandler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    url = f"http://127.0.0.1:{server.server_address[1]}"
+
+    # Only cookies a browser would send reach the site
+    cookies = [
+        cookie("session", "valid"),
+        cookie("other", "x", domain="www.example.com"),
+        cookie("expired", "x", expires=time.time() - 10),
+        cookie("scoped", "x", path="/admin"),
+        cookie("secure", "x", secure=True),
+    ]
+    assert cookie_header_for(cookies, f"{url}/account") == "session=valid"
+    assert cookie_header_for([cookie("a", "1", domain=".example.com")], "https://www.example.com/") == "a=1"
+    assert cookie_header_for([cookie("a", "1", domain="example.com")], "https://notexample.com/") == ""
+
+    probe = SessionProbe(f"{url}/account", text="Signed in as")
+    assert await probe.check(cookies)
+    assert not await probe.check([cookie("session", "expired")])
+    assert not await SessionProbe(f"{url}/home", text="Signed in as").check(cookies)
+
+    # The redirect to the login page is not followed
+    AccountHandler.requests.clear()
+    assert not await SessionProbe(f"{url}/account").check([])
+    assert AccountHandler.requests == [("/account", "")]
+
+    # Browser probes need a browser context
+    try:
+        await SessionProbe(f"{url}/account", selector="#account").check(cookies)
+        assert False, "expected ValueError"
+    except ValueError:
+        pass
+
+    # Valid cookies are returned as is, without a login
+    session_cache = SessionCache()
+    aa = StubAgentAuth(llm=object(), session_cache=session_cache)
+    assert await aa.ensure_session(url, "alice", cookies, probe) is cookies
+    assert StubAgentAuth.logins == 0
+
+    # Expired cookies, missing cookies and unreachable sites lead to a login,
+    # and a stale cached session is dropped first
+    session_cache.set(url, "alice", [cookie("session", "expired")])
+    cookies = await aa.ensure_session(url, "alice", [cookie("session", "expired")], probe)
+    assert cookies[0]["value"] == "valid"
+    assert session_cache.get(url, "alice") is None
+    await aa.ensure_session(url, "alice", [], probe)
+    server.shutdown()
+    server.server_close()
+    await aa.ensure_session(url, "alice", cookies, SessionProbe(f"{url}/account", timeout=1))
+    assert StubAgentAuth.logins == 3
+
+if __name__ == "__main__":
+    asyncio.run(main())
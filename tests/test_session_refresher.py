@@ -0,0 +1,131 @@
+"""
+Tests that SessionRefresher logs in again ahead of cookie expiry, caps
+concurrent refreshes, retries failures and publishes new cookies.
+
+- Does not require network access; auth() is replaced with a stub
+"""
+
+import asyncio
+import time
+
+from agentauth import AgentAuth, SessionCache, SessionRefresher
+
+WEBSITE = "https://www.example.com"
+
+class StubAgentAuth(AgentAuth):
+    lifetime = 1.0
+    in_flight = 0
+    max_in_flight = 0
+    fail_next = 0
+    logins = []
+
+    async def auth(self, website: str, username: str, cdp_url: str = None, headless: bool = True) -> list:
+        StubAgentAuth.in_flight += 1
+        StubAgentAuth.max_in_flight = max(StubAgentAuth.max_in_flight, StubAgentAuth.in_flight)
+        try:
+            await asyncio.sleep(0.05)
+            if StubAgentAuth.fail_next:
+                StubAgentAuth.fail_next -= 1
+                raise RuntimeError("Failed to authenticate")
+            StubAgentAuth.logins.append((username, time.time()))
+            expires = time.time() + StubAgentAuth.lifetime if StubAgentAuth.lifetime else -1
+            return [{"name": "session", "value": f"{username}-{len(StubAgentAuth.logins)}", "expires": expires}]
+        finally:
+            StubAgentAuth.in_flight -= 1
+
+async def main():
+    session_cache = SessionCache()
+    aa = StubAgentAuth(llm=object(), session_cache=session_cache)
+
+    async with SessionRefresher(aa, concurrency=2, refresh_ahead=0.4, jitter=0, retry_interval=0.1) as refresher:
+        published = []
+        unsubscribe = refresher.subscribe(lambda website, username, cookies: published.append((username, cookies[0]["value"])))
+
+        # Sessions without cookies are logged into right away, two at a time
+        for i in range(4):
+            refresher.track(WEBSITE, f"user{i}@example.com")
+        assert refresher.get(WEBSITE, "user0@example.com") is None
+        cookies = await refresher.wait(WEBSITE, "user3@example.com")
+        assert cookies[0]["value"].startswith("user3@example.com")
+        assert StubAgentAuth.max_in_flight == 2
+        assert len(published) == 4
+
+        # Cookies are refreshed ahead of their expiry, not after it
+        cookies = refresher.get(WEBSITE, "user0@example.com")
+        expires = cookies[0]["expires"]
+        await asyncio.sleep(0.8)
+        refreshed = refresher.get(WEBSITE, "user0@example.com")
+        assert refreshed is not cookies
+        refreshed_at = [at for username, at in StubAgentAuth.logins if username == "user0@example.com"][1]
+        assert expires - 0.5 < refreshed_at < expires, (expires, refreshed_at)
+        unsubscribe()
+        count = len(published)
+
+        # Cached cookies are replaced rather than returned again
+        session_cache.set(WEBSITE, "user0@example.com", cookies)
+        await asyncio.sleep(0.6)
+        assert session_cache.get(WEBSITE, "user0@example.com") is None
+        assert len(published) == count
+        for i in range(4):
+            refresher.untrack(WEBSITE, f"user{i}@example.com")
+
+    # Failed refreshes are retried and keep the old cookies
+    StubAgentAuth.lifetime = 0
+    async with SessionRefresher(aa, refresh_ahead=0.2, jitter=0, default_lifetime=60, retry_interval=0.1) as refresher:
+        results = []
+
+        async def on_refresh(website, username, cookies):
+            results.append(cookies)
+
+        refresher.subscribe(on_refresh, username="alice")
+        old_cookies = [{"name": "session", "value": "old", "expires": -1}]
+        refresher.track(WEBSITE, "alice", old_cookies)
+        assert refresher.status()[0]["refresh_at"] > time.time() + 59
+
+        # Early expiry triggers a refresh and shortens later sessions of the site
+        StubAgentAuth.fail_next = 2
+        await asyncio.sleep(0.5)
+        refresher.report_expired(WEBSITE, "alice")
+        await asyncio.sleep(0.1)
+        assert refresher.get(WEBSITE, "alice") is old_cookies
+        assert refresher.status()[0]["failures"] == 1
+        await asyncio.sleep(0.4)
+        assert refresher.status()[0]["failures"] == 0
+        assert results and refresher.get(WEBSITE, "alice") is results[-1]
+        status = refresher.status()[0]
+        assert status["expires_at"] - time.time() < 0.6, status
+
+        try:
+            await refresher.wait(WEBSITE, "bob")
+            assert False, "expected LookupError"
+        except LookupError:
+            pass
+
+        # Sessions are matched by hostname, not by the exact URL
+        assert refresher.get(f"{WEBSITE}/account", "alice") is refresher.get(WEBSITE, "alice")
+        assert len(refresher.status()) == 1
+
+        # Waiting for a first login that fails raises instead of hanging,
+        # and the login is retried in the background
+        StubAgentAuth.lifetime = 60
+        StubAgentAuth.fail_next = 1
+        refresher.track(WEBSITE, "carol")
+        try:
+            await refresher.wait(f"{WEBSITE}/login", "carol", timeout=1)
+            assert False, "expected RuntimeError"
+        except RuntimeError as e:
+            assert "Failed to authenticate" in str(e)
+        await asyncio.sleep(0.3)
+        assert (await refresher.wait(WEBSITE, "carol", timeout=1))[0]["value"].startswith("carol")
+
+        # A timeout bounds the wait
+        StubAgentAuth.fail_next = 0
+        refresher.track("https://slow.example.com", "dave")
+        try:
+            await refresher.wait("https://slow.example.com", "dave", timeout=0.01)
+            assert False, "expected TimeoutError"
+        except asyncio.TimeoutError:
+            pass
+
+if __name__ == "__main__":
+    asyncio.run(main())
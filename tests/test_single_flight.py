@@ -0,0 +1,109 @@
+"""
+Tests that concurrent AgentAuth.auth calls for the same site and username
+share one login, within a process and across processes with a lock directory.
+
+- Does not launch browsers; the browser login is replaced with a stub
+"""
+
+import asyncio
+import multiprocessing
+import os
+import tempfile
+
+from agentauth import AgentAuth, SessionCache
+
+class StubAgentAuth(AgentAuth):
+    delay = 0.2
+    log_path = None
+    logins = []
+    finished = []
+
+    async def _browser_auth(self, session, cdp_url, headless, llm_usage, auth_span) -> list:
+        StubAgentAuth.logins.append(session.username)
+        if StubAgentAuth.log_path:
+            with open(StubAgentAuth.log_path, "a") as file:
+                file.write(f"{os.getpid()}\n")
+        await asyncio.sleep(StubAgentAuth.delay)
+        StubAgentAuth.finished.append(session.username)
+        if session.username == "locked@example.com":
+            raise RuntimeError("Failed to authenticate")
+        return [{"name": "session", "value": session.username, "expires": -1}]
+
+async def in_process():
+    aa = StubAgentAuth(llm=object())
+
+    # Callers for the same host and username share one login, even with
+    # different login URLs, and each gets its own copy of the cookies
+    results = await asyncio.gather(
+        *[aa.auth("https://www.example.com/login", "user@example.com") for _ in range(5)],
+        aa.auth("https://WWW.EXAMPLE.COM", "user@example.com"),
+        aa.auth("https://www.example.com", "other@example.com"),
+    )
+    assert sorted(StubAgentAuth.logins) == ["other@example.com", "user@example.com"]
+    assert all(cookies == [{"name": "session", "value": "user@example.com", "expires": -1}] for cookies in results[:6])
+    assert len({id(cookies) for cookies in results}) == 7
+    results[0][0]["value"] = "changed"
+    assert results[1][0]["value"] == "user@example.com"
+
+    # Failures reach every caller and are not remembered
+    results = await asyncio.gather(*[aa.auth("https://www.example.com", "locked@example.com") for _ in range(3)], return_exceptions=True)
+    assert all(isinstance(result, RuntimeError) for result in results)
+    assert StubAgentAuth.logins.count("locked@example.com") == 1
+    await asyncio.gather(aa.auth("https://www.example.com", "locked@example.com"), return_exceptions=True)
+    assert StubAgentAuth.logins.count("locked@example.com") == 2
+
+    # A cancelled caller does not cancel the login for the others
+    StubAgentAuth.logins.clear()
+    first = asyncio.create_task(aa.auth("https://www.example.com", "user@example.com"))
+    second = asyncio.create_task(aa.auth("https://www.example.com", "user@example.com"))
+    await asyncio.sleep(0.05)
+    first.cancel()
+    assert (await second)[0]["value"] == "user@example.com"
+    assert first.cancelled()
+    assert StubAgentAuth.logins == ["user@example.com"]
+
+    # The login is cancelled once every caller is
+    StubAgentAuth.finished.clear()
+    callers = [asyncio.create_task(aa.auth("https://www.example.com", "user@example.com")) for _ in range(2)]
+    await asyncio.sleep(0.05)
+    for caller in callers:
+        caller.cancel()
+    await asyncio.sleep(StubAgentAuth.delay)
+    assert StubAgentAuth.logins == ["user@example.com"] * 2
+    assert StubAgentAuth.finished == []
+    assert not aa._logins.in_flight(("www.example.com", "user@example.com"))
+
+def worker(lock_dir: str, cache_dir: str, key: str, log_path: str, start):
+    async def run():
+        StubAgentAuth.log_path = log_path
+        aa = StubAgentAuth(llm=object(), session_cache=SessionCache(path=cache_dir, encryption_key=key), lock_dir=lock_dir)
+        start.wait()
+        results = await asyncio.gather(*[aa.auth("https://www.example.com", "user@example.com") for _ in range(3)])
+        assert all(cookies[0]["value"] == "user@example.com" for cookies in results)
+
+    asyncio.run(run())
+
+def across_processes():
+    with tempfile.TemporaryDirectory() as path:
+        log_path = os.path.join(path, "logins")
+        context = multiprocessing.get_context("fork")
+        start = context.Event()
+        # Every worker uses the same key, so it can read the others' cache entries
+        key = SessionCache.generate_key()
+        processes = [
+            context.Process(target=worker, args=(os.path.join(path, "locks"), os.path.join(path, "sessions"), key, log_path, start))
+            for _ in range(4)
+        ]
+        for process in processes:
+            process.start()
+        start.set()
+        for process in processes:
+            process.join(30)
+            assert process.exitcode == 0, process.exitcode
+
+        with open(log_path) as file:
+            assert len(file.readlines()) == 1
+
+if __name__ == "__main__":
+    asyncio.run(in_process())
+    across_processes()
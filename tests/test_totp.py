@@ -0,0 +1,22 @@
+import pyotp
+
+from agentauth import Credential
+
+def main():
+    credential = Credential("https://www.example.com", "user@example.com", "password")
+    assert not credential.has_totp
+    assert credential.totp() is None
+
+    credential.totp_secret = "JBSWY3DPEHPK3PXP"
+    assert credential.has_totp
+    assert credential.totp() == pyotp.TOTP("JBSWY3DPEHPK3PXP").now()
+
+    # Changing the secret discards the cached generator
+    credential.totp_secret = "KRSXG5CTMVRXEZLU"
+    assert credential.totp() == pyotp.TOTP("KRSXG5CTMVRXEZLU").now()
+
+    # Credentials are slotted and have no per-instance __dict__
+    assert not hasattr(credential, "__dict__")
+
+if __name__ == "__main__":
+    main()
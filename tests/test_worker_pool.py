@@ -0,0 +1,175 @@
+"""
+Tests the durable job queue and the worker pool that runs its logins in
+several processes: retries, timeouts, leases of dead workers and stored
+results.
+
+- Does not launch browsers; the browser login is replaced with a stub
+"""
+
+import asyncio
+import logging
+import os
+import sqlite3
+import tempfile
+import threading
+import time
+
+from agentauth import AgentAuth, JobQueue, WorkerPool, load_agentauth
+from agentauth.worker_pool import _work_async
+
+class StubAgentAuth(AgentAuth):
+    async def _browser_auth(self, session, cdp_url, headless, llm_usage, auth_span) -> list:
+        if session.username == "slow@example.com":
+            await asyncio.sleep(5)
+        if session.username == "flaky@example.com":
+            # Fails on the first attempt only, whichever process runs it
+            marker = os.path.join(os.environ["WORKER_POOL_TEST_DIR"], "flaky")
+            if not os.path.exists(marker):
+                open(marker, "w").close()
+                raise RuntimeError("Failed to authenticate")
+        await asyncio.sleep(0.3)
+        return [{"name": "session", "value": f"{session.username}:{os.getpid()}", "expires": -1}]
+
+async def create_agentauth() -> AgentAuth:
+    return StubAgentAuth(llm=object())
+
+class BrokenQueue(JobQueue):
+    def complete(self, job_id: int, cookies: list, worker: str) -> bool:
+        raise sqlite3.OperationalError("disk I/O error")
+
+class Records(logging.Handler):
+    def __init__(self):
+        super().__init__()
+        self.messages = []
+
+    def emit(self, record: logging.LogRecord):
+        self.messages.append(record.getMessage())
+
+def queue_semantics(path: str):
+    db_path = os.path.join(path, "queue.db")
+    queue = JobQueue(db_path, JobQueue.generate_key(), retry_delay=0.2, lease_grace=0)
+
+    first, second = queue.submit_many([("https://www.example.com", "a@example.com"), ("https://www.example.com", "b@example.com", "ws://cdp")])
+    assert queue.counts() == {"queued": 2, "running": 0, "succeeded": 0, "failed": 0}
+
+    # Jobs are claimed oldest first, once each
+    job = queue.claim("w1")
+    assert (job.id, job.status, job.attempts, job.worker) == (first, "running", 1, "w1")
+    assert queue.claim("w2").cdp_url == "ws://cdp"
+    assert queue.claim("w3") is None
+
+    # Cookies are returned decrypted but not stored in plain text
+    queue.complete(first, [{"name": "session", "value": "secret-cookie-value"}], "w1")
+    job = queue.get(first)
+    assert job.ok and job.cookies == [{"name": "session", "value": "secret-cookie-value"}]
+    with open(db_path, "rb") as file:
+        assert b"secret-cookie-value" not in file.read()
+    assert oct(os.stat(db_path).st_mode & 0o777) == "0o600"
+
+    # Failed attempts are retried after a delay until max_attempts
+    assert queue.fail(second, "RuntimeError: boom", "w2") == "queued"
+    job = queue.get(second)
+    assert (job.status, job.error) == ("queued", "RuntimeError: boom")
+    assert queue.claim("w1") is None
+    time.sleep(0.25)
+    assert queue.claim("w1").attempts == 2
+    assert queue.fail(second, "RuntimeError: boom", "w1") == "queued"
+    time.sleep(0.45)
+    assert queue.claim("w1").attempts == 3
+    assert queue.fail(second, "RuntimeError: boom", "w1") == "failed"
+    assert queue.get(second).status == "failed"
+
+    # Jobs of dead workers are claimed again once the lease expires, and
+    # fail if no attempts are left
+    lost = queue.submit("https://www.example.com", "c@example.com", max_attempts=2, timeout=0.1)
+    assert queue.claim("dead").id == lost
+    assert queue.claim("w1") is None
+    time.sleep(0.15)
+    assert queue.claim("w1").attempts == 2
+
+    # A worker whose lease expired cannot overwrite the new owner's job
+    assert not queue.complete(lost, [{"name": "session", "value": "stale"}], "dead")
+    assert queue.fail(lost, "RuntimeError: stale", "dead") is None
+    job = queue.get(lost)
+    assert (job.status, job.worker, job.cookies, job.error) == ("running", "w1", None, None)
+    time.sleep(0.15)
+    assert queue.claim("w1") is None
+    assert queue.get(lost).error == "Worker stopped before the job finished"
+
+    try:
+        queue.get(1000)
+        assert False, "Expected LookupError"
+    except LookupError:
+        pass
+
+    # Finished jobs are purged
+    assert queue.purge(older_than=0) == 3
+    assert queue.counts() == {"queued": 0, "running": 0, "succeeded": 0, "failed": 0}
+    queue.close()
+
+async def worker_pool(path: str):
+    os.environ["WORKER_POOL_TEST_DIR"] = path
+    db_path = os.path.join(path, "pool.db")
+    key = JobQueue.generate_key()
+
+    pool = WorkerPool(db_path, key, create_agentauth, processes=2, concurrency=3, poll_interval=0.05, retry_delay=0.1)
+    queue = JobQueue(db_path, key)
+    job_ids = queue.submit_many([("https://www.example.com", f"user{i}@example.com") for i in range(12)])
+    flaky = queue.submit("https://www.example.com", "flaky@example.com")
+    slow = queue.submit("https://www.example.com", "slow@example.com", max_attempts=1, timeout=0.5)
+
+    with pool:
+        assert pool.alive == 2
+        jobs = await queue.wait(job_ids + [flaky, slow], poll_interval=0.05, timeout=60)
+
+    assert pool.alive == 0
+    for job in jobs[:12]:
+        assert job.ok, job.error
+        assert job.cookies[0]["value"].startswith(job.username)
+
+    # Logins ran in both processes
+    assert len({job.cookies[0]["value"].split(":")[1] for job in jobs[:12]}) == 2
+
+    assert jobs[12].ok and jobs[12].attempts == 2
+    assert (jobs[13].status, jobs[13].error) == ("failed", "Timed out after 0.5s")
+    queue.close()
+
+async def failed_recording(path: str):
+    records = Records()
+    logging.getLogger("agentauth").addHandler(records)
+
+    # A job whose result cannot be recorded is logged, not lost silently
+    queue = BrokenQueue(os.path.join(path, "broken.db"), JobQueue.generate_key())
+    job_id = queue.submit("https://www.example.com", "user@example.com")
+    stop = threading.Event()
+    worker = asyncio.create_task(_work_async(queue, create_agentauth, "w1", 1, 0.05, stop))
+    for _ in range(100):
+        if any("failed to record job result" in message for message in records.messages):
+            break
+        await asyncio.sleep(0.05)
+    stop.set()
+    await worker
+
+    errors = [message for message in records.messages if "failed to record job result" in message]
+    assert len(errors) == 1, records.messages
+    assert f'"job_id": {job_id}' in errors[0] and "disk I/O error" in errors[0]
+    logging.getLogger("agentauth").removeHandler(records)
+
+async def setup_functions():
+    # Setup functions may be named, synchronous or coroutine functions
+    # Imported by name, the module is not __main__, so its class is a different object
+    assert type(await load_agentauth("test_worker_pool:create_agentauth")).__name__ == "StubAgentAuth"
+    assert isinstance(await load_agentauth(create_agentauth), StubAgentAuth)
+    assert isinstance(await load_agentauth(lambda: StubAgentAuth(llm=object())), StubAgentAuth)
+    try:
+        await load_agentauth("test_worker_pool")
+        assert False, "Expected ValueError"
+    except ValueError:
+        pass
+
+if __name__ == "__main__":
+    asyncio.run(setup_functions())
+    with tempfile.TemporaryDirectory() as path:
+        queue_semantics(path)
+        asyncio.run(worker_pool(path))
+        asyncio.run(failed_recording(path))